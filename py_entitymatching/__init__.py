@@ -12,6 +12,7 @@ from py_entitymatching.sampler.down_sample import down_sample
 #
 from py_entitymatching.io.parsers import read_csv_metadata, to_csv_metadata
 from py_entitymatching.io.pickles import load_object, load_table, save_object, save_table
+from py_entitymatching.io.columnar import read_columnar_metadata
 #
 # import catalog related methods
 from py_entitymatching.catalog.catalog_manager import get_property, get_all_properties, \
@@ -36,6 +37,9 @@ from py_entitymatching.explorer.pandastable.pandastable_wrapper import data_expl
 from py_entitymatching.blocker.attr_equiv_blocker import AttrEquivalenceBlocker
 from py_entitymatching.blocker.black_box_blocker import BlackBoxBlocker
 from py_entitymatching.blocker.overlap_blocker import OverlapBlocker
+from py_entitymatching.blocker.overlap_index import OverlapIndex
+from py_entitymatching.blocker.prefilters import EqualityPrefilter, \
+    RangePrefilter, OverlapPrefilter
 from py_entitymatching.blocker.rule_based_blocker import RuleBasedBlocker
 from py_entitymatching.blocker.sn_blocker import SortedNeighborhoodBlocker
 
@@ -63,7 +67,12 @@ from py_entitymatching.feature.autofeaturegen import get_features, get_features_
     get_features_for_matching
 from py_entitymatching.feature.addfeatures import get_feature_fn, add_feature, \
     add_blackbox_feature, create_feature_table
-from py_entitymatching.feature.extractfeatures import extract_feature_vecs
+from py_entitymatching.feature.tokenizedtable import TokenizedTable, \
+    tokenize_tables
+from py_entitymatching.feature.featurefunction import FeatureFunction
+from py_entitymatching.feature.extractfeatures import extract_feature_vecs, \
+    extract_feature_matrix, extract_feature_vecs_by_chunks, \
+    extract_feature_vecs_to_file, update_feature_vecs, profile_feature_vecs
 
 # # matcher related stuff
 from py_entitymatching.matcher.matcherutils import split_train_test, impute_table
@@ -106,6 +115,10 @@ from py_entitymatching.evaluation.evaluation import eval_matches, \
 from py_entitymatching.utils.generic_helper import get_install_path, load_dataset, \
     add_output_attributes
 
+# # executor
+from py_entitymatching.utils.executor import Executor, set_executor, \
+    get_executor
+
 # # pandas helper functions
 from py_entitymatching.utils.pandas_helper import filter_rows, project_cols, \
     mutate_col, rename_col, preserve_metadata, drop_cols
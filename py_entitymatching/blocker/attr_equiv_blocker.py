@@ -2,14 +2,13 @@ import logging
 
 import pandas as pd
 import numpy as np
-import pyprind
 import six
 from joblib import Parallel, delayed
 
 import py_entitymatching.catalog.catalog_manager as cm
 from py_entitymatching.blocker.blocker import Blocker
 from py_entitymatching.utils.catalog_helper import log_info, get_name_for_key, add_key_column
-from py_entitymatching.utils.generic_helper import rem_nan
+from py_entitymatching.utils.generic_helper import rem_nan, get_value_codes
 from py_entitymatching.utils.validation_helper import validate_object_type
 
 logger = logging.getLogger(__name__)
@@ -251,16 +250,15 @@ class AttrEquivalenceBlocker(Blocker):
                 information should be logged (defaults to False).
 
             show_progress (boolean): A flag to indicate whether progress should
-                                     be displayed to the user (defaults to True).
+                                     be displayed to the user (defaults to
+                                     True). The blocking attribute values of
+                                     all the tuple pairs are compared at once,
+                                     so no progress is displayed.
 
             n_jobs (int): The number of parallel jobs to be used for computation
-                (defaults to 1). If -1 all CPUs are used. If 0 or 1,
-                no parallel computation is used at all, which is useful for
-                debugging. For n_jobs below -1, (n_cpus + 1 + n_jobs) are
-                used (where n_cpus is the total number of CPUs in the
-                machine). Thus, for n_jobs = -2, all CPUs but one are used.
-                If (n_cpus + 1 + n_jobs) is less than 1, then no parallel
-                computation is used (i.e., equivalent to the default).
+                (defaults to 1). The blocking attribute values of all the
+                tuple pairs are compared at once in a single process, so this
+                parameter is only validated (it is kept for compatibility).
 
         Returns:
             A candidate set of tuple pairs that survived blocking (DataFrame).
@@ -318,35 +316,19 @@ class AttrEquivalenceBlocker(Blocker):
 
         # do blocking
 
-        # # do projection before merge
-        l_df = ltable[[l_key, l_block_attr]]
-        r_df = rtable[[r_key, r_block_attr]]
-
-        # # set index for convenience
-        l_df = l_df.set_index(l_key, drop=False)
-        r_df = r_df.set_index(r_key, drop=False)
-
-        # # determine number of processes to launch parallely
-        n_procs = self.get_num_procs(n_jobs, len(candset))
-
-        valid = []
-        if n_procs <= 1:
-            # single process
-            valid = _block_candset_split(candset, l_df, r_df, l_key, r_key,
-                                         l_block_attr, r_block_attr, fk_ltable,
-                                         fk_rtable, allow_missing, show_progress)
-        else:
-            c_splits = np.array_split(candset, n_procs)
-            valid_splits = Parallel(n_jobs=n_procs)(
-                delayed(_block_candset_split)(c_splits[i],
-                                              l_df, r_df,
-                                              l_key, r_key,
-                                              l_block_attr, r_block_attr,
-                                              fk_ltable, fk_rtable, allow_missing,
-                                              show_progress and i == len(
-                                                  c_splits) - 1)
-                for i in range(len(c_splits)))
-            valid = sum(valid_splits, [])
+        # # get the positions of the tuples of the candset in the tables
+        l_pos = _get_positions(ltable[l_key].values, candset[fk_ltable].values,
+                               'ltable')
+        r_pos = _get_positions(rtable[r_key].values, candset[fk_rtable].values,
+                               'rtable')
+
+        # # compare the codes of the blocking attribute values of the pairs
+        l_codes, r_codes = get_value_codes(ltable[l_block_attr].values,
+                                            rtable[r_block_attr].values)
+        l_codes, r_codes = l_codes[l_pos], r_codes[r_pos]
+        valid = (l_codes == r_codes) & (l_codes >= 0)
+        if allow_missing:
+            valid |= (l_codes < 0) | (r_codes < 0)
 
         # construct output table
         if len(candset) > 0:
@@ -483,55 +465,15 @@ def _block_tables_split(l_df, r_df, l_key, r_key, l_block_attr, r_block_attr,
     return candset
 
 
-def _block_candset_split(c_df, l_df, r_df, l_key, r_key,
-                         l_block_attr, r_block_attr, fk_ltable, fk_rtable,
-                         allow_missing, show_progress):
-    # initialize progress bar
-    if show_progress:
-        prog_bar = pyprind.ProgBar(len(c_df))
-
-    # initialize list to keep track of valid ids
-    valid = []
-
-    # get the indexes for the key attributes in the candset
-    col_names = list(c_df.columns)
-    lkey_idx = col_names.index(fk_ltable)
-    rkey_idx = col_names.index(fk_rtable)
-
-    # create a look up table for the blocking attribute values
-    l_dict = {}
-    r_dict = {}
-
-    # iterate the rows in candset
-    for row in c_df.itertuples(index=False):
-
-        # # update the progress bar
-        if show_progress:
-            prog_bar.update()
-
-        # # get the value of block attributes
-        row_lkey = row[lkey_idx]
-        if row_lkey not in l_dict:
-            l_dict[row_lkey] = l_df.loc[row_lkey, l_block_attr]
-        l_val = l_dict[row_lkey]
-
-        row_rkey = row[rkey_idx]
-        if row_rkey not in r_dict:
-            r_dict[row_rkey] = r_df.loc[row_rkey, r_block_attr]
-        r_val = r_dict[row_rkey]
-
-        if allow_missing:
-            if pd.isnull(l_val) or pd.isnull(r_val) or l_val == r_val:
-                valid.append(True)
-            else:
-                valid.append(False)
-        else:
-            if pd.notnull(l_val) and pd.notnull(r_val) and l_val == r_val:
-                valid.append(True)
-            else:
-                valid.append(False)
-
-    return valid
+def _get_positions(keys, fk_values, table_name):
+    # get the positions of the tuples with the given foreign key values
+    positions = pd.Index(keys).get_indexer(fk_values)
+    if (positions < 0).any():
+        logger.error('Candset has foreign key values that are not in the %s'
+                     % table_name)
+        raise AssertionError('Candset has foreign key values that are not in '
+                             'the %s' % table_name)
+    return positions
 
 
 def _output_columns(l_key, r_key, col_names, l_output_attrs, r_output_attrs,
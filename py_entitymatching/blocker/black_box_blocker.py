@@ -6,16 +6,25 @@ import sys
 import pandas as pd
 import numpy as np
 import pyprind
-from joblib import Parallel, delayed
+from joblib import delayed
 import cloudpickle as cp
-import pickle
 
 from py_entitymatching.blocker.blocker import Blocker
+from py_entitymatching.blocker.prefilters import Prefilter
 import py_entitymatching.catalog.catalog_manager as cm
 from py_entitymatching.utils.catalog_helper import log_info, get_name_for_key, add_key_column
+from py_entitymatching.utils.generic_helper import split_candset_by_ltable, \
+    project_to_keys, TupleLookup
+from py_entitymatching.utils.validation_helper import validate_object_type
+from py_entitymatching.utils.executor import run_parallel, share_object, \
+    share_pickled_object, get_shared_object, loads_shared_object
 
 logger = logging.getLogger(__name__)
 
+# The maximum number of tuple pairs passed to a black box batch function
+# at once when blocking a candidate set
+_MAX_BATCH_SIZE = 100000
+
 class BlackBoxBlocker(Blocker):
     """
     Blocks based on a black box function specified by the user.
@@ -24,6 +33,8 @@ class BlackBoxBlocker(Blocker):
     def __init__(self, *args, **kwargs):
         super(Blocker, self).__init__(*args, **kwargs)
         self.black_box_function = None
+        self.black_box_batch_function = None
+        self.prefilter = None
 
     def set_black_box_function(self, function):
         """Sets black box function to be used for blocking.
@@ -32,6 +43,75 @@ class BlackBoxBlocker(Blocker):
             function (function): the black box function to be used for blocking .
         """
         self.black_box_function = function
+        self.black_box_batch_function = None
+
+    def set_black_box_batch_function(self, function):
+        """Sets a black box function that blocks many tuple pairs at once.
+
+        The function is called with the left and the right tuples of the
+        pairs to block, and returns a boolean mask with True for the pairs to
+        drop (the same as the black box function returns for a single pair).
+        When blocking two tables, the function is called once per left tuple,
+        with the tuple (a Series) and a DataFrame of right tuples. When
+        blocking a candidate set, the function is called with two aligned
+        DataFrames holding the left and the right tuples of the pairs. Thus,
+        a function written with column-wise comparisons (such as
+        ``ltuples['zipcode'] != rtuples['zipcode']``) works in both cases.
+
+        The batch function replaces the black box function set using
+        :meth:`set_black_box_function`, if any.
+
+        Args:
+            function (function): the black box function to be used for
+                blocking batches of tuple pairs.
+
+        Examples:
+            >>> def different_zipcodes(ltuples, rtuples):
+                    return ltuples['zipcode'] != rtuples['zipcode']
+            >>> import py_entitymatching as em
+            >>> bb = em.BlackBoxBlocker()
+            >>> bb.set_black_box_batch_function(different_zipcodes)
+            >>> C = bb.block_tables(A, B, l_output_attrs=['name'], r_output_attrs=['name'])
+        """
+        self.black_box_batch_function = function
+        self.black_box_function = None
+
+    def set_prefilter(self, prefilter):
+        """Sets a prefilter to find the candidate tuple pairs when blocking
+        two tables.
+
+        Instead of applying the black box function to all the tuple pairs of
+        the two tables, :meth:`block_tables` finds the candidate tuple pairs
+        using the prefilter (which uses an index, such as a hash join on an
+        attribute), and applies the black box function only to them. The
+        prefilter should only drop the tuple pairs that the black box function
+        would drop as well, otherwise the output would differ from blocking
+        without the prefilter.
+
+        Args:
+            prefilter (Prefilter): the prefilter to be used (one of
+                :class:`~py_entitymatching.EqualityPrefilter`,
+                :class:`~py_entitymatching.RangePrefilter` and
+                :class:`~py_entitymatching.OverlapPrefilter`), or None to
+                remove the prefilter.
+
+        Raises:
+            AssertionError: If `prefilter` is not a prefilter.
+
+        Examples:
+            >>> def match_last_name(ltuple, rtuple):
+                    return ltuple['name'].split()[1] != rtuple['name'].split()[1]
+            >>> import py_entitymatching as em
+            >>> bb = em.BlackBoxBlocker()
+            >>> bb.set_black_box_function(match_last_name)
+            >>> # the pairs must share a token of the name to share the last name
+            >>> bb.set_prefilter(em.OverlapPrefilter('name', 'name'))
+            >>> C = bb.block_tables(A, B, l_output_attrs=['name'], r_output_attrs=['name'])
+        """
+        if prefilter is not None and not isinstance(prefilter, Prefilter):
+            logger.error('Input prefilter is not of type Prefilter')
+            raise AssertionError('Input prefilter is not of type Prefilter')
+        self.prefilter = prefilter
 
     def block_tables(self, ltable, rtable,
                      l_output_attrs=None, r_output_attrs=None,
@@ -45,7 +125,9 @@ class BlackBoxBlocker(Blocker):
         Finds tuple pairs from left and right tables that survive the black
         box function. A tuple pair survives the black box blocking function if
         the function returns False for that pair, otherwise the tuple pair is
-        dropped.
+        dropped. If a prefilter is set (using :meth:`set_prefilter`), the
+        black box function is applied only to the tuple pairs that pass the
+        prefilter.
 
         Args:
             ltable (DataFrame): The left input table.
@@ -142,7 +224,9 @@ class BlackBoxBlocker(Blocker):
         self.validate_show_progress(show_progress)
 
         # validate black box function
-        assert self.black_box_function != None, 'Black box function is not set'
+        assert self.black_box_function != None or \
+               self.black_box_batch_function is not None, \
+            'Black box function is not set'
 
         # validate output attributes
         self.validate_output_attrs(ltable, rtable, l_output_attrs,r_output_attrs)
@@ -171,33 +255,55 @@ class BlackBoxBlocker(Blocker):
         if r_output_attrs:
             r_output_attrs_1 = [x for x in r_output_attrs if x != r_key]
 
+        if self.prefilter is not None:
+            candset = self._block_tables_with_prefilter(
+                ltable, rtable, l_df, r_df, l_key, r_key,
+                l_output_attrs_1, r_output_attrs_1,
+                l_output_prefix, r_output_prefix, show_progress, n_jobs)
+            return self._finalize_candset(candset, ltable, rtable, l_key,
+                                          r_key, l_output_attrs,
+                                          r_output_attrs, l_output_prefix,
+                                          r_output_prefix)
+
         # # determine the number of processes to launch parallely
         n_procs = self.get_num_procs(n_jobs, len(l_df) * len(r_df))
 
         # # pickle the black-box function before passing it as an arg to
         # # _block_tables_split to be executed by each child process
-        black_box_function_pkl = cp.dumps(self.black_box_function)
+        black_box_function_pkl, block_tables_split = self._get_black_box_fn(
+            _block_tables_split, _block_tables_batch_split)
 
         if n_procs <= 1:
             # single process
-            candset = _block_tables_split(l_df, r_df, l_key, r_key,
-                                          l_output_attrs_1, r_output_attrs_1,
-                                          l_output_prefix, r_output_prefix,
-                                          black_box_function_pkl, show_progress)
+            candset = block_tables_split(l_df, r_df, l_key, r_key,
+                                         l_output_attrs_1, r_output_attrs_1,
+                                         l_output_prefix, r_output_prefix,
+                                         black_box_function_pkl, show_progress)
         else:
             # multiprocessing
             m, n = self.get_split_params(n_procs, len(l_df), len(r_df))
-            l_splits = np.array_split(l_df, m)
-            r_splits = np.array_split(r_df, n)
-            c_splits = Parallel(n_jobs=m*n)(delayed(_block_tables_split)(l_splits[i], r_splits[j],
+            l_splits = [share_object(l_split)
+                        for l_split in np.array_split(l_df, m)]
+            r_splits = [share_object(r_split)
+                        for r_split in np.array_split(r_df, n)]
+            black_box_function_pkl = share_pickled_object(
+                black_box_function_pkl)
+            c_splits = run_parallel((delayed(block_tables_split)(l_splits[i], r_splits[j],
                                                 l_key, r_key, 
                                                 l_output_attrs_1, r_output_attrs_1,
                                                 l_output_prefix, r_output_prefix,
                                                 black_box_function_pkl,
                                                 show_progress and i == len(l_splits) - 1 and j == len(r_splits) - 1)
-                                                for i in range(len(l_splits)) for j in range(len(r_splits)))
+                                                for i in range(len(l_splits)) for j in range(len(r_splits))), m*n)
             candset = pd.concat(c_splits, ignore_index=True)
 
+        return self._finalize_candset(candset, ltable, rtable, l_key, r_key,
+                                      l_output_attrs, r_output_attrs,
+                                      l_output_prefix, r_output_prefix)
+
+    def _finalize_candset(self, candset, ltable, rtable, l_key, r_key,
+                          l_output_attrs, r_output_attrs,
+                          l_output_prefix, r_output_prefix):
         # # determine the attributes to retain in the output candidate set
         retain_cols = self.get_attrs_to_retain(l_key, r_key,
                                                l_output_attrs, r_output_attrs,
@@ -216,7 +322,8 @@ class BlackBoxBlocker(Blocker):
         # return candidate set
         return candset
 
-    def block_candset(self, candset, verbose=True, show_progress=True, n_jobs=1):
+    def block_candset(self, candset, verbose=True, show_progress=True, n_jobs=1,
+                      group_by_ltable=False):
 
         """
         Blocks an input candidate set of tuple pairs based on a black box
@@ -245,6 +352,14 @@ class BlackBoxBlocker(Blocker):
                 If (n_cpus + 1 + n_jobs) is less than 1, then no parallel
                 computation is used (i.e., equivalent to the default).
 
+            group_by_ltable (boolean): A flag to indicate whether the tuple
+                pairs should be processed grouped by their ltable tuple
+                (defaults to False). If True, all the pairs of an ltable
+                tuple are processed together by the same job, and each job
+                gets only the tuples its pairs refer to. This is useful for
+                large tables, or when the candset is not ordered by the
+                ltable tuples.
+
         Returns:
             A candidate set of tuple pairs that survived blocking (DataFrame).
 
@@ -256,6 +371,7 @@ class BlackBoxBlocker(Blocker):
             AssertionError: If `n_jobs` is not of type
                 int.
             AssertionError: If `show_progress` is not of type boolean.
+            AssertionError: If `group_by_ltable` is not of type boolean.
             AssertionError: If `l_block_attr` is not in the ltable columns.
             AssertionError: If `r_block_attr` is not in the rtable columns.
 
@@ -279,9 +395,12 @@ class BlackBoxBlocker(Blocker):
 
         # validate data types of standard input parameters
         self.validate_types_params_candset(candset, verbose, show_progress, n_jobs)
+        validate_object_type(group_by_ltable, bool, 'Parameter group_by_ltable')
 
         # validate black box functionn
-        assert self.black_box_function != None, 'Black box function is not set'
+        assert self.black_box_function != None or \
+               self.black_box_batch_function is not None, \
+            'Black box function is not set'
 
         # get and validate metadata
         log_info(logger, 'Required metadata: cand.set key, fk ltable, fk rtable, '
@@ -308,24 +427,46 @@ class BlackBoxBlocker(Blocker):
 
         # # pickle the black-box function before passing it as an arg to
         # # _block_candset_split to be executed by each child process
-        black_box_function_pkl = cp.dumps(self.black_box_function)
+        black_box_function_pkl, block_candset_split = self._get_black_box_fn(
+            _block_candset_split, _block_candset_batch_split)
 
         valid = []
-        if n_procs <= 1:
+        if group_by_ltable:
+            # group the pairs by ltable tuple, and give each job only the
+            # tuples referred to by its pairs
+            c_splits, order = split_candset_by_ltable(c_df, fk_ltable,
+                                                      max(n_procs, 1))
+            l_splits = [project_to_keys(l_df, c_split[fk_ltable])
+                        for c_split in c_splits]
+            r_splits = [project_to_keys(r_df, c_split[fk_rtable])
+                        for c_split in c_splits]
+            valid_splits = _block_candset_splits(c_splits, l_splits, r_splits,
+                                                 l_key, r_key,
+                                                 fk_ltable, fk_rtable,
+                                                 black_box_function_pkl,
+                                                 show_progress, n_procs,
+                                                 block_candset_split)
+            # # put the results back in the order of the candset
+            valid = np.empty(len(c_df), dtype=bool)
+            valid[order] = sum(valid_splits, [])
+            valid = list(valid)
+        elif n_procs <= 1:
             # single process
-            valid = _block_candset_split(c_df, l_df, r_df, l_key, r_key,
-                                         fk_ltable, fk_rtable,
-                                         black_box_function_pkl, show_progress)
+            valid = block_candset_split(c_df, l_df, r_df, l_key, r_key,
+                                        fk_ltable, fk_rtable,
+                                        black_box_function_pkl, show_progress)
         else:
             # multiprocessing
             c_splits = np.array_split(c_df, n_procs)
-            valid_splits = Parallel(n_jobs=n_procs)(delayed(_block_candset_split)(c_splits[i],
-                                                            l_df, r_df,
-                                                            l_key, r_key,
-                                                            fk_ltable, fk_rtable,
-                                                            black_box_function_pkl,
-                                                            show_progress and i == len(c_splits) - 1)
-                                                            for i in range(len(c_splits)))
+            l_df, r_df = share_object(l_df), share_object(r_df)
+            valid_splits = _block_candset_splits(c_splits,
+                                                 [l_df] * len(c_splits),
+                                                 [r_df] * len(c_splits),
+                                                 l_key, r_key,
+                                                 fk_ltable, fk_rtable,
+                                                 black_box_function_pkl,
+                                                 show_progress, n_procs,
+                                                 block_candset_split)
             valid = sum(valid_splits, [])
  
         # construct output table
@@ -376,15 +517,72 @@ class BlackBoxBlocker(Blocker):
         """
 
         # validate black box function
-        assert self.black_box_function is not None, 'Black box function is not set'
+        assert self.black_box_function is not None or \
+               self.black_box_batch_function is not None, \
+            'Black box function is not set'
+        if self.black_box_function is None:
+            rtuples = pd.DataFrame([rtuple]).reset_index(drop=True)
+            return bool(_get_batch_mask(
+                self.black_box_batch_function(ltuple, rtuples), 1)[0])
         return self.black_box_function(ltuple, rtuple)
 
+    # block the tuple pairs that pass the prefilter
+    def _block_tables_with_prefilter(self, ltable, rtable, l_df, r_df,
+                                     l_key, r_key,
+                                     l_output_attrs, r_output_attrs,
+                                     l_output_prefix, r_output_prefix,
+                                     show_progress, n_jobs):
+        l_pos, r_pos = self.prefilter.get_candidate_pairs(ltable, rtable)
+
+        # # the candidate tuple pairs, given by the keys of the tuples
+        fk_ltable, fk_rtable = 'ltable_' + l_key, 'rtable_' + r_key
+        c_df = pd.DataFrame(OrderedDict([(fk_ltable, l_df[l_key].values[l_pos]),
+                                         (fk_rtable, r_df[r_key].values[r_pos])]))
+
+        # # apply the black box function to the candidate tuple pairs, the
+        # # same way as when blocking a candidate set
+        n_procs = self.get_num_procs(n_jobs, len(c_df))
+        black_box_function_pkl, block_candset_split = self._get_black_box_fn(
+            _block_candset_split, _block_candset_batch_split)
+        show_progress = show_progress and len(c_df) > 0
+        if n_procs <= 1:
+            valid = block_candset_split(c_df, l_df, r_df, l_key, r_key,
+                                        fk_ltable, fk_rtable,
+                                        black_box_function_pkl, show_progress)
+        else:
+            c_splits = np.array_split(c_df, n_procs)
+            l_shared, r_shared = share_object(l_df), share_object(r_df)
+            valid_splits = _block_candset_splits(c_splits,
+                                                 [l_shared] * len(c_splits),
+                                                 [r_shared] * len(c_splits),
+                                                 l_key, r_key,
+                                                 fk_ltable, fk_rtable,
+                                                 black_box_function_pkl,
+                                                 show_progress, n_procs,
+                                                 block_candset_split)
+            valid = sum(valid_splits, [])
+
+        valid = np.asarray(valid, dtype=bool)
+        return _get_candset_by_positions(l_df, r_df, l_pos[valid], r_pos[valid],
+                                         l_key, r_key,
+                                         l_output_attrs, r_output_attrs,
+                                         l_output_prefix, r_output_prefix)
+
+    # get the pickled black box function (the batch function if set) and
+    # the function blocking a split with it
+    def _get_black_box_fn(self, split_fn, batch_split_fn):
+        if self.black_box_batch_function is not None:
+            return cp.dumps(self.black_box_batch_function), batch_split_fn
+        return cp.dumps(self.black_box_function), split_fn
+
 
 def _block_tables_split(l_df, r_df, l_key, r_key,
                         l_output_attrs, r_output_attrs,
                         l_output_prefix, r_output_prefix,
                         black_box_function_pkl, show_progress):
 
+    l_df, r_df = get_shared_object(l_df), get_shared_object(r_df)
+
     # initialize progress bar
     if show_progress:
         bar = pyprind.ProgBar(len(l_df)*len(r_df))
@@ -409,7 +607,7 @@ def _block_tables_split(l_df, r_df, l_key, r_key,
     valid = []
 
     # unpickle the black box function
-    black_box_function = pickle.loads(black_box_function_pkl)
+    black_box_function = loads_shared_object(black_box_function_pkl)
 
     # iterate through the two tables
     for l_t in l_df.itertuples(index=False):
@@ -453,16 +651,42 @@ def _block_tables_split(l_df, r_df, l_key, r_key,
 
     return candset
 
+def _block_candset_splits(c_splits, l_splits, r_splits, l_key, r_key,
+                          fk_ltable, fk_rtable, black_box_function_pkl,
+                          show_progress, n_procs, block_candset_split):
+    # single process
+    if n_procs <= 1:
+        return [block_candset_split(c_splits[i], l_splits[i], r_splits[i],
+                                    l_key, r_key, fk_ltable, fk_rtable,
+                                    black_box_function_pkl,
+                                    show_progress and i == len(c_splits) - 1)
+                for i in range(len(c_splits))]
+
+    # multiprocessing
+    l_splits = [share_object(l_split) for l_split in l_splits]
+    r_splits = [share_object(r_split) for r_split in r_splits]
+    black_box_function_pkl = share_pickled_object(black_box_function_pkl)
+    return run_parallel((delayed(block_candset_split)(c_splits[i],
+                                                      l_splits[i], r_splits[i],
+                                                      l_key, r_key,
+                                                      fk_ltable, fk_rtable,
+                                                      black_box_function_pkl,
+                                                      show_progress and i == len(c_splits) - 1)
+                         for i in range(len(c_splits))), n_procs)
+
+
 def _block_candset_split(c_df, l_df, r_df, l_key, r_key, fk_ltable, fk_rtable,
                          black_box_function_pkl, show_progress):
 
+    l_df, r_df = get_shared_object(l_df), get_shared_object(r_df)
+
     # initialize the progress bar
     if show_progress:
         bar = pyprind.ProgBar(len(c_df))
 
-    # create lookup dictionaries for faster processing
-    l_dict = {}
-    r_dict = {}
+    # create lookups (keeping the recently used tuples) for faster processing
+    l_dict = TupleLookup(l_df.loc.__getitem__)
+    r_dict = TupleLookup(r_df.loc.__getitem__)
 
     # list to keep track of valid ids
     valid = []
@@ -472,7 +696,7 @@ def _block_candset_split(c_df, l_df, r_df, l_key, r_key, fk_ltable, fk_rtable,
     r_id_pos = list(c_df.columns).index(fk_rtable)
 
     # unpickle the black box function
-    black_box_function = pickle.loads(black_box_function_pkl)
+    black_box_function = loads_shared_object(black_box_function_pkl)
 
     # iterate candidate set
     for row in c_df.itertuples(index=False):
@@ -480,17 +704,11 @@ def _block_candset_split(c_df, l_df, r_df, l_key, r_key, fk_ltable, fk_rtable,
         if show_progress:
             bar.update()
         
-        # # get ltuple, try dictionary first, then dataframe
-        row_lkey = row[l_id_pos]
-        if row_lkey not in l_dict:
-            l_dict[row_lkey] = l_df.loc[row_lkey]
-        ltuple = l_dict[row_lkey]
-
-        # # get rtuple, try dictionary first, then dataframe
-        row_rkey = row[r_id_pos]
-        if row_rkey not in r_dict:
-            r_dict[row_rkey] = r_df.loc[row_rkey]
-        rtuple = r_dict[row_rkey]
+        # # get ltuple, try lookup first, then dataframe
+        ltuple = l_dict[row[l_id_pos]]
+
+        # # get rtuple, try lookup first, then dataframe
+        rtuple = r_dict[row[r_id_pos]]
 
         # # apply the black box function to the tuple pair
         res = black_box_function(ltuple, rtuple)
@@ -500,3 +718,101 @@ def _block_candset_split(c_df, l_df, r_df, l_key, r_key, fk_ltable, fk_rtable,
             valid.append(False)
 
     return valid
+
+
+def _block_tables_batch_split(l_df, r_df, l_key, r_key,
+                              l_output_attrs, r_output_attrs,
+                              l_output_prefix, r_output_prefix,
+                              black_box_function_pkl, show_progress):
+
+    l_df, r_df = get_shared_object(l_df), get_shared_object(r_df)
+
+    # initialize progress bar
+    if show_progress:
+        bar = pyprind.ProgBar(len(l_df))
+
+    # unpickle the black box function
+    black_box_function = loads_shared_object(black_box_function_pkl)
+
+    # the right tuples, passed to the black box function at once
+    r_block = r_df.reset_index(drop=True)
+
+    # positions of the tuple pairs that survive blocking
+    l_pos, r_pos = [], []
+
+    # apply the black box function to each ltuple and all the rtuples
+    for i, (_, ltuple) in enumerate(l_df.reset_index(drop=True).iterrows()):
+        # # update the progress bar
+        if show_progress:
+            bar.update()
+
+        mask = _get_batch_mask(black_box_function(ltuple, r_block),
+                               len(r_block))
+        survivors = np.flatnonzero(~mask)
+        l_pos.append(np.full(len(survivors), i, dtype=np.int64))
+        r_pos.append(survivors)
+
+    l_pos = np.concatenate(l_pos) if l_pos else np.zeros(0, dtype=np.int64)
+    r_pos = np.concatenate(r_pos) if r_pos else np.zeros(0, dtype=np.int64)
+    return _get_candset_by_positions(l_df, r_df, l_pos, r_pos, l_key, r_key,
+                                     l_output_attrs, r_output_attrs,
+                                     l_output_prefix, r_output_prefix)
+
+
+def _get_candset_by_positions(l_df, r_df, l_pos, r_pos, l_key, r_key,
+                              l_output_attrs, r_output_attrs,
+                              l_output_prefix, r_output_prefix):
+    # construct the candidate set by taking the values of the tuple pairs
+    candset = pd.DataFrame()
+    candset[l_output_prefix + l_key] = l_df[l_key].values[l_pos]
+    candset[r_output_prefix + r_key] = r_df[r_key].values[r_pos]
+    for attr in l_output_attrs:
+        candset[l_output_prefix + attr] = l_df[attr].values[l_pos]
+    for attr in r_output_attrs:
+        candset[r_output_prefix + attr] = r_df[attr].values[r_pos]
+    return candset
+
+
+def _block_candset_batch_split(c_df, l_df, r_df, l_key, r_key, fk_ltable,
+                               fk_rtable, black_box_function_pkl,
+                               show_progress):
+
+    l_df, r_df = get_shared_object(l_df), get_shared_object(r_df)
+
+    # initialize the progress bar
+    n_batches = int(np.ceil(len(c_df) / float(_MAX_BATCH_SIZE)))
+    if show_progress:
+        bar = pyprind.ProgBar(max(n_batches, 1))
+
+    # positions of the tuples of the pairs in the tables
+    l_pos = l_df.index.get_indexer(c_df[fk_ltable].values)
+    r_pos = r_df.index.get_indexer(c_df[fk_rtable].values)
+
+    # unpickle the black box function
+    black_box_function = loads_shared_object(black_box_function_pkl)
+
+    # apply the black box function to batches of aligned tuple pairs
+    valid = np.ones(len(c_df), dtype=bool)
+    for start in range(0, len(c_df), _MAX_BATCH_SIZE):
+        # # update progress bar
+        if show_progress:
+            bar.update()
+
+        end = min(start + _MAX_BATCH_SIZE, len(c_df))
+        ltuples = l_df.take(l_pos[start:end]).reset_index(drop=True)
+        rtuples = r_df.take(r_pos[start:end]).reset_index(drop=True)
+        valid[start:end] = ~_get_batch_mask(
+            black_box_function(ltuples, rtuples), end - start)
+
+    return list(valid)
+
+
+def _get_batch_mask(mask, n_pairs):
+    # validate the output of a black box batch function
+    mask = np.asarray(mask, dtype=bool).ravel()
+    if len(mask) != n_pairs:
+        logger.error('Black box batch function returned %d values for %d '
+                     'tuple pairs' % (len(mask), n_pairs))
+        raise AssertionError('Black box batch function returned %d values '
+                             'for %d tuple pairs' % (len(mask), n_pairs))
+    return mask
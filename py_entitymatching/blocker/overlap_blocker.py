@@ -1,8 +1,7 @@
 # coding=utf-8
 import logging
-import re
-import string
 
+import numpy as np
 import pandas as pd
 import py_stringsimjoin as ssj
 import six
@@ -13,9 +12,13 @@ from py_stringsimjoin.join.overlap_join import overlap_join
 
 import py_entitymatching.catalog.catalog_manager as cm
 from py_entitymatching.blocker.blocker import Blocker
+from py_entitymatching.blocker.overlap_index import OverlapIndex
 from py_entitymatching.utils.catalog_helper import log_info, get_name_for_key, \
     add_key_column
+from py_entitymatching.utils.executor import get_num_jobs
 from py_entitymatching.utils.generic_helper import remove_non_ascii
+from py_entitymatching.utils.string_helper import clean_column, \
+    clean_string, remove_punctuations
 from py_entitymatching.utils.validation_helper import validate_object_type
 
 logger = logging.getLogger(__name__)
@@ -32,8 +35,6 @@ class OverlapBlocker(Blocker):
                            'has', 'he', 'in', 'is', 'it',
                            'its', 'on', 'that', 'the', 'to',
                            'was', 'were', 'will', 'with']
-        self.regex_punctuation = re.compile(
-            '[%s]' % re.escape(string.punctuation))
         super(OverlapBlocker, self).__init__()
 
     def block_tables(self, ltable, rtable, l_overlap_attr, r_overlap_attr,
@@ -42,7 +43,7 @@ class OverlapBlocker(Blocker):
                      l_output_attrs=None, r_output_attrs=None,
                      l_output_prefix='ltable_', r_output_prefix='rtable_',
                      allow_missing=False, verbose=False, show_progress=True,
-                     n_jobs=1):
+                     n_jobs=1, l_overlap_index=None, r_overlap_index=None):
         """
         Blocks two tables based on the overlap of token sets of attribute
          values.
@@ -113,6 +114,16 @@ class OverlapBlocker(Blocker):
                 If (n_cpus + 1 + n_jobs) is less than 1, then no parallel
                 computation is used (i.e., equivalent to the default).
 
+            l_overlap_index (OverlapIndex): An index built on the overlap
+                attribute of the left table using :meth:`build_index`, with
+                the same tokenization parameters (defaults to None). If an
+                index is given for either table, the blocking is done by
+                probing the indexes in a single process.
+
+            r_overlap_index (OverlapIndex): An index built on the overlap
+                attribute of the right table using :meth:`build_index`, with
+                the same tokenization parameters (defaults to None).
+
 
         Returns:
             A candidate set of tuple pairs that survived blocking (DataFrame).
@@ -171,6 +182,10 @@ class OverlapBlocker(Blocker):
 
             AssertionError: If `r_output_attrs` are not in the rtable.
 
+            AssertionError: If `l_overlap_index` or `r_overlap_index` is not
+             of type OverlapIndex, was not built on the input table, or was
+             built with different tokenization parameters.
+
             SyntaxError: If `q_val` is set to a valid value and
                 `word_level` is set to True.
 
@@ -190,6 +205,10 @@ class OverlapBlocker(Blocker):
             >>> C3 = ob.block_tables(A, B, 'address', 'address', l_output_attrs=['name'], r_output_attrs=['name'], allow_missing=True)
             # Use all the cores in the machine
             >>> C3 = ob.block_tables(A, B, 'address', 'address', l_output_attrs=['name'], r_output_attrs=['name'], n_jobs=-1)
+            # Reuse the tokenized tables across blocking calls
+            >>> A_index = ob.build_index(A, 'address')
+            >>> B_index = ob.build_index(B, 'address')
+            >>> C4 = ob.block_tables(A, B, 'address', 'address', overlap_size=2, l_overlap_index=A_index, r_overlap_index=B_index)
 
 
         """
@@ -237,6 +256,20 @@ class OverlapBlocker(Blocker):
 
         # do blocking
 
+        # # block using the overlap indexes if given
+        if l_overlap_index is not None or r_overlap_index is not None:
+            l_overlap_index = self._get_overlap_index(
+                l_overlap_index, ltable, l_key, l_overlap_attr,
+                rem_stop_words, q_val, word_level, 'left')
+            r_overlap_index = self._get_overlap_index(
+                r_overlap_index, rtable, r_key, r_overlap_attr,
+                rem_stop_words, q_val, word_level, 'right')
+            return self._block_tables_with_index(
+                ltable, rtable, l_key, r_key, l_overlap_index,
+                r_overlap_index, overlap_size, l_output_attrs,
+                r_output_attrs, l_output_prefix, r_output_prefix,
+                allow_missing)
+
         # # do projection before merge
         l_proj_attrs = self.get_attrs_to_project(l_key, l_overlap_attr,
                                                  l_output_attrs)
@@ -276,8 +309,8 @@ class OverlapBlocker(Blocker):
                                r_dummy_overlap_attr, tokenizer, overlap_size,
                                '>=',
                                allow_missing, l_output_attrs, r_output_attrs,
-                               l_output_prefix, r_output_prefix, False, n_jobs,
-                               show_progress)
+                               l_output_prefix, r_output_prefix, False,
+                               get_num_jobs(n_jobs), show_progress)
 
         # # retain only the required attributes in the output candidate set 
         retain_cols = self.get_attrs_to_retain(l_key, r_key, l_output_attrs,
@@ -297,7 +330,8 @@ class OverlapBlocker(Blocker):
     def block_candset(self, candset, l_overlap_attr, r_overlap_attr,
                       rem_stop_words=False, q_val=None, word_level=True,
                       overlap_size=1, allow_missing=False,
-                      verbose=False, show_progress=True, n_jobs=1):
+                      verbose=False, show_progress=True, n_jobs=1,
+                      l_overlap_index=None, r_overlap_index=None):
         """Blocks an input candidate set of tuple pairs based on the overlap
            of token sets of attribute values.
 
@@ -355,6 +389,16 @@ class OverlapBlocker(Blocker):
                 If (n_cpus + 1 + n_jobs) is less than 1, then no parallel
                 computation is used (i.e., equivalent to the default).
 
+            l_overlap_index (OverlapIndex): An index built on the overlap
+                attribute of the left table using :meth:`build_index`, with
+                the same tokenization parameters (defaults to None). If an
+                index is given for either table, the token sets of the tuple
+                pairs are compared using the indexes in a single process.
+
+            r_overlap_index (OverlapIndex): An index built on the overlap
+                attribute of the right table using :meth:`build_index`, with
+                the same tokenization parameters (defaults to None).
+
         Returns:
             A candidate set of tuple pairs that survived blocking (DataFrame).
 
@@ -376,6 +420,9 @@ class OverlapBlocker(Blocker):
             AssertionError: If `l_overlap_attr` is not in the ltable
                 columns.
             AssertionError: If `r_block_attr` is not in the rtable columns.
+            AssertionError: If `l_overlap_index` or `r_overlap_index` is not
+                of type OverlapIndex, was not built on the input table, or was
+                built with different tokenization parameters.
             SyntaxError: If `q_val` is set to a valid value and
                 `word_level` is set to True.
             SyntaxError: If `q_val` is set to None and
@@ -394,6 +441,9 @@ class OverlapBlocker(Blocker):
             >>> D3 = ob.block_candset(C, 'name', 'name', n_jobs=-1)
             # Use q-gram tokenizer
             >>> D2 = ob.block_candset(C, 'name', 'name', word_level=False, q_val=2)
+            # Reuse the tokenized tables across blocking calls
+            >>> A_index = ob.build_index(A, 'name')
+            >>> D4 = ob.block_candset(C, 'name', 'name', overlap_size=2, l_overlap_index=A_index)
 
 
         """
@@ -430,6 +480,21 @@ class OverlapBlocker(Blocker):
 
         # do blocking
 
+        # # block using the overlap indexes if given
+        if l_overlap_index is not None or r_overlap_index is not None:
+            l_overlap_index = self._get_overlap_index(
+                l_overlap_index, ltable, l_key, l_overlap_attr,
+                rem_stop_words, q_val, word_level, 'left')
+            r_overlap_index = self._get_overlap_index(
+                r_overlap_index, rtable, r_key, r_overlap_attr,
+                rem_stop_words, q_val, word_level, 'right')
+            out_table = self._block_candset_with_index(
+                candset, fk_ltable, fk_rtable, l_overlap_index,
+                r_overlap_index, overlap_size, allow_missing)
+            cm.set_candset_properties(out_table, key, fk_ltable, fk_rtable,
+                                      ltable, rtable)
+            return out_table
+
         # # do projection before merge
         l_df = ltable[[l_key, l_overlap_attr]]
         r_df = rtable[[r_key, r_overlap_attr]]
@@ -455,12 +520,13 @@ class OverlapBlocker(Blocker):
         overlap_filter = OverlapFilter(tokenizer, overlap_size,
                                        allow_missing=allow_missing)
 
-        # # perform overlap similarity filtering of the candset
+        # # perform overlap similarity filtering of the candset (with an
+        # # executor, py_stringsimjoin reuses its worker processes)
         out_table = overlap_filter.filter_candset(candset, fk_ltable, fk_rtable,
                                                   l_df, r_df, l_key, r_key,
                                                   l_overlap_attr,
                                                   r_overlap_attr,
-                                                  n_jobs,
+                                                  get_num_jobs(n_jobs),
                                                   show_progress=show_progress)
         # update catalog
         cm.set_candset_properties(out_table, key, fk_ltable, fk_rtable, ltable,
@@ -547,8 +613,175 @@ class OverlapBlocker(Blocker):
 
         return overlap_filter.filter_pair(l_val, r_val)
 
+    def build_index(self, table, overlap_attr, rem_stop_words=False,
+                    q_val=None, word_level=True, verbose=False):
+        """
+        Builds an index on the overlap attribute of a table, to block the
+        table several times without cleaning up and tokenizing it again.
+
+        The index holds the token sets of the cleaned up attribute values
+        and an inverted index from the tokens to the tuples. It can be
+        passed to :meth:`block_tables` and :meth:`block_candset` as long as
+        the table is not modified, using the same tokenization parameters.
+        The index can be saved to disk using
+        :meth:`~py_entitymatching.save_object`.
+
+        Args:
+            table (DataFrame): The input table. The key of the table must be
+                set in the catalog.
+
+            overlap_attr (string): The overlap attribute in the table.
+
+            rem_stop_words (boolean): A flag to indicate whether stop words
+                (e.g., a, an, the) should be removed from the token sets of
+                the overlap attribute values (defaults to False).
+
+            q_val (int): The value of q to use if the overlap attribute
+                values are to be tokenized as qgrams (defaults to None).
+
+            word_level (boolean): A flag to indicate whether the overlap
+                attribute should be tokenized as words (i.e, using
+                whitespace as delimiter) (defaults to True).
+
+            verbose (boolean): A flag to indicate whether the debug
+                information should be logged (defaults to False).
+
+        Returns:
+            An OverlapIndex object.
+
+        Raises:
+            AssertionError: If `table` is not of type pandas DataFrame.
+            AssertionError: If `overlap_attr` is not of type string.
+            AssertionError: If `overlap_attr` is not in the table columns.
+            AssertionError: If `q_val` is not of type int.
+            AssertionError: If `word_level` is not of type boolean.
+            SyntaxError: If `q_val` is set to a valid value and
+                `word_level` is set to True.
+            SyntaxError: If `q_val` is set to None and
+                `word_level` is set to False.
+
+        Examples:
+            >>> import py_entitymatching as em
+            >>> A = em.read_csv_metadata('path_to_csv_dir/table_A.csv', key='ID')
+            >>> ob = em.OverlapBlocker()
+            >>> A_index = ob.build_index(A, 'name', rem_stop_words=True)
+            >>> em.save_object(A_index, './A_name_index.pkl')
+
+        See Also:
+            :meth:`~py_entitymatching.OverlapIndex`
+        """
+        validate_object_type(table, pd.DataFrame, error_prefix='Input table')
+        self.validate_types_other_params(overlap_attr, overlap_attr,
+                                         rem_stop_words, q_val, word_level, 1)
+        validate_object_type(verbose, bool, error_prefix='Parameter verbose')
+        if overlap_attr not in table.columns:
+            logger.error('Overlap attribute %s is not in the input table'
+                         % overlap_attr)
+            raise AssertionError('Overlap attribute %s is not in the input '
+                                 'table' % overlap_attr)
+        self.validate_word_level_qval(word_level, q_val)
+
+        key = cm.get_key(table)
+        cm._validate_metadata_for_table(table, key, 'input table', logger,
+                                        verbose)
+        return OverlapIndex(table, key, overlap_attr, rem_stop_words, q_val,
+                            word_level, self.stop_words)
+
     # helper functions
 
+    # get the overlap index of a table, validating the given one or building
+    # a new one if none is given
+    def _get_overlap_index(self, overlap_index, table, key, overlap_attr,
+                           rem_stop_words, q_val, word_level, table_name):
+        if overlap_index is None:
+            return OverlapIndex(table, key, overlap_attr, rem_stop_words,
+                                q_val, word_level, self.stop_words)
+        validate_object_type(overlap_index, OverlapIndex,
+                             error_prefix='Overlap index of %s table'
+                                          % table_name)
+        if overlap_index.key != key or \
+                overlap_index.overlap_attr != overlap_attr or \
+                not overlap_index.matches(table):
+            logger.error('Overlap index of %s table is not built on the '
+                         'overlap attribute of the %s table'
+                         % (table_name, table_name))
+            raise AssertionError('Overlap index of %s table is not built on '
+                                 'the overlap attribute of the %s table'
+                                 % (table_name, table_name))
+        if not overlap_index.has_settings(rem_stop_words, q_val, word_level,
+                                          self.stop_words):
+            logger.error('Overlap index of %s table is built with different '
+                         'tokenization parameters' % table_name)
+            raise AssertionError('Overlap index of %s table is built with '
+                                 'different tokenization parameters'
+                                 % table_name)
+        return overlap_index
+
+    def _block_tables_with_index(self, ltable, rtable, l_key, r_key,
+                                 l_overlap_index, r_overlap_index,
+                                 overlap_size, l_output_attrs, r_output_attrs,
+                                 l_output_prefix, r_output_prefix,
+                                 allow_missing):
+        self.validate_overlap_size(overlap_size)
+        l_pos, r_pos = l_overlap_index.get_overlapping_pairs(r_overlap_index,
+                                                             overlap_size)
+        n_l, n_r = len(l_overlap_index), len(r_overlap_index)
+        if allow_missing and n_l > 0 and n_r > 0:
+            # pair the tuples with missing values with every other tuple
+            l_nulls = np.flatnonzero(l_overlap_index.nulls)
+            r_nulls = np.flatnonzero(r_overlap_index.nulls)
+            pair_ids = np.unique(np.concatenate([
+                l_pos * n_r + r_pos,
+                (l_nulls[:, np.newaxis] * n_r + np.arange(n_r)).ravel(),
+                (np.arange(n_l)[:, np.newaxis] * n_r + r_nulls).ravel()]))
+            l_pos, r_pos = pair_ids // n_r, pair_ids % n_r
+
+        # # get the positions of the tuples in the tables
+        l_rows = pd.Index(ltable[l_key].values).get_indexer(
+            l_overlap_index.keys)[l_pos]
+        r_rows = pd.Index(rtable[r_key].values).get_indexer(
+            r_overlap_index.keys)[r_pos]
+
+        # # construct the candidate set with the required attributes
+        candset = pd.DataFrame()
+        candset[l_output_prefix + l_key] = ltable[l_key].values[l_rows]
+        candset[r_output_prefix + r_key] = rtable[r_key].values[r_rows]
+        if l_output_attrs:
+            for attr in l_output_attrs:
+                if l_output_prefix + attr not in candset.columns:
+                    candset[l_output_prefix + attr] = \
+                        ltable[attr].values[l_rows]
+        if r_output_attrs:
+            for attr in r_output_attrs:
+                if r_output_prefix + attr not in candset.columns:
+                    candset[r_output_prefix + attr] = \
+                        rtable[attr].values[r_rows]
+
+        # update metadata in the catalog
+        key = get_name_for_key(candset.columns)
+        candset = add_key_column(candset, key)
+        cm.set_candset_properties(candset, key, l_output_prefix + l_key,
+                                  r_output_prefix + r_key, ltable, rtable)
+        return candset
+
+    def _block_candset_with_index(self, candset, fk_ltable, fk_rtable,
+                                  l_overlap_index, r_overlap_index,
+                                  overlap_size, allow_missing):
+        self.validate_overlap_size(overlap_size)
+        l_pos = l_overlap_index.get_positions(candset[fk_ltable].values)
+        r_pos = r_overlap_index.get_positions(candset[fk_rtable].values)
+        if (l_pos < 0).any() or (r_pos < 0).any():
+            logger.error('Candset has tuple pairs whose tuples are not in '
+                         'the overlap indexes')
+            raise AssertionError('Candset has tuple pairs whose tuples are '
+                                 'not in the overlap indexes')
+        overlaps = l_overlap_index.get_pair_overlaps(l_pos, r_overlap_index,
+                                                     r_pos)
+        valid = overlaps >= overlap_size
+        has_nulls = l_overlap_index.nulls[l_pos] | r_overlap_index.nulls[r_pos]
+        valid[has_nulls] = allow_missing
+        return candset[valid]
+
     # validate the data types of input parameters specific to overlap blocker
     def validate_types_other_params(self, l_overlap_attr, r_overlap_attr,
                                     rem_stop_words, q_val,
@@ -566,6 +799,13 @@ class OverlapBlocker(Blocker):
         validate_object_type(overlap_size, int, error_prefix='Parameter overlap_size')
 
 
+    # validate the overlap size (when not checked by py_stringsimjoin)
+    def validate_overlap_size(self, overlap_size):
+        if overlap_size <= 0:
+            logger.error('Parameter overlap_size should be greater than 0')
+            raise AssertionError('Parameter overlap_size should be greater '
+                                 'than 0')
+
     # validate the overlap attrs
     def validate_overlap_attrs(self, ltable, rtable, l_overlap_attr,
                                r_overlap_attr):
@@ -600,19 +840,10 @@ class OverlapBlocker(Blocker):
     # cleanup a table from non-ascii characters, punctuations and stop words
     def cleanup_table(self, table, overlap_attr, rem_stop_words):
 
-        # get overlap_attr column
-        attr_col_values = table[overlap_attr]
-
-        values = []
-        for val in attr_col_values:
-            if pd.isnull(val):
-                values.append(val)
-            else:
-                processed_val = self.process_string(val, rem_stop_words)
-                values.append(processed_val)
-
+        # each distinct value is cleaned up only once
         table.is_copy = False
-        table[overlap_attr] = values
+        table[overlap_attr] = clean_column(table[overlap_attr].values,
+                                           rem_stop_words, self.stop_words)
 
     # cleanup a tuple from non-ascii characters, punctuations and stop words
     def cleanup_tuple_val(self, val, rem_stop_words):
@@ -623,31 +854,10 @@ class OverlapBlocker(Blocker):
 
 
     def process_string(self, input_string, rem_stop_words):
-        if not input_string:
-            return input_string
-
-        if isinstance(input_string, bytes):
-            input_string = input_string.decode('utf-8', 'ignore')
-        input_string = input_string.lower()
-
-        input_string = self.rem_punctuations(input_string)
-
-        # remove stopwords
-        # chop the attribute values and convert into a set
-        val_chopped = list(set(input_string.strip().split()))
-
-        # remove stop words
-        if rem_stop_words:
-            val_chopped_no_stopwords = self.rem_stopwords(val_chopped)
-            val_joined = ' '.join(val_chopped_no_stopwords)
-        else:
-            val_joined = ' '.join(val_chopped)
-
-        return val_joined
-
+        return clean_string(input_string, rem_stop_words, self.stop_words)
 
     def rem_punctuations(self, s):
-        return self.regex_punctuation.sub('', s)
+        return remove_punctuations(s)
 
 
 
@@ -0,0 +1,200 @@
+# coding=utf-8
+"""
+This module contains the index used by the overlap blocker to block the
+same tables several times without cleaning up and tokenizing them again.
+"""
+import hashlib
+import logging
+
+import numpy as np
+import pandas as pd
+import py_stringsimjoin as ssj
+from py_stringmatching.tokenizer.qgram_tokenizer import QgramTokenizer
+from py_stringmatching.tokenizer.whitespace_tokenizer import WhitespaceTokenizer
+from scipy import sparse
+
+from py_entitymatching.feature.tokenizedtable import tokenize_column
+from py_entitymatching.utils.string_helper import clean_column
+
+logger = logging.getLogger(__name__)
+
+# The maximum number of (tuple pair, common token) combinations visited at
+# once when probing an overlap index
+_PROBE_BATCH_SIZE = 1000000
+
+
+class OverlapIndex(object):
+    """
+    The cleaned up token sets of an attribute of a table, along with an
+    inverted index from the tokens to the tuples.
+
+    An overlap index is built once per table, attribute and tokenization
+    (using :meth:`~py_entitymatching.OverlapBlocker.build_index`) and can
+    then be passed to :meth:`~py_entitymatching.OverlapBlocker.block_tables`
+    and :meth:`~py_entitymatching.OverlapBlocker.block_candset`, so that
+    blocking the table again (e.g., with a different overlap size or
+    different output attributes) does not clean up and tokenize it again.
+    The index can be saved to disk and loaded back using
+    :meth:`~py_entitymatching.save_object` and
+    :meth:`~py_entitymatching.load_object`.
+
+    The token sets are stored as a sparse matrix with a row per tuple and a
+    column per distinct token, and the inverted index as its transpose.
+
+    Args:
+        table (DataFrame): The input table.
+        key (string): The key attribute of the table.
+        overlap_attr (string): The overlap attribute of the table.
+        rem_stop_words (boolean): A flag to indicate whether the stop words
+            are removed from the token sets (defaults to False).
+        q_val (int): The value of q if the attribute values are tokenized as
+            qgrams (defaults to None).
+        word_level (boolean): A flag to indicate whether the attribute values
+            are tokenized as words (defaults to True).
+        stop_words (list): The stop words to remove (defaults to None).
+
+    Examples:
+        >>> ob = em.OverlapBlocker()
+        >>> A_index = ob.build_index(A, 'name', rem_stop_words=True)
+        >>> C1 = ob.block_tables(A, B, 'name', 'name', rem_stop_words=True, overlap_size=1, l_overlap_index=A_index)
+        >>> C2 = ob.block_tables(A, B, 'name', 'name', rem_stop_words=True, overlap_size=2, l_overlap_index=A_index)
+        >>> em.save_object(A_index, './A_name_index.pkl')
+    """
+
+    def __init__(self, table, key, overlap_attr, rem_stop_words=False,
+                 q_val=None, word_level=True, stop_words=None):
+        self.key = key
+        self.overlap_attr = overlap_attr
+        self.rem_stop_words = rem_stop_words
+        self.q_val = q_val
+        self.word_level = word_level
+        self.stop_words = list(stop_words) if stop_words else None
+        self.fingerprint = get_table_fingerprint(table, key, overlap_attr)
+        self.keys = table[key].values
+
+        # clean up and tokenize the attribute values the same way as the
+        # overlap blocker does
+        values = table[[overlap_attr]].copy()
+        ssj.dataframe_column_to_str(values, overlap_attr, inplace=True)
+        values = clean_column(values[overlap_attr].values, rem_stop_words,
+                              self.stop_words)
+        token_ids = {}
+        indptr, indices, self.nulls = tokenize_column(
+            values, self.get_tokenizer().tokenize, token_ids)
+        self.tokens = np.empty(len(token_ids), dtype=object)
+        self.tokens[list(token_ids.values())] = list(token_ids.keys())
+        self.token_matrix = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.int32), indices, indptr),
+            shape=(len(values), len(token_ids)))
+        self.inverted_index = self.token_matrix.T.tocsr()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get_tokenizer(self):
+        """
+        Get the tokenizer the attribute values are tokenized with.
+        """
+        if self.word_level:
+            return WhitespaceTokenizer(return_set=True)
+        return QgramTokenizer(qval=self.q_val, return_set=True)
+
+    def has_settings(self, rem_stop_words, q_val, word_level, stop_words):
+        """
+        Check whether the index was built with the given tokenization
+        settings.
+        """
+        if (self.rem_stop_words, self.q_val, self.word_level) != \
+                (rem_stop_words, q_val, word_level):
+            return False
+        return not rem_stop_words or self.stop_words == list(stop_words)
+
+    def matches(self, table):
+        """
+        Check whether the index was built on the given table (i.e., whether
+        the table has the same key and overlap attribute values).
+        """
+        if self.key not in table.columns or \
+                self.overlap_attr not in table.columns:
+            return False
+        return self.fingerprint == get_table_fingerprint(table, self.key,
+                                                         self.overlap_attr)
+
+    def get_positions(self, keys):
+        """
+        Get the positions of the tuples with the given keys in the index (-1
+        for the keys that are not in the index).
+        """
+        return pd.Index(self.keys).get_indexer(keys)
+
+    def get_overlapping_pairs(self, other, overlap_size):
+        """
+        Get the positions of the tuple pairs (from this and the other index)
+        whose token sets overlap in at least overlap_size tokens, as two
+        arrays ordered by the positions.
+        """
+        # Probing the inverted index with the token sets of the other index
+        # is a sparse matrix product. It is computed for batches of the
+        # probing tuples, so that only the pairs of one batch that share a
+        # token are held before the overlap size is applied.
+        probes = self._get_mapped_token_matrix(other)
+        posting_lengths = np.diff(self.inverted_index.indptr)
+        probe_costs = probes.dot(posting_lengths)
+        bounds = _get_batch_bounds(probe_costs, _PROBE_BATCH_SIZE)
+        l_pos_list = [np.zeros(0, dtype=np.int64)]
+        r_pos_list = [np.zeros(0, dtype=np.int64)]
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            overlaps = probes[start:end].dot(self.inverted_index).tocoo()
+            keep = overlaps.data >= overlap_size
+            l_pos_list.append(overlaps.col[keep].astype(np.int64))
+            r_pos_list.append(overlaps.row[keep].astype(np.int64) + start)
+        l_pos = np.concatenate(l_pos_list)
+        r_pos = np.concatenate(r_pos_list)
+        order = np.lexsort((r_pos, l_pos))
+        return l_pos[order], r_pos[order]
+
+    def get_pair_overlaps(self, l_pos, other, r_pos):
+        """
+        Get the number of common tokens of each tuple pair, given the
+        positions of the tuples in this and in the other index.
+        """
+        if len(l_pos) == 0:
+            return np.zeros(0, dtype=np.int64)
+        l_tokens = self.token_matrix[l_pos]
+        r_tokens = self._get_mapped_token_matrix(other)[r_pos]
+        return np.asarray(l_tokens.multiply(r_tokens).sum(axis=1),
+                          dtype=np.int64).ravel()
+
+    def _get_mapped_token_matrix(self, other):
+        # Renumber the tokens of the other index into the token ids of this
+        # index, dropping the tokens that this index does not have.
+        token_map = pd.Index(self.tokens).get_indexer(other.tokens)
+        matrix = other.token_matrix.tocoo()
+        cols = token_map[matrix.col]
+        keep = cols >= 0
+        return sparse.csr_matrix(
+            (matrix.data[keep], (matrix.row[keep], cols[keep])),
+            shape=(len(other), len(self.tokens)))
+
+
+def get_table_fingerprint(table, key, attr):
+    """
+    Get a hash of the key and the attribute values of a table (regardless of
+    the order of the tuples, as the index finds the tuples by their keys).
+    """
+    hashes = pd.util.hash_pandas_object(table[[key, attr]], index=False)
+    return len(table), hashlib.sha1(
+        np.sort(hashes.values).tobytes()).hexdigest()
+
+
+def _get_batch_bounds(costs, batch_size):
+    # split the rows into consecutive batches whose total cost is at most
+    # batch_size (or a single row, if it costs more)
+    cum_costs = np.cumsum(costs)
+    bounds = [0]
+    while bounds[-1] < len(cum_costs):
+        start = bounds[-1]
+        base = cum_costs[start - 1] if start > 0 else 0
+        end = np.searchsorted(cum_costs, base + batch_size, side='right')
+        bounds.append(max(int(end), start + 1))
+    return bounds
@@ -0,0 +1,188 @@
+# coding=utf-8
+"""
+This module contains the prefilters that the black box blocker can use to
+find the candidate tuple pairs of two tables using an index, instead of
+applying the black box function to all the tuple pairs.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+import six
+
+from py_entitymatching.blocker.overlap_blocker import OverlapBlocker
+from py_entitymatching.utils.generic_helper import get_value_codes
+from py_entitymatching.utils.validation_helper import validate_object_type
+
+logger = logging.getLogger(__name__)
+
+
+class Prefilter(object):
+    """
+    Prefilter base class.
+
+    A prefilter finds the candidate tuple pairs of two tables cheaply (e.g.,
+    using an index), such that the tuple pairs it does not return would be
+    dropped by the black box function anyway.
+    """
+
+    def __init__(self, l_attr, r_attr):
+        validate_object_type(l_attr, six.string_types,
+                             error_prefix='Prefilter attribute of left table')
+        validate_object_type(r_attr, six.string_types,
+                             error_prefix='Prefilter attribute of right table')
+        self.l_attr = l_attr
+        self.r_attr = r_attr
+
+    def get_candidate_pairs(self, ltable, rtable):
+        """
+        Get the positions (in the tables) of the candidate tuple pairs, as
+        two arrays ordered by the positions.
+        """
+        raise NotImplementedError
+
+    def validate_attrs(self, ltable, rtable):
+        if self.l_attr not in ltable.columns:
+            logger.error('Prefilter attribute %s is not in the left table'
+                         % self.l_attr)
+            raise AssertionError('Prefilter attribute %s is not in the left '
+                                 'table' % self.l_attr)
+        if self.r_attr not in rtable.columns:
+            logger.error('Prefilter attribute %s is not in the right table'
+                         % self.r_attr)
+            raise AssertionError('Prefilter attribute %s is not in the right '
+                                 'table' % self.r_attr)
+
+
+class EqualityPrefilter(Prefilter):
+    """
+    Finds the tuple pairs with equal values in the given attributes (the
+    tuples with missing values are not paired).
+
+    Args:
+        l_attr (string): The attribute of the left table.
+        r_attr (string): The attribute of the right table.
+
+    Examples:
+        >>> bb = em.BlackBoxBlocker()
+        >>> bb.set_black_box_function(match_last_name)
+        >>> bb.set_prefilter(em.EqualityPrefilter('zipcode', 'zipcode'))
+        >>> C = bb.block_tables(A, B)
+    """
+
+    def get_candidate_pairs(self, ltable, rtable):
+        self.validate_attrs(ltable, rtable)
+        l_codes, r_codes = get_value_codes(ltable[self.l_attr].values,
+                                            rtable[self.r_attr].values)
+        l_df = pd.DataFrame({'code': l_codes, 'l_pos': np.arange(len(l_codes))})
+        r_df = pd.DataFrame({'code': r_codes, 'r_pos': np.arange(len(r_codes))})
+        pairs = pd.merge(l_df[l_codes >= 0], r_df[r_codes >= 0], on='code')
+        return _sort_pairs(pairs['l_pos'].values, pairs['r_pos'].values)
+
+
+class RangePrefilter(Prefilter):
+    """
+    Finds the tuple pairs whose numeric values in the given attributes differ
+    by at most max_diff (the tuples with missing values are not paired).
+
+    Args:
+        l_attr (string): The numeric attribute of the left table.
+        r_attr (string): The numeric attribute of the right table.
+        max_diff (number): The maximum difference between the values.
+
+    Examples:
+        >>> bb = em.BlackBoxBlocker()
+        >>> bb.set_black_box_function(match_last_name)
+        >>> bb.set_prefilter(em.RangePrefilter('birth_year', 'birth_year', 2))
+        >>> C = bb.block_tables(A, B)
+    """
+
+    def __init__(self, l_attr, r_attr, max_diff):
+        super(RangePrefilter, self).__init__(l_attr, r_attr)
+        if not isinstance(max_diff, (six.integer_types, float)) or \
+                isinstance(max_diff, bool) or max_diff < 0:
+            logger.error('Parameter max_diff should be a non-negative number')
+            raise AssertionError('Parameter max_diff should be a '
+                                 'non-negative number')
+        self.max_diff = max_diff
+
+    def get_candidate_pairs(self, ltable, rtable):
+        self.validate_attrs(ltable, rtable)
+        for table, attr in [(ltable, self.l_attr), (rtable, self.r_attr)]:
+            if not pd.api.types.is_numeric_dtype(table[attr]):
+                logger.error('Prefilter attribute %s is not numeric' % attr)
+                raise AssertionError('Prefilter attribute %s is not numeric'
+                                     % attr)
+        l_vals = ltable[self.l_attr].values.astype(np.float64)
+        r_vals = rtable[self.r_attr].values.astype(np.float64)
+
+        # probe the sorted right values with the range of each left value
+        r_order = np.argsort(r_vals, kind='stable')
+        r_order = r_order[~np.isnan(r_vals[r_order])]
+        r_sorted = r_vals[r_order]
+        l_nonnull = np.flatnonzero(~np.isnan(l_vals))
+        starts = np.searchsorted(r_sorted, l_vals[l_nonnull] - self.max_diff,
+                                 side='left')
+        ends = np.searchsorted(r_sorted, l_vals[l_nonnull] + self.max_diff,
+                               side='right')
+        counts = ends - starts
+        l_pos = np.repeat(l_nonnull, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts,
+                                                      counts)
+        r_pos = r_order[np.repeat(starts, counts) + offsets]
+        return _sort_pairs(l_pos, r_pos)
+
+
+class OverlapPrefilter(Prefilter):
+    """
+    Finds the tuple pairs whose token sets of the given attributes overlap
+    in at least overlap_size tokens, the same way as
+    :meth:`~py_entitymatching.OverlapBlocker.block_tables` (the tuples with
+    missing values are not paired).
+
+    Args:
+        l_attr (string): The attribute of the left table.
+        r_attr (string): The attribute of the right table.
+        overlap_size (int): The minimum number of tokens that must overlap
+            (defaults to 1).
+        rem_stop_words (boolean): A flag to indicate whether stop words
+            should be removed from the token sets (defaults to False).
+        q_val (int): The value of q to use if the attribute values are to be
+            tokenized as qgrams (defaults to None).
+        word_level (boolean): A flag to indicate whether the attribute values
+            should be tokenized as words (defaults to True).
+
+    Examples:
+        >>> bb = em.BlackBoxBlocker()
+        >>> bb.set_black_box_function(match_last_name)
+        >>> bb.set_prefilter(em.OverlapPrefilter('name', 'name', rem_stop_words=True))
+        >>> C = bb.block_tables(A, B)
+    """
+
+    def __init__(self, l_attr, r_attr, overlap_size=1, rem_stop_words=False,
+                 q_val=None, word_level=True):
+        super(OverlapPrefilter, self).__init__(l_attr, r_attr)
+        self.overlap_blocker = OverlapBlocker()
+        self.overlap_blocker.validate_types_other_params(
+            l_attr, r_attr, rem_stop_words, q_val, word_level, overlap_size)
+        self.overlap_blocker.validate_word_level_qval(word_level, q_val)
+        self.overlap_blocker.validate_overlap_size(overlap_size)
+        self.overlap_size = overlap_size
+        self.rem_stop_words = rem_stop_words
+        self.q_val = q_val
+        self.word_level = word_level
+
+    def get_candidate_pairs(self, ltable, rtable):
+        self.validate_attrs(ltable, rtable)
+        l_index, r_index = [
+            self.overlap_blocker.build_index(table, attr, self.rem_stop_words,
+                                             self.q_val, self.word_level)
+            for table, attr in [(ltable, self.l_attr), (rtable, self.r_attr)]]
+        return l_index.get_overlapping_pairs(r_index, self.overlap_size)
+
+
+def _sort_pairs(l_pos, r_pos):
+    # order the tuple pairs by the positions of the tuples
+    order = np.lexsort((r_pos, l_pos))
+    return (np.asarray(l_pos, dtype=np.int64)[order],
+            np.asarray(r_pos, dtype=np.int64)[order])
@@ -1,24 +1,56 @@
 import logging
+import operator
+import re
+import timeit
 from collections import OrderedDict
 
 import pandas as pd
 import numpy as np
 import pyprind
 import six
-from joblib import Parallel, delayed
-from py_stringmatching.tokenizer.qgram_tokenizer import QgramTokenizer
-from py_stringmatching.tokenizer.whitespace_tokenizer import WhitespaceTokenizer
+from joblib import delayed
 import cloudpickle as cp
-import pickle
 
 import py_entitymatching.catalog.catalog_manager as cm
 from py_entitymatching.blocker.blocker import Blocker
+from py_entitymatching.feature.extractfeatures import _get_batch_spec, \
+    _apply_feat_batch
+from py_entitymatching.feature.tokenizers import _get_join_tokenizer
+import py_stringmatching as sm
 import py_stringsimjoin as ssj
 from py_entitymatching.utils.catalog_helper import log_info, get_name_for_key, add_key_column
-from py_entitymatching.utils.generic_helper import parse_conjunct
+from py_entitymatching.utils.executor import run_parallel, share_object, \
+    share_pickled_object, get_shared_object, loads_shared_object
+from py_entitymatching.utils.generic_helper import parse_conjunct, \
+    split_candset_by_ltable, project_to_keys, get_value_codes, TupleLookup
+from py_entitymatching.utils.validation_helper import validate_object_type
 
 logger = logging.getLogger(__name__)
 
+# The conjuncts that compare a feature with a numeric threshold, which can be
+# evaluated column-wise over a candset
+_CONJUNCT_PATTERN = re.compile(
+    r'^\s*(\w+)\s*\(\s*ltuple\s*,\s*rtuple\s*\)\s*(<=|>=|==|!=|<|>)\s*(\S+)\s*$')
+_COMPARISON_OPS = {'<': operator.lt, '<=': operator.le, '>': operator.gt,
+                   '>=': operator.ge, '==': operator.eq, '!=': operator.ne}
+
+# The number of tuple pairs used to estimate the cost and the selectivity of
+# the conjuncts of the rules
+_SAMPLE_SIZE = 1000
+
+# The number of candidate tuple pairs of each join used to estimate the
+# number of pairs the join outputs when blocking two tables
+_JOIN_SAMPLE_SIZE = 10000
+
+# The string similarity joins finding the pairs surviving the filterable
+# conjuncts of each sim function
+_SIM_JOIN_FNS = {'jaccard': ssj.jaccard_join, 'cosine': ssj.cosine_join,
+                 'dice': ssj.dice_join,
+                 'overlap_coeff': ssj.overlap_coefficient_join,
+                 'lev_dist': ssj.edit_distance_join}
+
+_LEVENSHTEIN = sm.Levenshtein()
+
 
 class RuleBasedBlocker(Blocker):
     """
@@ -252,6 +284,115 @@ class RuleBasedBlocker(Blocker):
                 'existing rules')
         self.feature_table = feature_table
 
+    def explain_rules(self, ltable, rtable):
+        """Describes how each rule is applied when blocking the given tables
+        or a candidate set of tuple pairs.
+
+        When blocking two tables, the filterable rule estimated to keep the
+        fewest tuple pairs is applied using joins, and the other rules are
+        then applied to its output, column-wise or pair by pair. If no rule is
+        filterable, all the rules are applied to each tuple pair of the
+        tables.
+
+            Args:
+               ltable (DataFrame): The left input table.
+               rtable (DataFrame): The right input table.
+
+            Returns:
+               A DataFrame with a row per rule, containing the name of the
+               rule, whether it is filterable, the joins used to apply it (or
+               the reason why it is not filterable), and how it is applied by
+               block_tables and block_candset.
+
+            Raises:
+               AssertionError: If `ltable` is not of type pandas DataFrame.
+               AssertionError: If `rtable` is not of type pandas DataFrame.
+               AssertionError: If there are no rules to apply.
+
+            Examples:
+                >>> import py_entitymatching as em
+                >>> rb = em.RuleBasedBlocker()
+                >>> A = em.read_csv_metadata('path_to_csv_dir/table_A.csv', key='id')
+                >>> B = em.read_csv_metadata('path_to_csv_dir/table_B.csv', key='id')
+                >>> block_f = em.get_features_for_blocking(A, B)
+                >>> rule = ['name_name_jac_qgm_2_qgm_2(ltuple, rtuple) < 0.3']
+                >>> rb.add_rule(rule, block_f, rule_name='rule_1')
+                >>> rb.explain_rules(A, B)
+        """
+        validate_object_type(ltable, pd.DataFrame,
+                             error_prefix='Input left table')
+        validate_object_type(rtable, pd.DataFrame,
+                             error_prefix='Input right table')
+        assert len(self.rules.keys()) > 0, 'There are no rules to apply'
+
+        l_key, r_key = cm.get_keys_for_ltable_rtable(ltable, rtable, logger,
+                                                     False)
+        rule_names = list(self.rules.keys())
+        col_rules, _ = self.get_columnwise_rules(rule_names)
+        col_rule_names = set(rule_name for rule_name, _ in col_rules)
+
+        filters = OrderedDict()
+        for rule_name in rule_names:
+            joins = []
+            for conjunct in self.rule_str[rule_name]:
+                join, reason = self.explain_conjunct_filter(conjunct,
+                                                            rule_name)
+                if join is None:
+                    joins = None
+                    filters[rule_name] = (False, reason)
+                    break
+                joins.append(join)
+            if joins is not None:
+                filters[rule_name] = (True, ', '.join(joins))
+
+        filterable_rules = [rule_name for rule_name in rule_names
+                            if filters[rule_name][0]]
+        rule_to_filter = None
+        if len(filterable_rules) > 0:
+            rule_to_filter = self.get_rule_to_filter(
+                filterable_rules, ltable.set_index(l_key, drop=False),
+                rtable.set_index(r_key, drop=False))
+
+        rows = []
+        for rule_name in rule_names:
+            is_filterable, join = filters[rule_name]
+            block_candset = 'column-wise' if rule_name in col_rule_names \
+                else 'per pair'
+            if rule_to_filter is None:
+                block_tables = 'per pair over all the tuple pairs'
+            elif rule_name == rule_to_filter:
+                block_tables = 'join'
+            else:
+                block_tables = block_candset + ' over the join output'
+            rows.append([rule_name, is_filterable, join, block_tables,
+                         block_candset])
+        return pd.DataFrame(rows, columns=['rule_name', 'is_filterable',
+                                           'join', 'block_tables',
+                                           'block_candset'])
+
+    def explain_conjunct_filter(self, conjunct, rule_name):
+        # describe the join finding the pairs surviving a conjunct, or the
+        # reason why the conjunct is not filterable
+        sim_fn, tokenizer, reason = self.get_conjunct_filter(conjunct,
+                                                             rule_name)
+        if sim_fn is None:
+            return None, reason
+        is_auto_gen, sim_fn, l_attr, r_attr, l_tok, r_tok, op, th = parse_conjunct(
+            conjunct, self.rule_ft[rule_name])
+        attrs = ' on ' + str(l_attr) + ', ' + str(r_attr)
+        if sim_fn == 'exact_match':
+            if _COMPARISON_OPS[op](1, float(th)):
+                return 'pairs with missing values' + attrs, None
+            return 'equi-join' + attrs, None
+        if sim_fn == 'lev_dist':
+            comp_op = '<' if op == '>=' else '<='
+            return 'edit_distance_join' + attrs + ' (' + sim_fn + ' ' + \
+                   comp_op + ' ' + str(th) + ')', None
+        comp_op = '>' if op == '<=' else '>='
+        return _SIM_JOIN_FNS[sim_fn].__name__ + attrs + ' with ' + \
+               str(l_tok) + ' tokens (' + sim_fn + ' ' + comp_op + ' ' + \
+               str(th) + ')', None
+
     def block_tables(self, ltable, rtable, l_output_attrs=None,
                      r_output_attrs=None,
                      l_output_prefix='ltable_', r_output_prefix='rtable_',
@@ -264,6 +405,14 @@ class RuleBasedBlocker(Blocker):
         if none of the rules in the sequence returns True for that pair. If any
         of the rules returns True, then the pair is blocked.
 
+        If some rules are filterable (i.e., the pairs surviving them can be
+        found with a string similarity join or an equi-join), the one
+        estimated (from the frequencies of the values or tokens joined on) to
+        keep the fewest pairs is applied using joins, and the other rules are
+        then applied to its output. Otherwise, the rules are applied to all
+        the tuple pairs. Use :meth:`explain_rules` to see how each rule is
+        applied.
+
         Args:
             ltable (DataFrame): The left input table.
 
@@ -404,6 +553,8 @@ class RuleBasedBlocker(Blocker):
 
         if candset is None:
             # no filterable rule was applied
+            log_info(logger, 'No filterable rule, applying the rules to all '
+                             'the tuple pairs', verbose)
             candset = self.block_tables_without_filters(l_df, r_df, l_key,
                                                         r_key, l_output_attrs_1,
                                                         r_output_attrs_1,
@@ -440,7 +591,8 @@ class RuleBasedBlocker(Blocker):
 
     def block_candset_excluding_rule(self, c_df, l_df, r_df, l_key, r_key,
                                      fk_ltable, fk_rtable, rule_to_exclude,
-                                     show_progress, n_jobs):
+                                     show_progress, n_jobs,
+                                     group_by_ltable=False):
 
         # # determine number of processes to launch parallely
         n_procs = self.get_num_procs(n_jobs, len(c_df))
@@ -448,31 +600,59 @@ class RuleBasedBlocker(Blocker):
         # # list to keep track of valid ids
         valid = []
 
-
-        apply_rules_excluding_rule_pkl = cp.dumps(self.apply_rules_excluding_rule)
+        # # the rules whose conjuncts can be evaluated column-wise are
+        # # evaluated first, in the order estimated to be the cheapest, and
+        # # the other rules are then applied to the surviving pairs
+        rule_names = [rule_name for rule_name in self.rules.keys()
+                      if rule_name != rule_to_exclude]
+        col_rules, feature_specs = self.get_columnwise_rules(rule_names)
+        if len(col_rules) > 0:
+            col_rules = _order_rules(col_rules, feature_specs, c_df, l_df,
+                                     r_df, fk_ltable, fk_rtable)
+        rule_plan_pkl = cp.dumps((col_rules, feature_specs))
+
+        rules_to_exclude = [rule_to_exclude] + [rule_name for rule_name, _
+                                                in col_rules]
+        apply_rules_excluding_rule_pkl = None
+        if len(col_rules) < len(rule_names):
+            apply_rules_excluding_rule_pkl = cp.dumps(
+                self.apply_rules_excluding_rule)
  
-        if n_procs <= 1:
+        if group_by_ltable:
+            # group the pairs by ltable tuple, and give each job only the
+            # tuples referred to by its pairs
+            c_splits, order = split_candset_by_ltable(c_df, fk_ltable,
+                                                      max(n_procs, 1))
+            l_splits = [project_to_keys(l_df, c_split[fk_ltable])
+                        for c_split in c_splits]
+            r_splits = [project_to_keys(r_df, c_split[fk_rtable])
+                        for c_split in c_splits]
+            valid_splits = _block_candset_excluding_rule_splits(
+                c_splits, l_splits, r_splits, l_key, r_key, fk_ltable,
+                fk_rtable, rules_to_exclude, apply_rules_excluding_rule_pkl,
+                rule_plan_pkl, show_progress, n_procs)
+            # # put the results back in the order of the candset
+            valid = np.empty(len(c_df), dtype=bool)
+            valid[order] = sum(valid_splits, [])
+            valid = list(valid)
+        elif n_procs <= 1:
             # single process
             valid = _block_candset_excluding_rule_split(c_df, l_df, r_df,
                                                         l_key, r_key,
                                                         fk_ltable, fk_rtable,
-                                                        rule_to_exclude,
+                                                        rules_to_exclude,
                                                         apply_rules_excluding_rule_pkl,
+                                                        rule_plan_pkl,
                                                         show_progress)
         else:
             # multiprocessing
             c_splits = np.array_split(c_df, n_procs)
-            valid_splits = Parallel(n_jobs=n_procs)(
-                delayed(_block_candset_excluding_rule_split)(c_splits[i],
-                                                             l_df, r_df,
-                                                             l_key, r_key,
-                                                             fk_ltable,
-                                                             fk_rtable,
-                                                             rule_to_exclude,
-                                                             apply_rules_excluding_rule_pkl,
-                                                             show_progress and i == len(
-                                                                 c_splits) - 1)
-                for i in range(len(c_splits)))
+            l_df, r_df = share_object(l_df), share_object(r_df)
+            valid_splits = _block_candset_excluding_rule_splits(
+                c_splits, [l_df] * len(c_splits), [r_df] * len(c_splits),
+                l_key, r_key, fk_ltable, fk_rtable, rules_to_exclude,
+                apply_rules_excluding_rule_pkl, rule_plan_pkl, show_progress,
+                n_procs)
             valid = sum(valid_splits, [])
 
         # construct output candset
@@ -484,6 +664,48 @@ class RuleBasedBlocker(Blocker):
         # return candidate set
         return candset
 
+    def get_columnwise_rules(self, rule_names):
+        # get the rules whose conjuncts all compare a feature that can be
+        # computed column-wise with a numeric threshold, as (rule name, list
+        # of (feature name, operator, threshold)) tuples, along with the
+        # specs of the features they use
+        col_rules = []
+        feature_specs = {}
+        for rule_name in rule_names:
+            conjuncts = []
+            rule_specs = {}
+            for conjunct in self.rule_str[rule_name]:
+                match = _CONJUNCT_PATTERN.match(conjunct)
+                if match is None:
+                    break
+                feature_name, op, th = match.groups()
+                try:
+                    th = float(th)
+                except ValueError:
+                    break
+                spec = self.get_feature_spec(rule_name, feature_name)
+                if spec is None:
+                    break
+                conjuncts.append((feature_name, op, th))
+                rule_specs[feature_name] = spec
+            else:
+                # # a feature name must refer to the same feature in all the
+                # # rules, as the feature values are shared by the rules
+                if all(feature_specs.get(name, spec) == spec
+                       for name, spec in six.iteritems(rule_specs)):
+                    col_rules.append((rule_name, conjuncts))
+                    feature_specs.update(rule_specs)
+        return col_rules, feature_specs
+
+    def get_feature_spec(self, rule_name, feature_name):
+        # get the spec to compute a feature of a rule column-wise, or None if
+        # it must be computed pair by pair
+        feature_table = self.rule_ft[rule_name]
+        features = feature_table[feature_table['feature_name'] == feature_name]
+        if len(features) != 1:
+            return None
+        return _get_batch_spec(features.iloc[0])
+
     def block_tables_without_filters(self, l_df, r_df, l_key, r_key,
                                      l_output_attrs, r_output_attrs,
                                      l_output_prefix, r_output_prefix,
@@ -507,9 +729,12 @@ class RuleBasedBlocker(Blocker):
         else:
             # multiprocessing
             m, n = self.get_split_params(n_procs, len(l_df), len(r_df))
-            l_splits = np.array_split(l_df, m)
-            r_splits = np.array_split(r_df, n)
-            c_splits = Parallel(n_jobs=m * n)(
+            l_splits = [share_object(l_split)
+                        for l_split in np.array_split(l_df, m)]
+            r_splits = [share_object(r_split)
+                        for r_split in np.array_split(r_df, n)]
+            apply_rules_pkl = share_pickled_object(apply_rules_pkl)
+            c_splits = run_parallel((
                 delayed(_block_tables_split)(l_splits[i], r_splits[j],
                                              l_key, r_key,
                                              l_output_attrs, r_output_attrs,
@@ -518,14 +743,15 @@ class RuleBasedBlocker(Blocker):
                                              show_progress and i == len(
                                                  l_splits) - 1 and j == len(
                                                  r_splits) - 1)
-                for i in range(len(l_splits)) for j in range(len(r_splits)))
+                for i in range(len(l_splits)) for j in range(len(r_splits))),
+                m * n)
             candset = pd.concat(c_splits, ignore_index=True)
 
         # return candidate set
         return candset
 
     def block_candset(self, candset, verbose=False, show_progress=True,
-                      n_jobs=1):
+                      n_jobs=1, group_by_ltable=False):
         """
         Blocks an input candidate set of tuple pairs based on a sequence of
         blocking rules supplied by the user.
@@ -536,6 +762,14 @@ class RuleBasedBlocker(Blocker):
         True for that pair. If any of the rules returns True, then the pair is
         blocked (dropped).
 
+        The rules whose conjuncts compare an automatically generated feature
+        with a numeric threshold (e.g., 'name_name_lev(ltuple, rtuple) > 3')
+        are evaluated column-wise over the candidate set, computing each
+        feature once per pair and only for the pairs that are not decided
+        yet. The conjuncts and the rules are evaluated in the order estimated
+        (over a sample of the candidate set) to be the cheapest. The other
+        rules are then applied to each surviving tuple pair.
+
         Args:
             candset (DataFrame): The input candidate set of tuple pairs.
             verbose (boolean): A flag to indicate whether the debug
@@ -552,7 +786,11 @@ class RuleBasedBlocker(Blocker):
                 If (n_cpus + 1 + n_jobs) is less than 1, then no parallel
                 computation is used (i.e., equivalent to the default).
 
-
+            group_by_ltable (boolean): A flag to indicate whether the tuple
+                pairs should be processed grouped by their ltable tuple
+                (defaults to False). If True, all the pairs of an ltable
+                tuple are processed together by the same job, and each job
+                gets only the tuples its pairs refer to.
 
         Returns:
             A candidate set of tuple pairs that survived blocking (DataFrame).
@@ -565,6 +803,7 @@ class RuleBasedBlocker(Blocker):
             AssertionError: If `n_jobs` is not of type
                 int.
             AssertionError: If `show_progress` is not of type boolean.
+            AssertionError: If `group_by_ltable` is not of type boolean.
             AssertionError: If `l_block_attr` is not in the ltable columns.
             AssertionError: If `r_block_attr` is not in the rtable columns.
             AssertionError: If there are no rules to apply.
@@ -585,6 +824,8 @@ class RuleBasedBlocker(Blocker):
         # validate data types of input parameters
         self.validate_types_params_candset(candset, verbose, show_progress,
                                            n_jobs)
+        validate_object_type(group_by_ltable, bool,
+                             'Parameter group_by_ltable')
 
         # get and validate metadata
         log_info(logger, 'Required metadata: cand.set key, fk ltable, ' +
@@ -620,7 +861,8 @@ class RuleBasedBlocker(Blocker):
         c_df = self.block_candset_excluding_rule(candset, l_df, r_df, l_key,
                                                  r_key,
                                                  fk_ltable, fk_rtable, None,
-                                                 show_progress, n_jobs)
+                                                 show_progress, n_jobs,
+                                                 group_by_ltable)
 
         # update catalog
         cm.set_candset_properties(c_df, key, fk_ltable, fk_rtable, ltable,
@@ -668,8 +910,11 @@ class RuleBasedBlocker(Blocker):
         return False
 
     def apply_rules_excluding_rule(self, ltuple, rtuple, rule_to_exclude):
+        # the rule to exclude can also be a list of rules to exclude
+        if not isinstance(rule_to_exclude, list):
+            rule_to_exclude = [rule_to_exclude]
         for rule_name in self.rules.keys():
-            if rule_name != rule_to_exclude:
+            if rule_name not in rule_to_exclude:
                 fn = self.rules[rule_name]
                 # here if fn returns true, then the tuple pair must be dropped.
                 res = fn(ltuple, rtuple)
@@ -701,20 +946,62 @@ class RuleBasedBlocker(Blocker):
                                   l_output_attrs, r_output_attrs,
                                   l_output_prefix, r_output_prefix, verbose,
                                   show_progress, n_jobs):
-        for rule_name in self.rules.keys():
-            # first check if a rule is filterable
-            if self.is_rule_filterable(rule_name):
-                candset = self.apply_filterable_rule(rule_name, l_df, r_df,
-                                                     l_key, r_key,
-                                                     l_output_attrs,
-                                                     r_output_attrs,
-                                                     l_output_prefix,
-                                                     r_output_prefix, verbose,
-                                                     show_progress, n_jobs)
-                if candset is not None:
-                    # rule was filterable
-                    return candset, rule_name
-        return None, None
+        # a pair survives the rules only if it survives each of them, so a
+        # single filterable rule is enough to get the candidate pairs, which
+        # the other rules are then applied to
+        filterable_rules = [rule_name for rule_name in self.rules.keys()
+                            if self.is_rule_filterable(rule_name)]
+        if len(filterable_rules) == 0:
+            return None, None
+
+        rule_name = self.get_rule_to_filter(filterable_rules, l_df, r_df)
+        log_info(logger, 'Applying filterable rule ' + str(rule_name) +
+                 ' to get the candidate pairs', verbose)
+        candset = self.apply_filterable_rule(rule_name, l_df, r_df,
+                                             l_key, r_key,
+                                             l_output_attrs,
+                                             r_output_attrs,
+                                             l_output_prefix,
+                                             r_output_prefix, verbose,
+                                             show_progress, n_jobs)
+        return candset, rule_name
+
+    def get_rule_to_filter(self, rule_names, l_df, r_df):
+        # get the filterable rule whose joins output the fewest tuple pairs
+        # (the first rule, if the estimates are the same). A pair survives a
+        # rule if it survives any of its conjuncts, so the output size of a
+        # rule is estimated as the sum of the output sizes of its joins.
+        n_pairs = len(l_df) * len(r_df)
+        if len(rule_names) == 1 or n_pairs == 0:
+            return rule_names[0]
+        rng = np.random.RandomState(0)
+        n_kept = {}
+        for rule_name in rule_names:
+            n_kept[rule_name] = min(n_pairs, sum(
+                self.estimate_join_size(conjunct, rule_name, l_df, r_df, rng)
+                for conjunct in self.rule_str[rule_name]))
+        return min(rule_names, key=lambda rule_name: n_kept[rule_name])
+
+    def estimate_join_size(self, conjunct, rule_name, l_df, r_df, rng):
+        # estimate the number of tuple pairs output by the join finding the
+        # pairs surviving a filterable conjunct
+        is_auto_gen, sim_fn, l_attr, r_attr, l_tok, r_tok, op, th = parse_conjunct(
+            conjunct, self.rule_ft[rule_name])
+        if sim_fn == 'exact_match':
+            keep_equal = not _COMPARISON_OPS[op](1, float(th))
+            return _estimate_equi_join_size(l_df[l_attr].values,
+                                            r_df[r_attr].values, keep_equal)
+        sim_fn, tokenizer, _ = self.get_conjunct_filter(conjunct, rule_name)
+        if sim_fn == 'lev_dist':
+            comp_op = '<' if op == '>=' else '<='
+            tokenizer = sm.QgramTokenizer(qval=2, return_set=True)
+        else:
+            comp_op = '>' if op == '<=' else '>='
+        l_values = ssj.dataframe_column_to_str(l_df, l_attr, return_col=True)
+        r_values = ssj.dataframe_column_to_str(r_df, r_attr, return_col=True)
+        return _estimate_sim_join_size(l_values.values, r_values.values,
+                                       sim_fn, tokenizer, comp_op, float(th),
+                                       rng)
 
     def is_rule_filterable(self, rule_name):
         # a rule is filterable if all the conjuncts in the conjunct list
@@ -727,31 +1014,48 @@ class RuleBasedBlocker(Blocker):
         return True
 
     def is_conjunct_filterable(self, conjunct, rule_name):
-        # a conjunct is filterable if it uses
+        return self.get_conjunct_filter(conjunct, rule_name)[0] is not None
+
+    def get_conjunct_filter(self, conjunct, rule_name):
+        # get how the pairs surviving a conjunct can be found with a join, as
+        # (sim function, tokenizer to join with) and None, or (None, None)
+        # and the reason why the conjunct is not filterable. A conjunct is
+        # filterable if it uses
         # a filterable sim function (jaccard, cosine, dice, ...),
         # an allowed operator (<, <=),
+        # a tokenizer that can be used by the string similarity joins
         is_auto_gen, sim_fn, l_attr, r_attr, l_tok, r_tok, op, th = parse_conjunct(
             conjunct, self.rule_ft[rule_name])
         if is_auto_gen != True:
-            # conjunct not filterable as the feature is not auto generated
-            return False
+            return None, None, 'feature is not auto generated'
+        if sim_fn == 'exact_match':
+            # conjunct filterable if the pairs with different values are
+            # dropped, as the other pairs can be found with an equi-join
+            try:
+                if _COMPARISON_OPS[op](0, float(th)) == True:
+                    return sim_fn, None, None
+            except (KeyError, ValueError):
+                pass
+            return None, None, 'pairs with different values are not dropped'
         if sim_fn == 'lev_dist':
             if op == '>' or op == '>=':
-                return True
-            else:
-                # conjunct not filterable due to unsupported operator
-                return False
+                return sim_fn, None, None
+            return None, None, 'unsupported operator ' + str(op)
         if l_tok != r_tok:
-            # conjunct not filterable because left and right tokenizers mismatch
-            return False
+            return None, None, 'left and right tokenizers mismatch'
         if sim_fn not in self.filterable_sim_fns:
-            # conjunct not filterable due to unsupported sim_fn
-            return False
+            return None, None, 'unsupported sim function ' + str(sim_fn)
         if op not in self.allowed_ops:
-            # conjunct not filterable due to unsupported operator
-            return False
+            return None, None, 'unsupported operator ' + str(op)
+        feature_name = conjunct.split('(')[0].strip()
+        spec = self.get_feature_spec(rule_name, feature_name)
+        tokenizer = None
+        if spec is not None:
+            tokenizer = _get_join_tokenizer(spec['left_tok_fn'])
+        if tokenizer is None:
+            return None, None, 'unsupported tokenizer ' + str(l_tok)
         # conjunct is filterable
-        return True
+        return sim_fn, tokenizer, None
 
     def apply_filterable_rule(self, rule_name, l_df, r_df, l_key, r_key,
                               l_output_attrs, r_output_attrs,
@@ -763,21 +1067,21 @@ class RuleBasedBlocker(Blocker):
             is_auto_gen, sim_fn, l_attr, r_attr, l_tok, r_tok, op, th = parse_conjunct(
                 conjunct, self.rule_ft[rule_name])
 
-            if l_tok == 'dlm_dc0':
-                tokenizer = WhitespaceTokenizer(return_set=True)
-            elif l_tok == 'qgm_3':
-                tokenizer = QgramTokenizer(qval=3, return_set=True)
-
-            if sim_fn == 'jaccard':
-                join_fn = ssj.jaccard_join
-            elif sim_fn == 'cosine':
-                join_fn = ssj.cosine_join
-            elif sim_fn == 'dice':
-                join_fn = ssj.dice_join
-            elif sim_fn == 'overlap_coeff':
-                join_fn = ssj.overlap_coefficient_join
-            elif sim_fn == 'lev_dist':
-                join_fn = ssj.edit_distance_join
+            if sim_fn == 'exact_match':
+                # the pairs with equal values survive the conjunct if it is
+                # False for them, and the pairs with missing values always do
+                keep_equal = not _COMPARISON_OPS[op](1, float(th))
+                c_df = _equi_join(l_df, r_df, l_key, r_key, l_attr, r_attr,
+                                  keep_equal, l_output_attrs, r_output_attrs,
+                                  l_output_prefix, r_output_prefix)
+                candset = _union_candsets(candset, c_df,
+                                          l_output_prefix + l_key,
+                                          r_output_prefix + r_key)
+                continue
+
+            sim_fn, tokenizer, _ = self.get_conjunct_filter(conjunct,
+                                                            rule_name)
+            join_fn = _SIM_JOIN_FNS[sim_fn]
 
             if join_fn == ssj.edit_distance_join:
                 comp_op = '<='
@@ -802,21 +1106,185 @@ class RuleBasedBlocker(Blocker):
                                l_output_attrs, r_output_attrs,
                                l_output_prefix,
                                r_output_prefix, False, n_jobs, show_progress)
-            if candset is not None:
-                # union the candset of this conjunct with the existing candset
-                candset = pd.concat([candset, c_df]).drop_duplicates(
-                    [l_output_prefix + l_key,
-                     r_output_prefix + r_key]).reset_index(drop=True)
-            else:
-                # candset from the first conjunct of the rule
-                candset = c_df
+            candset = _union_candsets(candset, c_df, l_output_prefix + l_key,
+                                      r_output_prefix + r_key)
         return candset
 
 
+def _union_candsets(candset, c_df, fk_ltable, fk_rtable):
+    if candset is None:
+        # candset from the first conjunct of the rule
+        return c_df
+    # union the candset of this conjunct with the existing candset
+    return pd.concat([candset, c_df]).drop_duplicates(
+        [fk_ltable, fk_rtable]).reset_index(drop=True)
+
+
+def _equi_join(l_df, r_df, l_key, r_key, l_attr, r_attr, keep_equal,
+               l_output_attrs, r_output_attrs, l_output_prefix,
+               r_output_prefix):
+    """
+    Get the tuple pairs with equal values in the given attributes (if
+    keep_equal is True) and the tuple pairs with a missing value, in the
+    format of the output of the string similarity joins.
+    """
+    l_codes, r_codes = get_value_codes(l_df[l_attr].values,
+                                        r_df[r_attr].values)
+    l_pos, r_pos = [], []
+    if keep_equal:
+        l_pairs = pd.DataFrame({'code': l_codes, 'l_pos': np.arange(len(l_df))})
+        r_pairs = pd.DataFrame({'code': r_codes, 'r_pos': np.arange(len(r_df))})
+        pairs = pd.merge(l_pairs[l_codes >= 0], r_pairs[r_codes >= 0],
+                         on='code')
+        l_pos.append(pairs['l_pos'].values)
+        r_pos.append(pairs['r_pos'].values)
+    # # the pairs with a missing value in the left attribute, and the pairs
+    # # with a missing value only in the right attribute
+    l_nulls = np.flatnonzero(l_codes < 0)
+    r_nulls = np.flatnonzero(r_codes < 0)
+    l_non_nulls = np.flatnonzero(l_codes >= 0)
+    l_pos.extend([np.repeat(l_nulls, len(r_df)),
+                  np.tile(l_non_nulls, len(r_nulls))])
+    r_pos.extend([np.tile(np.arange(len(r_df)), len(l_nulls)),
+                  np.repeat(r_nulls, len(l_non_nulls))])
+    l_pos = np.concatenate(l_pos).astype(np.int64)
+    r_pos = np.concatenate(r_pos).astype(np.int64)
+
+    candset = pd.DataFrame()
+    candset['_id'] = np.arange(len(l_pos))
+    candset[l_output_prefix + l_key] = l_df[l_key].values[l_pos]
+    candset[r_output_prefix + r_key] = r_df[r_key].values[r_pos]
+    for attr in l_output_attrs:
+        candset[l_output_prefix + attr] = l_df[attr].values[l_pos]
+    for attr in r_output_attrs:
+        candset[r_output_prefix + attr] = r_df[attr].values[r_pos]
+    return candset
+
+
+def _estimate_equi_join_size(l_values, r_values, keep_equal):
+    """
+    Get the number of tuple pairs output by _equi_join, from the number of
+    times each value occurs in the attributes.
+    """
+    l_codes, r_codes = get_value_codes(l_values, r_values)
+    n_size = _get_missing_pair_count(l_codes < 0, r_codes < 0)
+    if keep_equal:
+        n_codes = max(l_codes.max(initial=-1), r_codes.max(initial=-1)) + 1
+        l_counts = np.bincount(l_codes[l_codes >= 0], minlength=n_codes)
+        r_counts = np.bincount(r_codes[r_codes >= 0], minlength=n_codes)
+        n_size += int(np.dot(l_counts.astype(np.float64), r_counts))
+    return n_size
+
+
+def _get_missing_pair_count(l_nulls, r_nulls):
+    # the pairs with a missing value, which the joins always output
+    n_l_nulls, n_r_nulls = int(l_nulls.sum()), int(r_nulls.sum())
+    return n_l_nulls * len(r_nulls) + n_r_nulls * (len(l_nulls) - n_l_nulls)
+
+
+def _estimate_sim_join_size(l_values, r_values, sim_fn, tokenizer, comp_op,
+                            th, rng):
+    """
+    Estimate the number of tuple pairs output by a string similarity join.
+
+    The candidate pairs of the join are the pairs sharing a token of their
+    prefixes (as in the prefix filter of the joins), and their number (with
+    a pair counted once per shared prefix token) is the sum over the tokens
+    of the left frequency times the right frequency of the token in the
+    prefixes. The fraction of the candidate pairs that survive the join is
+    estimated over a sample of them.
+    """
+    l_nulls, r_nulls = pd.isnull(l_values), pd.isnull(r_values)
+    n_size = _get_missing_pair_count(l_nulls, r_nulls)
+    if sim_fn != 'lev_dist' and _COMPARISON_OPS[comp_op](0, th):
+        # # all the pairs survive the join
+        return len(l_values) * len(r_values)
+
+    l_tokens = [set(tokenizer.tokenize(val)) for val in l_values[~l_nulls]]
+    r_tokens = [set(tokenizer.tokenize(val)) for val in r_values[~r_nulls]]
+
+    # # order the tokens from the rarest to the most frequent one, to get the
+    # # prefixes of the token sets
+    token_freqs = {}
+    for tokens in l_tokens + r_tokens:
+        for token in tokens:
+            token_freqs[token] = token_freqs.get(token, 0) + 1
+    l_prefixes = [_get_prefix(tokens, token_freqs, sim_fn, th)
+                  for tokens in l_tokens]
+    r_prefixes = [_get_prefix(tokens, token_freqs, sim_fn, th)
+                  for tokens in r_tokens]
+    l_postings, r_postings = {}, {}
+    for postings, prefixes in [(l_postings, l_prefixes),
+                               (r_postings, r_prefixes)]:
+        for i, prefix in enumerate(prefixes):
+            for token in prefix:
+                postings.setdefault(token, []).append(i)
+    shared_tokens = [token for token in l_postings if token in r_postings]
+    if len(shared_tokens) == 0:
+        return n_size
+    weights = np.array([len(l_postings[token]) * len(r_postings[token])
+                        for token in shared_tokens], dtype=np.float64)
+    n_candidates = weights.sum()
+
+    # # sample candidate pairs (each one with the probability of it being
+    # # found through a shared prefix token), and weight each sampled pair by
+    # # the inverse of the number of prefix tokens it shares, so that each
+    # # distinct pair is counted once
+    l_strings = l_values[~l_nulls]
+    r_strings = r_values[~r_nulls]
+    n_survived = 0.0
+    sampled = rng.choice(len(shared_tokens), _JOIN_SAMPLE_SIZE,
+                         p=weights / n_candidates)
+    for k in sampled:
+        token = shared_tokens[k]
+        i = l_postings[token][rng.randint(len(l_postings[token]))]
+        j = r_postings[token][rng.randint(len(r_postings[token]))]
+        if sim_fn == 'lev_dist':
+            score = _LEVENSHTEIN.get_raw_score(l_strings[i], r_strings[j])
+        else:
+            score = _get_set_sim(l_tokens[i], r_tokens[j], sim_fn)
+        if _COMPARISON_OPS[comp_op](score, th):
+            n_survived += 1.0 / len(l_prefixes[i] & r_prefixes[j])
+    return n_size + int(round(n_candidates * n_survived / _JOIN_SAMPLE_SIZE))
+
+
+def _get_prefix(tokens, token_freqs, sim_fn, th):
+    # get the prefix of a token set, which a pair of token sets must share a
+    # token of to survive the join (see the prefix filter of
+    # py_stringsimjoin)
+    n_tokens = len(tokens)
+    if sim_fn == 'lev_dist':
+        prefix_len = min(int(2 * th + 1), n_tokens)
+    elif sim_fn == 'jaccard':
+        prefix_len = n_tokens - int(np.ceil(th * n_tokens)) + 1
+    elif sim_fn == 'cosine':
+        prefix_len = n_tokens - int(np.ceil(th * th * n_tokens)) + 1
+    elif sim_fn == 'dice':
+        prefix_len = n_tokens - int(np.ceil(th / (2 - th) * n_tokens)) + 1
+    else:
+        prefix_len = n_tokens
+    ordered = sorted(tokens, key=lambda token: (token_freqs[token], token))
+    return set(ordered[:prefix_len])
+
+
+def _get_set_sim(l_tokens, r_tokens, sim_fn):
+    # get the similarity of two non-empty token sets
+    n_common = len(l_tokens & r_tokens)
+    if sim_fn == 'jaccard':
+        return n_common / float(len(l_tokens | r_tokens))
+    if sim_fn == 'cosine':
+        return n_common / np.sqrt(len(l_tokens) * len(r_tokens))
+    if sim_fn == 'dice':
+        return 2.0 * n_common / (len(l_tokens) + len(r_tokens))
+    return n_common / float(min(len(l_tokens), len(r_tokens)))
+
+
 def _block_tables_split(l_df, r_df, l_key, r_key,
                         l_output_attrs, r_output_attrs,
                         l_output_prefix, r_output_prefix, apply_rules_pkl,
                         show_progress):
+    l_df, r_df = get_shared_object(l_df), get_shared_object(r_df)
+
     # initialize progress bar
     if show_progress:
         bar = pyprind.ProgBar(len(l_df) * len(r_df))
@@ -841,7 +1309,7 @@ def _block_tables_split(l_df, r_df, l_key, r_key,
     valid = []
 
     # unpickle the apply_rules function
-    apply_rules = pickle.loads(apply_rules_pkl)
+    apply_rules = loads_shared_object(apply_rules_pkl)
 
     # iterate through the two tables
     for l_t in l_df.itertuples(index=False):
@@ -884,53 +1352,251 @@ def _block_tables_split(l_df, r_df, l_key, r_key,
     return candset
 
 
+def _block_candset_excluding_rule_splits(c_splits, l_splits, r_splits, l_key,
+                                         r_key, fk_ltable, fk_rtable,
+                                         rule_to_exclude,
+                                         apply_rules_excluding_rule_pkl,
+                                         rule_plan_pkl, show_progress,
+                                         n_procs):
+    # single process
+    if n_procs <= 1:
+        return [_block_candset_excluding_rule_split(
+                    c_splits[i], l_splits[i], r_splits[i], l_key, r_key,
+                    fk_ltable, fk_rtable, rule_to_exclude,
+                    apply_rules_excluding_rule_pkl, rule_plan_pkl,
+                    show_progress and i == len(c_splits) - 1)
+                for i in range(len(c_splits))]
+
+    # multiprocessing
+    l_splits = [share_object(l_split) for l_split in l_splits]
+    r_splits = [share_object(r_split) for r_split in r_splits]
+    if apply_rules_excluding_rule_pkl is not None:
+        apply_rules_excluding_rule_pkl = share_pickled_object(
+            apply_rules_excluding_rule_pkl)
+    rule_plan_pkl = share_pickled_object(rule_plan_pkl)
+    return run_parallel((
+        delayed(_block_candset_excluding_rule_split)(c_splits[i],
+                                                     l_splits[i], r_splits[i],
+                                                     l_key, r_key,
+                                                     fk_ltable,
+                                                     fk_rtable,
+                                                     rule_to_exclude,
+                                                     apply_rules_excluding_rule_pkl,
+                                                     rule_plan_pkl,
+                                                     show_progress and i == len(
+                                                         c_splits) - 1)
+        for i in range(len(c_splits))), n_procs)
+
+
 def _block_candset_excluding_rule_split(c_df, l_df, r_df, l_key, r_key,
                                         fk_ltable,
                                         fk_rtable, rule_to_exclude,
                                         apply_rules_excluding_rule_pkl,
-                                        show_progress):
+                                        rule_plan_pkl, show_progress):
+    l_df, r_df = get_shared_object(l_df), get_shared_object(r_df)
+
+    # # unpickle the rules to evaluate column-wise
+    col_rules, feature_specs = loads_shared_object(rule_plan_pkl)
+
     # do blocking
 
     # # initialize the progress bar
+    n_steps = sum(len(conjuncts) for _, conjuncts in col_rules)
+    if apply_rules_excluding_rule_pkl is not None:
+        n_steps += len(c_df)
+    show_progress = show_progress and n_steps > 0
     if show_progress:
-        bar = pyprind.ProgBar(len(c_df))
+        bar = pyprind.ProgBar(n_steps)
+
+    # # mask to keep track of valid ids
+    valid = np.ones(len(c_df), dtype=bool)
+
+    # # evaluate the conjuncts of each rule column-wise, only over the pairs
+    # # that are not dropped yet and for which the previous conjuncts of the
+    # # rule are True
+    feature_cols = _FeatureColumns(feature_specs, l_df, r_df,
+                                   c_df[fk_ltable].values,
+                                   c_df[fk_rtable].values)
+    for rule_name, conjuncts in col_rules:
+        rows = np.flatnonzero(valid)
+        for conjunct in conjuncts:
+            if show_progress:
+                bar.update()
+            rows = rows[_eval_conjunct(feature_cols, conjunct, rows)]
+        valid[rows] = False
 
-    # # initialize lookup tables for faster processing
-    l_dict = {}
-    r_dict = {}
+    if apply_rules_excluding_rule_pkl is None:
+        return list(valid)
 
-    # # list to keep track of valid ids
-    valid = []
+    # # initialize lookups (keeping the recently used tuples) for faster
+    # # processing
+    l_dict = TupleLookup(l_df.loc.__getitem__)
+    r_dict = TupleLookup(r_df.loc.__getitem__)
 
     l_id_pos = list(c_df.columns).index(fk_ltable)
     r_id_pos = list(c_df.columns).index(fk_rtable)
 
     # # unpickle the apply_rules_excluding_rule function
-    apply_rules_excluding_rule = pickle.loads(apply_rules_excluding_rule_pkl)
+    apply_rules_excluding_rule = loads_shared_object(apply_rules_excluding_rule_pkl)
 
-    # # iterate candidate set
-    for row in c_df.itertuples(index=False):
+    # # iterate candidate set, applying the other rules to the pairs that
+    # # survived the rules evaluated column-wise
+    for i, row in enumerate(c_df.itertuples(index=False)):
         # # update progress bar
         if show_progress:
             bar.update()
 
-        # # get ltuple, try dictionary first, then dataframe
-        row_lid = row[l_id_pos]
-        if row_lid not in l_dict:
-            l_dict[row_lid] = l_df.loc[row_lid]
-        ltuple = l_dict[row_lid]
+        if not valid[i]:
+            continue
 
-        # # get rtuple, try dictionary first, then dataframe
-        row_rid = row[r_id_pos]
-        if row_rid not in r_dict:
-            r_dict[row_rid] = r_df.loc[row_rid]
-        rtuple = r_dict[row_rid]
+        # # get ltuple, try lookup first, then dataframe
+        ltuple = l_dict[row[l_id_pos]]
+
+        # # get rtuple, try lookup first, then dataframe
+        rtuple = r_dict[row[r_id_pos]]
 
         res = apply_rules_excluding_rule(ltuple, rtuple, rule_to_exclude)
  
-        if res != True:
-            valid.append(True)
-        else:
-            valid.append(False)
+        if res == True:
+            valid[i] = False
+
+    return list(valid)
 
-    return valid
+
+class _FeatureColumns(object):
+    """
+    The values of the features used by the rules for the pairs of a
+    candset. The values are computed column-wise, only for the rows they are
+    requested for, and kept to be reused by the other conjuncts and rules.
+    """
+
+    def __init__(self, feature_specs, l_df, r_df, l_keys, r_keys):
+        self.feature_specs = feature_specs
+        self.l_df = l_df
+        self.r_df = r_df
+        self.n_pairs = len(l_keys)
+        l_pos = l_df.index.get_indexer(l_keys)
+        r_pos = r_df.index.get_indexer(r_keys)
+        self.l_uniq_pos, self.l_inv = np.unique(l_pos, return_inverse=True)
+        self.r_uniq_pos, self.r_inv = np.unique(r_pos, return_inverse=True)
+        self.tok_cache = {}
+        self.values = {}
+        self.computed = {}
+        self.times = {}
+
+    def get(self, feature_name, rows):
+        if feature_name not in self.values:
+            self.values[feature_name] = np.full(self.n_pairs, np.NaN)
+            self.computed[feature_name] = np.zeros(self.n_pairs, dtype=bool)
+            self.times[feature_name] = 0.0
+        vals = self.values[feature_name]
+        computed = self.computed[feature_name]
+        missing = rows[~computed[rows]]
+        if len(missing) > 0:
+            start_time = timeit.default_timer()
+            new_vals = _apply_feat_batch(self.feature_specs[feature_name],
+                                         self.tok_cache, self.l_df, self.r_df,
+                                         self.l_uniq_pos, self.l_inv[missing],
+                                         self.r_uniq_pos, self.r_inv[missing])
+            # # missing feature values (None) are compared as NaN
+            if not isinstance(new_vals, np.ndarray) or \
+                    new_vals.dtype == object:
+                new_vals = [np.NaN if val is None else val
+                            for val in new_vals]
+            vals[missing] = new_vals
+            computed[missing] = True
+            self.times[feature_name] += timeit.default_timer() - start_time
+        return vals[rows]
+
+
+def _eval_conjunct(feature_cols, conjunct, rows):
+    # get the mask of the given rows the conjunct is True for
+    feature_name, op, th = conjunct
+    return _COMPARISON_OPS[op](feature_cols.get(feature_name, rows), th)
+
+
+def _order_rules(col_rules, feature_specs, c_df, l_df, r_df, fk_ltable,
+                 fk_rtable):
+    """
+    Order the rules evaluated column-wise, and the conjuncts of each rule,
+    so that the cheap conjuncts that decide many pairs come first. The cost
+    of the features and the fraction of the pairs each conjunct and rule is
+    True for are estimated over a sample of the candset.
+    """
+    if len(c_df) == 0:
+        return col_rules
+    sample = np.random.RandomState(0).choice(
+        len(c_df), min(len(c_df), _SAMPLE_SIZE), replace=False)
+    sample.sort()
+    feature_cols = _FeatureColumns(feature_specs, l_df, r_df,
+                                   c_df[fk_ltable].values[sample],
+                                   c_df[fk_rtable].values[sample])
+    all_rows = np.arange(len(sample))
+
+    # # the cost of each feature per pair, and the conjunct values
+    costs = {}
+    for feature_name in feature_specs:
+        feature_cols.get(feature_name, all_rows)
+        costs[feature_name] = feature_cols.times[feature_name] / len(sample)
+    truths = {}
+    for _, conjuncts in col_rules:
+        for conjunct in conjuncts:
+            truths[conjunct] = _eval_conjunct(feature_cols, conjunct,
+                                              all_rows)
+
+    # # greedily pick the rule with the lowest cost per dropped pair, among
+    # # the sample pairs the previous rules do not drop
+    ordered_rules = []
+    remaining = list(col_rules)
+    features = set()
+    undropped = np.ones(len(sample), dtype=bool)
+    while len(remaining) > 0:
+        plans = [_plan_rule(conjuncts, truths, costs, features, undropped)
+                 for _, conjuncts in remaining]
+        ranks = [_get_rank(cost, dropped.sum(), undropped.sum())
+                 for _, cost, dropped in plans]
+        best = int(np.argmin(ranks))
+        conjuncts, _, dropped = plans[best]
+        ordered_rules.append((remaining[best][0], conjuncts))
+        features.update(feature_name for feature_name, _, _ in conjuncts)
+        undropped &= ~dropped
+        del remaining[best]
+    return ordered_rules
+
+
+def _plan_rule(conjuncts, truths, costs, features, undropped):
+    """
+    Greedily order the conjuncts of a rule by their cost per pair they are
+    False for, among the sample pairs the previous conjuncts are True for.
+    Returns the ordered conjuncts, the expected cost of the rule per
+    undropped pair, and the mask of the sample pairs the rule drops.
+    """
+    ordered = []
+    remaining = list(conjuncts)
+    features = set(features)
+    mask = undropped.copy()
+    n_undropped = max(undropped.sum(), 1)
+    expected_cost = 0.0
+    while len(remaining) > 0:
+        conj_costs = [0.0 if conjunct[0] in features else costs[conjunct[0]]
+                      for conjunct in remaining]
+        ranks = [_get_rank(cost, (mask & ~truths[conjunct]).sum(), mask.sum())
+                 for conjunct, cost in zip(remaining, conj_costs)]
+        best = int(np.argmin(ranks))
+        conjunct = remaining[best]
+        expected_cost += conj_costs[best] * mask.sum() / float(n_undropped)
+        ordered.append(conjunct)
+        features.add(conjunct[0])
+        mask &= truths[conjunct]
+        del remaining[best]
+    return ordered, expected_cost, mask
+
+
+def _get_rank(cost, n_decided, n_pairs):
+    # the cost per pair decided, given the number of pairs decided out of
+    # the pairs evaluated
+    if cost == 0:
+        return 0.0
+    if n_decided == 0:
+        return np.inf
+    return cost * n_pairs / float(n_decided)
@@ -6,9 +6,7 @@ import logging
 import multiprocessing
 import pandas as pd
 import numpy as np
-import re
 import six
-import string
 
 import py_stringsimjoin as ssj
 from py_stringsimjoin.filter.overlap_filter import OverlapFilter
@@ -22,6 +20,8 @@ from py_entitymatching.utils.catalog_helper import log_info, get_name_for_key, \
 
 from py_entitymatching.blocker.blocker import Blocker
 import py_entitymatching.utils.generic_helper as gh
+from py_entitymatching.utils.string_helper import clean_column, \
+    clean_string, remove_punctuations
 from py_entitymatching.utils.validation_helper import validate_object_type
 from py_entitymatching.dask.utils import validate_chunks, get_num_partitions, \
     get_num_cores, wrap
@@ -40,8 +40,6 @@ class DaskOverlapBlocker(Blocker):
         logger.warning(
             "WARNING THIS BLOCKER IS EXPERIMENTAL AND NOT TESTED. USE AT YOUR OWN "
             "RISK.")
-
-        self.regex_punctuation = re.compile('[%s]' % re.escape(string.punctuation))
         super(DaskOverlapBlocker, self).__init__()
 
 
@@ -594,12 +592,14 @@ class DaskOverlapBlocker(Blocker):
                                     start_row_id, should_rem_stop_words, tokenizer):
         result_vals = {}
         row_id = start_row_id
-        for s in block_column_values:
+        # each distinct value is cleaned up only once
+        cleaned_values = clean_column(block_column_values.values,
+                                      should_rem_stop_words, self.stop_words)
+        for s, cleaned_s in zip(block_column_values, cleaned_values):
             if not s or pd.isnull(s):
                 row_id += 1
                 continue
-            val = self._process_tokenize_block_str(s, should_rem_stop_words, tokenizer)
-            result_vals[row_id] = val
+            result_vals[row_id] = tokenizer.tokenize(cleaned_s)
             row_id += 1
         return result_vals
 
@@ -639,14 +639,7 @@ class DaskOverlapBlocker(Blocker):
     def _process_tokenize_block_str(self, s, should_rem_stop_words, tokenizer):
         if not s or pd.isnull(s):
             return s
-        if isinstance(s, bytes):
-            s = s.decode('utf-8', 'ignore')
-        s = s.lower()
-        s = self.regex_punctuation.sub('', s)
-        tokens = list(set(s.strip().split()))
-        if should_rem_stop_words:
-            tokens = [token for token in tokens if token not in self.stop_words]
-        s = ' '.join(tokens)
+        s = clean_string(s, should_rem_stop_words, self.stop_words)
         tokenized_str = tokenizer.tokenize(s)
         return tokenized_str
 
@@ -803,30 +796,10 @@ class DaskOverlapBlocker(Blocker):
 
 
     def process_string(self, input_string, rem_stop_words):
-        if not input_string:
-            return input_string
-
-        if isinstance(input_string, bytes):
-            input_string = input_string.decode('utf-8', 'ignore')
-        input_string = input_string.lower()
-
-        input_string = self.rem_punctuations(input_string)
-
-        # remove stopwords
-        # chop the attribute values and convert into a set
-        val_chopped = list(set(input_string.strip().split()))
-
-        # remove stop words
-        if rem_stop_words:
-            val_chopped_no_stopwords = self.rem_stopwords(val_chopped)
-            val_joined = ' '.join(val_chopped_no_stopwords)
-        else:
-            val_joined = ' '.join(val_chopped)
-
-        return val_joined
+        return clean_string(input_string, rem_stop_words, self.stop_words)
 
     def rem_punctuations(self, s):
-        return self.regex_punctuation.sub('', s)
+        return remove_punctuations(s)
 
 
 
@@ -14,10 +14,13 @@ import time
 
 from array import array
 from collections import namedtuple
-from joblib import Parallel, delayed
+from joblib import delayed
 from operator import attrgetter
+from py_entitymatching.feature.tokenizedtable import get_token_order
 from py_entitymatching.debugblocker.debugblocker_cython import \
         debugblocker_cython, debugblocker_config_cython, debugblocker_topk_cython, debugblocker_merge_topk_cython
+from py_entitymatching.utils.executor import run_parallel, \
+        share_pickled_object, loads_shared_object
 from py_entitymatching.utils.validation_helper import validate_object_type
 
 logger = logging.getLogger(__name__)
@@ -208,10 +211,10 @@ def debugblocker_topk_cython_wrapper(config, lrecord_token_list,
         rrecord_token_list, lrecord_index_list, rrecord_index_list, py_cand_set,
         py_output_size):
     # deserialize data    
-    lrecord_token_list = pickle.loads(lrecord_token_list)
-    rrecord_token_list = pickle.loads(rrecord_token_list)
-    lrecord_index_list = pickle.loads(lrecord_index_list)
-    rrecord_index_list = pickle.loads(rrecord_index_list)
+    lrecord_token_list = loads_shared_object(lrecord_token_list)
+    rrecord_token_list = loads_shared_object(rrecord_token_list)
+    lrecord_index_list = loads_shared_object(lrecord_index_list)
+    rrecord_index_list = loads_shared_object(rrecord_index_list)
 
     return debugblocker_topk_cython(config, lrecord_token_list, rrecord_token_list,
     lrecord_index_list, rrecord_index_list, py_cand_set,
@@ -234,11 +237,20 @@ def debugblocker_cython_parallel(lrecord_token_list, rrecord_token_list,
                             py_num_fields, len(lrecord_token_list), len(rrecord_token_list))
 
     n_configs = _get_config_num(n_jobs, n_configs, len(py_config_lists))
+
+    # with an executor, the workers keep the token lists they have already
+    # received
+    if n_jobs != 1:
+        lrecord_token_list = share_pickled_object(lrecord_token_list)
+        rrecord_token_list = share_pickled_object(rrecord_token_list)
+        lrecord_index_list = share_pickled_object(lrecord_index_list)
+        rrecord_index_list = share_pickled_object(rrecord_index_list)
+
     # parallel computer topk based on config lists
-    rec_lists = Parallel(n_jobs=n_jobs)(delayed(debugblocker_topk_cython_wrapper)
+    rec_lists = run_parallel((delayed(debugblocker_topk_cython_wrapper)
         (py_config_lists[i], lrecord_token_list, rrecord_token_list,
         lrecord_index_list, rrecord_index_list, py_cand_set,
-        py_output_size) for i in range(n_configs))
+        py_output_size) for i in range(n_configs)), n_jobs)
 
     py_rec_list = debugblocker_merge_topk_cython(rec_lists)
     
@@ -599,10 +611,7 @@ def _build_global_token_order(lrecord_list, rrecord_list):
     freq_order_dict = {}
     _build_global_token_order_impl(lrecord_list, freq_order_dict)
     _build_global_token_order_impl(rrecord_list, freq_order_dict)
-    token_list = []
-    for token in freq_order_dict:
-        token_list.append(token)
-    token_list = sorted(token_list, key=lambda x: (freq_order_dict[x], x))
+    token_list = get_token_order(freq_order_dict)
 
     order_dict = {}
     token_index_dict = {}
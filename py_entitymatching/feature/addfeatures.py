@@ -6,6 +6,7 @@ import logging
 import pandas as pd
 import six
 
+from py_entitymatching.feature.featurefunction import get_feature_function
 from py_entitymatching.utils.validation_helper import validate_object_type
 
 logger = logging.getLogger(__name__)
@@ -54,7 +55,10 @@ def get_feature_fn(feature_string, tokenizers, similarity_functions):
 
         The created function is a self-contained function
         which means that the tokenizers and sim functions that it calls are
-        bundled along with the returned function code.
+        bundled along with the returned function code. If the feature string
+        only applies a similarity function to two attributes (or to their
+        tokens), the function is a
+        :class:`~py_entitymatching.FeatureFunction` object.
 
     Raises:
         AssertionError: If `feature_string` is not of type string.
@@ -117,11 +121,18 @@ def get_feature_fn(feature_string, tokenizers, similarity_functions):
     parsed_dict = _parse_feat_str(feature_string, tokenizers,
                                   similarity_functions)
 
-    # Compile the function string using the constructed dictionary
-    six.exec_(function_string, dict_to_compile)
+    # A feature that only applies a similarity function to two (possibly
+    # tokenized) attributes gets a picklable function object; any other
+    # feature string is compiled.
+    feature_fn = _get_feature_function(feature_string, tokenizers,
+                                       similarity_functions)
+    if feature_fn is None:
+        # Compile the function string using the constructed dictionary
+        six.exec_(function_string, dict_to_compile)
+        feature_fn = dict_to_compile['fn']
 
     # Update the parsed dict with the function and the function source
-    parsed_dict['function'] = dict_to_compile['fn']
+    parsed_dict['function'] = feature_fn
     parsed_dict['function_source'] = function_string
 
     # Finally, return the parsed dictionary
@@ -148,7 +159,7 @@ def _parse_feat_str(feature_string, tokenizers, similarity_functions):
     # We will have to parse the feature string. Specifically we use pyparsing
     #  module for the parsing purposes
 
-    from pyparsing import Word, alphanums, ParseException
+    from pyparsing import ParseException
 
     # initialization attributes, tokenizers and similarity function parsing
     # result
@@ -160,13 +171,7 @@ def _parse_feat_str(feature_string, tokenizers, similarity_functions):
 
     exception_flag = False
 
-    # Define structures for each type such as attribute name, tokenizer
-    # function
-    attr_name = Word(alphanums + "_" + "." + "[" + "]" + '"' + "'")
-    tok_fn = Word(alphanums + "_") + "(" + attr_name + ")"
-    wo_tok = Word(alphanums + "_") + "(" + attr_name + "," + attr_name + ")"
-    wi_tok = Word(alphanums + "_") + "(" + tok_fn + "," + tok_fn + ")"
-    feat = wi_tok | wo_tok
+    feat = _get_feat_grammar()
     # Try to parse the string
     try:
         parsed_string = feat.parseString(feature_string)
@@ -215,6 +220,76 @@ def _parse_feat_str(feature_string, tokenizers, similarity_functions):
     return parsed_dict
 
 
+def _get_feat_grammar():
+    """
+    Get the grammar of the feature strings that apply a similarity function
+    to two attributes, or to the tokens of two attributes.
+    """
+    from pyparsing import Word, alphanums
+
+    # Define structures for each type such as attribute name, tokenizer
+    # function
+    attr_name = Word(alphanums + "_" + "." + "[" + "]" + '"' + "'")
+    tok_fn = Word(alphanums + "_") + "(" + attr_name + ")"
+    wo_tok = Word(alphanums + "_") + "(" + attr_name + "," + attr_name + ")"
+    wi_tok = Word(alphanums + "_") + "(" + tok_fn + "," + tok_fn + ")"
+    return wi_tok | wo_tok
+
+
+def _get_feature_function(feature_string, tokenizers, similarity_functions):
+    """
+    Get the function object of a feature string that is exactly a similarity
+    function applied to two attributes (or to the tokens of two attributes),
+    or None for any other feature string.
+    """
+    from pyparsing import ParseException
+
+    try:
+        parsed_string = list(_get_feat_grammar().parseString(feature_string,
+                                                             parseAll=True))
+    except ParseException as _:
+        return None
+
+    # The parsed string is either sim(ltuple["a"], rtuple["b"]) or
+    # sim(tok1(ltuple["a"]), tok2(rtuple["b"])).
+    if len(parsed_string) == 6:
+        sim_name, l_attr, r_attr = parsed_string[0], parsed_string[2], \
+                                   parsed_string[4]
+        l_tok, r_tok = None, None
+    else:
+        sim_name, l_attr, r_attr = parsed_string[0], parsed_string[4], \
+                                   parsed_string[9]
+        l_tok, r_tok = parsed_string[2], parsed_string[7]
+        if l_tok not in tokenizers or r_tok not in tokenizers:
+            return None
+    # The tokenizers take precedence over the similarity functions of the
+    # same name when the feature string is compiled.
+    if sim_name not in similarity_functions or sim_name in tokenizers:
+        return None
+    l_attr = _get_quoted_attribute(l_attr, 'ltuple')
+    r_attr = _get_quoted_attribute(r_attr, 'rtuple')
+    if l_attr is None or r_attr is None:
+        return None
+    return get_feature_function(l_attr, r_attr, sim_name, l_tok, r_tok,
+                                tokenizers, similarity_functions)
+
+
+def _get_quoted_attribute(value, tuple_name):
+    """
+    Get the attribute name of a 'tuple_name["attribute"]' string, or None if
+    the string is not of that form.
+    """
+    for quote in ['"', "'"]:
+        prefix = tuple_name + '[' + quote
+        suffix = quote + ']'
+        if value.startswith(prefix) and value.endswith(suffix) and \
+                len(value) > len(prefix) + len(suffix):
+            attr = value[len(prefix):-len(suffix)]
+            if quote not in attr:
+                return attr
+    return None
+
+
 def add_feature(feature_table, feature_name, feature_dict):
     """
     Adds a feature to the feature table.
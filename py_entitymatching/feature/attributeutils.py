@@ -12,7 +12,7 @@ from py_entitymatching.utils.validation_helper import validate_object_type
 logger = logging.getLogger(__name__)
 
 
-def get_attr_types(data_frame):
+def get_attr_types(data_frame, sample_size=None, random_state=None):
     """
     This function gets the attribute types for a DataFrame.
 
@@ -26,9 +26,21 @@ def get_attr_types(data_frame):
     str_bt_1w_5w means the average number of tokens in that column is
     greater than one word but less than 5 words.
 
+    The columns with a boolean or numeric dtype are typed from their dtype
+    alone. For large tables, the types of the other columns (and the average
+    number of tokens of the string columns) can be inferred from a random
+    sample of `sample_size` non-missing values per column. The whole column
+    is still checked to hold values of a single kind, using pandas' dtype
+    inference instead of the type of each value.
+
     Args:
         data_frame (DataFrame): The input DataFrame for which types of
          attributes must be determined.
+        sample_size (int): The number of values per column used to infer
+            the attribute types (defaults to None, in which case all the
+            values are used).
+        random_state (object): The seed or the random state used to sample
+            the values (defaults to None).
 
     Returns:
         A Python dictionary is returned containing the attribute types.
@@ -42,6 +54,7 @@ def get_attr_types(data_frame):
     Raises:
         AssertionError: If `data_frame` is not of type
             pandas DataFrame.
+        AssertionError: If `sample_size` is not a positive integer.
 
     Examples:
 
@@ -50,6 +63,8 @@ def get_attr_types(data_frame):
         >>> B = em.read_csv_metadata('path_to_csv_dir/table_B.csv', key='ID')
         >>> atypes1 = em.get_attr_types(A)
         >>> atypes2 = em.get_attr_types(B)
+        >>> # Infer the types from 10000 values per column
+        >>> atypes1 = em.get_attr_types(A, sample_size=10000, random_state=0)
 
 
     """
@@ -60,8 +75,16 @@ def get_attr_types(data_frame):
         logger.error('Input table is not of type pandas dataframe')
         raise AssertionError('Input table is not of type pandas dataframe')
 
+    # # We expect the sample size to be a positive integer (if given)
+    if sample_size is not None:
+        if not isinstance(sample_size, int) or \
+                isinstance(sample_size, bool) or sample_size <= 0:
+            logger.error('Sample size should be a positive integer')
+            raise AssertionError('Sample size should be a positive integer')
+
     # Now get type for each column
-    type_list = [_get_type(data_frame[col]) for col in data_frame.columns]
+    type_list = [_get_type(data_frame[col], sample_size, random_state)
+                 for col in data_frame.columns]
 
     # Create a dictionary containing attribute types
     attribute_type_dict = dict(zip(data_frame.columns, type_list))
@@ -146,9 +169,11 @@ def get_attr_corres(ltable, rtable):
     return correspondence_dict
 
 
-def _get_type(column):
+def _get_type(column, sample_size=None, random_state=None):
     """
-     Given a pandas Series (i.e column in pandas DataFrame) obtain its type
+     Given a pandas Series (i.e column in pandas DataFrame) obtain its type.
+     If a sample size is given, the type is inferred from a random sample of
+     the non-missing values.
     """
     # Validate input parameters
     # # We expect the input column to be of type pandas Series
@@ -159,6 +184,21 @@ def _get_type(column):
     # To get the type first drop all NaNa
     column = column.dropna()
 
+    # The values of a boolean or numeric column all have the same type, so
+    # the dtype is enough (unless all the values are missing).
+    if len(column) > 0:
+        if column.dtype.kind == 'b':
+            return 'boolean'
+        if column.dtype.kind in 'iufcmM':
+            return 'numeric'
+
+    if sample_size is not None and len(column) > sample_size:
+        # Check that the values are of a single kind over the whole column,
+        # then look at the types of the sampled values only.
+        if pd.api.types.infer_dtype(column, skipna=True).startswith('mixed'):
+            _raise_multiple_types(column.name)
+        column = column.sample(n=sample_size, random_state=random_state)
+
     # Get type for each element and convert it into a set (and for
     # convenience convert the resulting set into a list)
     type_list = list(set(column.map(type).tolist()))
@@ -177,14 +217,7 @@ def _get_type(column):
     # in a numeric column, some values may be inferred as strings), then we
     # will raise an error for the user to fix this case.
     if len(type_list) > 1:
-        logger.warning('Column %s qualifies to be more than one type. \n'
-                       'Please explicitly set the column type like this:\n'
-                       'A["address"] = A["address"].astype(str) \n'
-                       'Similarly use int, float, boolean types.' % column.name)
-        raise AssertionError('Column %s qualifies to be more than one type. \n'
-                             'Please explicitly set the column type like this:\n'
-                             'A["address"] = A["address"].astype(str) \n'
-                             'Similarly use int, float, boolean types.' % column.name)
+        _raise_multiple_types(column.name)
     else:
         # the number of types is 1.
         returned_type = type_list[0]
@@ -214,6 +247,17 @@ def _get_type(column):
             return "numeric"
 
 
+def _raise_multiple_types(column_name):
+    logger.warning('Column %s qualifies to be more than one type. \n'
+                   'Please explicitly set the column type like this:\n'
+                   'A["address"] = A["address"].astype(str) \n'
+                   'Similarly use int, float, boolean types.' % column_name)
+    raise AssertionError('Column %s qualifies to be more than one type. \n'
+                         'Please explicitly set the column type like this:\n'
+                         'A["address"] = A["address"].astype(str) \n'
+                         'Similarly use int, float, boolean types.' % column_name)
+
+
 def _len_handle_nan(input_list):
     """
      Get the length of list, handling NaN
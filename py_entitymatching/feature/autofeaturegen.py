@@ -2,7 +2,9 @@
 This module contains functions for auto feature generation.
 """
 import logging
+import timeit
 
+import numpy as np
 import pandas as pd
 import six
 from py_entitymatching.utils.validation_helper import validate_object_type
@@ -10,9 +12,11 @@ from py_entitymatching.utils.validation_helper import validate_object_type
 from IPython.display import display
 
 import py_entitymatching as em
+import py_entitymatching.catalog.catalog_manager as cm
 import py_entitymatching.feature.attributeutils as au
 import py_entitymatching.feature.simfunctions as sim
 import py_entitymatching.feature.tokenizers as tok
+from py_entitymatching.feature.featurefunction import get_feature_function
 
 logger = logging.getLogger(__name__)
 
@@ -172,7 +176,8 @@ def get_features(ltable, rtable, l_attr_types, r_attr_types,
     return feature_table
 
 
-def get_features_for_blocking(ltable, rtable, validate_inferred_attr_types=True):
+def get_features_for_blocking(ltable, rtable, validate_inferred_attr_types=True,
+                              attr_types_sample_size=None, random_state=None):
     """
 
     This function automatically generates features that can be used for
@@ -184,6 +189,12 @@ def get_features_for_blocking(ltable, rtable, validate_inferred_attr_types=True)
         validate_inferred_attr_types (boolean): A flag to indicate whether to 
             show the user the inferred attribute types and the features
             chosen for those types.
+        attr_types_sample_size (int): The number of values per column used
+            to infer the attribute types (defaults to None, in which case all
+            the values are used). See
+            :meth:`~py_entitymatching.get_attr_types`.
+        random_state (object): The seed or the random state used to sample
+            the values (defaults to None).
 
     Returns:
         A pandas DataFrame containing automatically generated features.
@@ -211,12 +222,16 @@ def get_features_for_blocking(ltable, rtable, validate_inferred_attr_types=True)
             DataFrame.
         AssertionError: If `validate_inferred_attr_types` is not of type
             pandas DataFrame.
+        AssertionError: If `attr_types_sample_size` is not a positive
+            integer.
 
     Examples:
         >>> import py_entitymatching as em
         >>> A = em.read_csv_metadata('path_to_csv_dir/table_A.csv', key='ID')
         >>> B = em.read_csv_metadata('path_to_csv_dir/table_B.csv', key='ID')
         >>> block_f = em.get_features_for_blocking(A, B)
+        >>> # Infer the attribute types from 10000 values per column
+        >>> block_f = em.get_features_for_blocking(A, B, attr_types_sample_size=10000)
 
     Note:
         In the output DataFrame, two
@@ -252,8 +267,10 @@ def get_features_for_blocking(ltable, rtable, validate_inferred_attr_types=True)
     tok_funcs = tok.get_tokenizers_for_blocking()
 
     # Get the attr. types for ltable and rtable
-    attr_types_ltable = au.get_attr_types(ltable)
-    attr_types_rtable = au.get_attr_types(rtable)
+    attr_types_ltable = au.get_attr_types(ltable, attr_types_sample_size,
+                                          random_state)
+    attr_types_rtable = au.get_attr_types(rtable, attr_types_sample_size,
+                                          random_state)
     # Get the attr. correspondences between ltable and rtable
     attr_corres = au.get_attr_corres(ltable, rtable)
     
@@ -280,17 +297,52 @@ def get_features_for_blocking(ltable, rtable, validate_inferred_attr_types=True)
     return feature_table
 
 
-def get_features_for_matching(ltable, rtable, validate_inferred_attr_types=True):
+def get_features_for_matching(ltable, rtable, validate_inferred_attr_types=True,
+                               candset=None, time_budget=None,
+                               sample_size=1000, correlation_threshold=0.95,
+                               random_state=None, attr_types_sample_size=None):
     """
     This function automatically generates features that can be used for
     matching purposes.
 
+    Optionally, the generated features can be pruned based on their cost.
+    To do so, either a candidate set (`candset`) or a time budget per tuple
+    pair (`time_budget`) must be given. The features are then computed for
+    a sample of `sample_size` tuple pairs (from the candset if it is given,
+    else pairs of randomly chosen tuples from the input tables), measuring
+    the time each feature takes (the time to tokenize an attribute is
+    shared by the features that use the same tokenizer on it, as the tokens
+    are computed only once). Among the features of the same attribute
+    correspondence whose values are highly correlated on the sample (such as
+    lev_sim, needleman_wunsch and smith_waterman features on the same
+    attributes), only the cheapest feature is kept. Then, if a time budget
+    is given and the features still take longer, the most expensive
+    features are dropped until the budget is met (keeping at least one
+    feature for each attribute correspondence).
+
     Args:
         ltable,rtable (DataFrame): The pandas DataFrames for which the
             features are to be generated.
         validate_inferred_attr_types (boolean): A flag to indicate whether to 
             show the user the inferred attribute types and the features
             chosen for those types.
+        candset (DataFrame): A candidate set (with metadata in the catalog)
+            to sample the tuple pairs from, to prune the features (defaults
+            to None).
+        time_budget (float): The time (in seconds) that computing all the
+            features may take per tuple pair (defaults to None, in which
+            case the features are not pruned by time).
+        sample_size (int): The number of tuple pairs used to estimate the
+            cost and the correlation of the features (defaults to 1000).
+        correlation_threshold (float): The absolute correlation above which
+            two features are considered redundant (defaults to 0.95).
+        random_state (object): The seed or the random state used to sample
+            the tuple pairs (and the values used to infer the attribute
+            types) (defaults to None).
+        attr_types_sample_size (int): The number of values per column used
+            to infer the attribute types (defaults to None, in which case all
+            the values are used). See
+            :meth:`~py_entitymatching.get_attr_types`.
 
     Returns:
         A pandas DataFrame containing automatically generated features.
@@ -318,12 +370,20 @@ def get_features_for_matching(ltable, rtable, validate_inferred_attr_types=True)
             DataFrame.
         AssertionError: If `validate_inferred_attr_types` is not of type
             pandas DataFrame.
+        AssertionError: If `candset` is not of type pandas DataFrame.
+        AssertionError: If `time_budget` is not a positive number.
+        AssertionError: If `sample_size` is not a positive integer.
+        AssertionError: If `attr_types_sample_size` is not a positive
+            integer.
 
     Examples:
         >>> import py_entitymatching as em
         >>> A = em.read_csv_metadata('path_to_csv_dir/table_A.csv', key='ID')
         >>> B = em.read_csv_metadata('path_to_csv_dir/table_B.csv', key='ID')
         >>> match_f = em.get_features_for_matching(A, B)
+        >>> # Keep only the cheapest of the highly correlated features, and
+        >>> # at most 1 ms of features per tuple pair
+        >>> match_f = em.get_features_for_matching(A, B, candset=C, time_budget=0.001)
 
     Note:
         In the output DataFrame, two
@@ -353,14 +413,21 @@ def get_features_for_matching(ltable, rtable, validate_inferred_attr_types=True)
     # # We expect the validate_inferred_attr_types to be of type boolean
     validate_object_type(validate_inferred_attr_types, bool, 'Validate inferred attribute type')
 
+    # # If the features must be pruned, validate the pruning parameters
+    prune = candset is not None or time_budget is not None
+    if prune:
+        _validate_pruning_params(candset, time_budget, sample_size)
+
     # Get similarity functions for generating the features for matching
     sim_funcs = sim.get_sim_funs_for_matching()
     # Get tokenizer functions for generating the features for matching
     tok_funcs = tok.get_tokenizers_for_matching()
 
     # Get the attribute types of the input tables
-    attr_types_ltable = au.get_attr_types(ltable)
-    attr_types_rtable = au.get_attr_types(rtable)
+    attr_types_ltable = au.get_attr_types(ltable, attr_types_sample_size,
+                                          random_state)
+    attr_types_rtable = au.get_attr_types(rtable, attr_types_sample_size,
+                                          random_state)
 
     # Get the attribute correspondence between the input tables
     attr_corres = au.get_attr_corres(ltable, rtable)
@@ -377,6 +444,14 @@ def get_features_for_matching(ltable, rtable, validate_inferred_attr_types=True)
                                  attr_types_rtable, attr_corres,
                                  tok_funcs, sim_funcs)
 
+    # Prune the features based on their cost
+    if prune:
+        feature_table = _prune_features_by_cost(feature_table, ltable, rtable,
+                                                candset, time_budget,
+                                                sample_size,
+                                                correlation_threshold,
+                                                random_state)
+
     # Export important variables to global name space
     em._match_t = tok_funcs
     em._match_s = sim_funcs
@@ -388,6 +463,252 @@ def get_features_for_matching(ltable, rtable, validate_inferred_attr_types=True)
     return feature_table
 
 
+def _validate_pruning_params(candset, time_budget, sample_size):
+    if candset is not None:
+        validate_object_type(candset, pd.DataFrame, 'Input candset')
+
+    # We expect the time budget to be a positive number
+    if time_budget is not None:
+        if not isinstance(time_budget, (int, float)) or \
+                isinstance(time_budget, bool) or time_budget <= 0:
+            logger.error('Time budget should be a positive number')
+            raise AssertionError('Time budget should be a positive number')
+
+    # We expect the sample size to be a positive integer
+    if not isinstance(sample_size, int) or isinstance(sample_size, bool) or \
+            sample_size <= 0:
+        logger.error('Sample size should be a positive integer')
+        raise AssertionError('Sample size should be a positive integer')
+
+
+def _prune_features_by_cost(feature_table, ltable, rtable, candset,
+                            time_budget, sample_size, correlation_threshold,
+                            random_state):
+    """
+    Drop the features that are highly correlated with a cheaper feature of
+    the same attribute correspondence, and then the most expensive features
+    until the time budget (if given) is met.
+    """
+    if len(feature_table) == 0 or len(ltable) == 0 or len(rtable) == 0:
+        return feature_table
+
+    sample = _get_pair_sample(ltable, rtable, candset, sample_size,
+                              random_state)
+    try:
+        feat_vals, costs = _profile_features(feature_table, sample)
+        feature_groups, tok_costs = _get_tokenization_costs(feature_table,
+                                                            sample)
+    finally:
+        # The sample is only used to estimate the costs, so its metadata
+        # (and the metadata of its tables) is removed from the catalog.
+        cm.del_all_properties(cm.get_ltable(sample))
+        cm.del_all_properties(cm.get_rtable(sample))
+        cm.del_all_properties(sample)
+
+    # The features that tokenize the same attribute with the same tokenizer
+    # share the tokens, so the time to tokenize the attribute is charged to
+    # the group of features instead of to each of them.
+    sim_costs = [max(costs[i] - sum(tok_costs[g] for g in feature_groups[i]),
+                     0.0) for i in range(len(feature_table))]
+    amortized_costs = _get_amortized_costs(range(len(feature_table)),
+                                           sim_costs, feature_groups,
+                                           tok_costs)
+
+    # Consider the features from the cheapest to the most expensive one, and
+    # keep a feature only if it is not highly correlated with a cheaper
+    # feature that is kept.
+    feature_names = list(feature_table['feature_name'])
+    attr_pairs = list(zip(feature_table['left_attribute'],
+                          feature_table['right_attribute']))
+    correlations = feat_vals[feature_names].corr().abs()
+    order = sorted(range(len(feature_table)), key=lambda i: amortized_costs[i])
+    kept = []
+    for i in order:
+        redundant = False
+        for j in kept:
+            if attr_pairs[i] == attr_pairs[j] and \
+                    correlations.iat[i, j] >= correlation_threshold:
+                redundant = True
+                break
+        if not redundant:
+            kept.append(i)
+        else:
+            logger.info('Dropping feature %s, which is correlated with the '
+                        'cheaper feature %s' % (feature_names[i],
+                                                feature_names[j]))
+
+    # Drop the most expensive features until the time budget is met, keeping
+    # at least one feature per attribute correspondence
+    if time_budget is not None:
+        kept = _drop_features_by_time_budget(kept, feature_names, attr_pairs,
+                                             sim_costs, feature_groups,
+                                             tok_costs, time_budget)
+
+    feature_table = feature_table.iloc[sorted(kept)]
+    feature_table.reset_index(drop=True, inplace=True)
+    return feature_table
+
+
+def _profile_features(feature_table, sample):
+    """
+    Compute the features over the sample, and get the time per tuple pair
+    taken by each feature when it is computed on its own (so that the time
+    to tokenize the attributes is included in the cost of every feature that
+    tokenizes them).
+    """
+    # Import here to avoid a circular import
+    from py_entitymatching.feature.extractfeatures import \
+        ParallelFeatureExtractor
+
+    feat_vals = pd.DataFrame(index=range(len(sample)))
+    costs = []
+    for i in range(len(feature_table)):
+        feature_name = feature_table['feature_name'].iloc[i]
+        feature_extractor = ParallelFeatureExtractor(feature_table.iloc[[i]],
+                                                     show_progress=False,
+                                                     profile=True)
+        vals = feature_extractor.extract_from(sample)
+        feat_vals[feature_name] = pd.to_numeric(vals[feature_name],
+                                                errors='coerce').values
+        profile = feature_extractor.get_feature_profile()
+        costs.append(profile['time'].iloc[0] / max(len(sample), 1))
+    return feat_vals, costs
+
+
+def _get_tokenization_costs(feature_table, sample):
+    """
+    Get the (table, attribute, tokenizer) groups of the tokens used by each
+    feature, and the time per tuple pair taken to tokenize each group.
+    """
+    # Import here to avoid a circular import
+    from py_entitymatching.feature.extractfeatures import _get_batch_spec
+
+    l_df, r_df = cm.get_ltable(sample), cm.get_rtable(sample)
+
+    feature_groups = []
+    tok_costs = {}
+    for _, feature in feature_table.iterrows():
+        # Only the features computed column-wise share the tokens, the other
+        # ones tokenize the attributes for each pair.
+        spec = _get_batch_spec(feature)
+        if spec is None or spec['left_tok_fn'] is None:
+            feature_groups.append(())
+            continue
+        groups = (('ltable', spec['left_attribute'], spec['left_tok_fn']),
+                  ('rtable', spec['right_attribute'], spec['right_tok_fn']))
+        for group in groups:
+            if group not in tok_costs:
+                df = l_df if group[0] == 'ltable' else r_df
+                tok_costs[group] = _time_tokenizer(df[group[1]], group[2]) / \
+                                   max(len(sample), 1)
+        feature_groups.append(groups)
+    return feature_groups, tok_costs
+
+
+def _time_tokenizer(values, tok_fn):
+    """
+    Get the time taken to tokenize the non-missing values.
+    """
+    start_time = timeit.default_timer()
+    for val in values:
+        if not pd.isnull(val):
+            tok_fn(val)
+    return timeit.default_timer() - start_time
+
+
+def _get_amortized_costs(features, sim_costs, feature_groups, tok_costs):
+    """
+    Get the cost of each feature, splitting the time to tokenize each group
+    evenly among the given features that use it.
+    """
+    n_users = {}
+    for i in features:
+        for group in feature_groups[i]:
+            n_users[group] = n_users.get(group, 0) + 1
+    return dict((i, sim_costs[i] + sum(tok_costs[g] / n_users[g]
+                                       for g in feature_groups[i]))
+                for i in features)
+
+
+def _get_total_cost(features, sim_costs, feature_groups, tok_costs):
+    """
+    Get the time per tuple pair taken to compute the given features, where
+    each group of tokens is counted once.
+    """
+    groups = set(g for i in features for g in feature_groups[i])
+    return sum(sim_costs[i] for i in features) + \
+        sum(tok_costs[g] for g in groups)
+
+
+def _drop_features_by_time_budget(kept, feature_names, attr_pairs, sim_costs,
+                                  feature_groups, tok_costs, time_budget):
+    """
+    Drop the most expensive features until the time budget is met, keeping at
+    least one feature per attribute correspondence.
+    """
+    kept = list(kept)
+    total_cost = _get_total_cost(kept, sim_costs, feature_groups, tok_costs)
+    while total_cost > time_budget:
+        droppable = [i for i in kept
+                     if sum(1 for j in kept if attr_pairs[j] == attr_pairs[i])
+                     > 1]
+        if len(droppable) == 0:
+            break
+        # The costs are amortized over the features that are still kept, so
+        # that the time to tokenize a group is saved only once all the
+        # features that use it are dropped.
+        amortized_costs = _get_amortized_costs(kept, sim_costs,
+                                               feature_groups, tok_costs)
+        i = max(droppable, key=lambda i: amortized_costs[i])
+        kept.remove(i)
+        total_cost = _get_total_cost(kept, sim_costs, feature_groups,
+                                     tok_costs)
+        logger.info('Dropping feature %s to meet the time budget'
+                    % feature_names[i])
+    if total_cost > time_budget:
+        logger.warning('The features take %f seconds per tuple pair, '
+                       'which is more than the time budget' % total_cost)
+    return kept
+
+
+def _get_pair_sample(ltable, rtable, candset, sample_size, random_state):
+    """
+    Get a sample of tuple pairs (as a candset with metadata), either from the
+    given candset or by pairing randomly chosen tuples of the input tables.
+
+    The ltable and rtable of the sample are projected to the tuples it refers
+    to, so that the features are extracted without copying the whole input
+    tables.
+    """
+    l_key, r_key = cm.get_keys_for_ltable_rtable(ltable, rtable, logger,
+                                                 False)
+    if candset is not None:
+        key = cm.get_key(candset)
+        fk_ltable = cm.get_fk_ltable(candset)
+        fk_rtable = cm.get_fk_rtable(candset)
+        if len(candset) <= sample_size:
+            sample = candset.copy()
+        else:
+            sample = candset.sample(sample_size, random_state=random_state)
+    else:
+        key, fk_ltable, fk_rtable = '_id', 'ltable_' + l_key, \
+                                    'rtable_' + r_key
+        rng = np.random.RandomState(random_state) if not \
+            isinstance(random_state, np.random.RandomState) else random_state
+        l_ids = ltable[l_key].values[rng.randint(0, len(ltable), sample_size)]
+        r_ids = rtable[r_key].values[rng.randint(0, len(rtable), sample_size)]
+        sample = pd.DataFrame({key: np.arange(sample_size),
+                               fk_ltable: l_ids,
+                               fk_rtable: r_ids})
+
+    l_df = ltable[ltable[l_key].isin(sample[fk_ltable])]
+    r_df = rtable[rtable[r_key].isin(sample[fk_rtable])]
+    cm.set_key(l_df, l_key)
+    cm.set_key(r_df, r_key)
+    cm.set_candset_properties(sample, key, fk_ltable, fk_rtable, l_df, r_df)
+    return sample
+
+
 #
 def _check_table_order(ltable, rtable, l_attr_types, r_attr_types, attr_corres):
     """
@@ -646,9 +967,6 @@ def get_fn_name(attr1, attr2, sim_func, tok_func_1=None, tok_func_2=None):
 
 # conv function string to function object and return with meta data
 def conv_fn_str_to_obj(fn_tup, tok, sim_funcs):
-    d_orig = {}
-    d_orig.update(tok)
-    d_orig.update(sim_funcs)
     d_ret_list = []
     for f in fn_tup:
         d_ret = {}
@@ -658,9 +976,11 @@ def conv_fn_str_to_obj(fn_tup, tok, sim_funcs):
         tok_1 = f[3]
         tok_2 = f[4]
         simfunction = f[5]
-        # exec(f[6] in d_orig)
-        six.exec_(f[6], d_orig)
-        d_ret['function'] = d_orig[name]
+        # The function source is kept for display, but the function itself
+        # is a (picklable) object referring to the tokenizers and the
+        # similarity function, instead of the compiled source.
+        d_ret['function'] = get_feature_function(attr1, attr2, simfunction,
+                                                 tok_1, tok_2, tok, sim_funcs)
         d_ret['feature_name'] = name
         d_ret['left_attribute'] = attr1
         d_ret['right_attribute'] = attr2
@@ -1,10 +1,16 @@
 """
 This module contains functions to extract features using a feature table.
 """
+import functools
+import hashlib
+import json
 import logging
 
 import multiprocessing
 import os
+import timeit
+import uuid
+from collections import OrderedDict
 
 import pandas as pd
 import numpy as np
@@ -12,13 +18,23 @@ import pyprind
 import tempfile
 
 import cloudpickle
-from joblib import Parallel
+import six
 from joblib import delayed
 
 import py_entitymatching.catalog.catalog_manager as cm
+import py_entitymatching.feature.simfunctions as sim
+import py_entitymatching.feature.tokenizers as tok
+from py_entitymatching.feature.featurefunction import FeatureFunction
+from py_entitymatching.feature.tokenizedtable import TokenizedTable, \
+    intern_tokens
 import py_entitymatching.utils.catalog_helper as ch
 import py_entitymatching.utils.generic_helper as gh
+from py_entitymatching.io.columnar import ColumnarFileWriter
 from py_entitymatching.io.pickles import save_object, load_object
+from py_entitymatching.utils.executor import run_parallel, share_object, \
+    share_pickled_object, get_shared_object, loads_shared_object
+from py_entitymatching.utils.shared_table import SharedTable, take_values, \
+    get_row
 from py_entitymatching.utils.validation_helper import (
     validate_object_type,
     validate_subclass
@@ -26,6 +42,13 @@ from py_entitymatching.utils.validation_helper import (
 
 logger = logging.getLogger(__name__)
 
+# The maximum number of memoized feature values kept by each process
+_DEFAULT_MEMO_SIZE = 1000000
+
+# The catalog property of a feature vector table, that records the hashes of
+# the functions its features were computed with
+_FEATURE_HASHES_PROPERTY = 'feature_hashes'
+
 
 class BaseFeatureExtractor(object):
     pass
@@ -33,13 +56,81 @@ class BaseFeatureExtractor(object):
 
 class ParallelFeatureExtractor(BaseFeatureExtractor):
     
-    def __init__(self, feature_table, n_jobs=1, verbose=False, show_progress=True):
+    def __init__(self, feature_table, n_jobs=1, verbose=False, show_progress=True,
+                 share_tables=False, memoize=False,
+                 memo_size=_DEFAULT_MEMO_SIZE, profile=False,
+                 group_by_ltable=False, tokenized_tables=None):
         self.feature_table = feature_table
         self.n_jobs = n_jobs
         self.verbose = verbose
         self.show_progress = show_progress
+        self.share_tables = share_tables
+        self.memoize = memoize
+        self.memo_size = memo_size
+        self.profile = profile
+        self.group_by_ltable = group_by_ltable
+        self.tokenized_tables = tokenized_tables
+        self.feat_profile = {}
     
     def extract_from(self, candset):
+        feat_vals_by_chunks = list(self.extract_from_chunks(candset))
+        return pd.concat(feat_vals_by_chunks)
+
+    def extract_from_chunks(self, candset, chunk_size=None):
+        """
+        Extract the feature values for consecutive chunks of the candset,
+        yielding one DataFrame of feature values per chunk. The base tables
+        are prepared (and shared with the workers) only once for all the
+        chunks.
+        """
+        for split_rows, feat_vals_by_splits in self._apply_by_chunks(
+                candset, chunk_size, get_feature_cols_by_cand_split):
+            feat_vals = pd.concat(feat_vals_by_splits)
+            if self.group_by_ltable:
+                # Put the rows back in the order of the candset.
+                feat_vals = feat_vals.iloc[np.argsort(
+                    np.concatenate(split_rows), kind='stable')]
+            yield feat_vals
+
+    def extract_matrix_from(self, candset, dtype=np.float32):
+        """
+        Extract the feature values of the candset into a preallocated NumPy
+        array with one row per pair and one column per feature.
+        """
+        feature_matrix = np.empty((len(candset), len(self.feature_table)),
+                                  dtype=dtype)
+
+        def get_worker_args(rows, n_procs):
+            # A single job runs in this process, so it can fill the output
+            # array directly (if its rows are consecutive).
+            if n_procs == 1 and isinstance(rows, slice):
+                return [dtype, feature_matrix[rows]]
+            return [dtype]
+
+        for split_rows, feat_vals_by_splits in self._apply_by_chunks(
+                candset, None, get_feature_matrix_by_cand_split,
+                get_worker_args):
+            for rows, feat_vals in zip(split_rows, feat_vals_by_splits):
+                feature_matrix[rows] = feat_vals
+        return feature_matrix
+
+    def get_feature_profile(self):
+        """
+        Get the cost of each feature in the extractions done so far (if
+        profiling is enabled), as a DataFrame aligned with the feature
+        table.
+        """
+        return _get_feature_profile_table(self.feature_table,
+                                          self.feat_profile)
+
+    def _apply_by_chunks(self, candset, chunk_size, worker_fn,
+                         get_worker_args=None):
+        """
+        Run the worker function over the splits of consecutive chunks of the
+        candset, yielding the rows of the splits (as slices, or as arrays of
+        positions if the pairs are grouped by ltable tuple) and the worker
+        results per chunk.
+        """
         
         # Get metadata for candidate set
         key, fk_ltable, fk_rtable, ltable, rtable, l_key, r_key = \
@@ -48,6 +139,13 @@ class ParallelFeatureExtractor(BaseFeatureExtractor):
         # Set index for convenience
         l_df = ltable.set_index(l_key, drop=False)
         r_df = rtable.set_index(r_key, drop=False)
+
+        # Project the tables on the attributes used by the features, if all
+        # of them are known (black box features get the whole tuples).
+        required_attrs = _get_required_attrs(self.feature_table)
+        if required_attrs is not None:
+            l_df = l_df[required_attrs[0]]
+            r_df = r_df[required_attrs[1]]
         
         # Apply feature functions
         ch.log_info(logger, 'Applying feature functions', self.verbose)
@@ -55,27 +153,108 @@ class ParallelFeatureExtractor(BaseFeatureExtractor):
         fk_ltable_idx = col_names.index(fk_ltable)
         fk_rtable_idx = col_names.index(fk_rtable)
 
-        n_procs = get_num_procs(self.n_jobs, len(candset))
+        if chunk_size is None:
+            chunk_size = max(len(candset), 1)
 
-        c_splits = np.array_split(candset, n_procs)
+        n_procs = get_num_procs(self.n_jobs, min(len(candset), chunk_size))
 
         pickled_obj = cloudpickle.dumps(self.feature_table)
 
-        feat_vals_by_splits = Parallel(n_jobs=n_procs)(
-            delayed(get_feature_vals_by_cand_split)(
-                pickled_obj,
-                fk_ltable_idx,
-                fk_rtable_idx,
-                l_df,
-                r_df,
-                c_split,
-                self.show_progress and i == len(c_splits) - 1
-            )
-            for i, c_split in enumerate(c_splits)
-        )
-
-        feat_vals = sum(feat_vals_by_splits, [])
-        return feat_vals
+        # Write the tables once to memory mapped files, so that the workers
+        # attach to them instead of each receiving a pickled copy.
+        shared_tables = []
+        if self.share_tables and n_procs > 1:
+            ch.log_info(logger, 'Sharing ltable and rtable with the workers',
+                        self.verbose)
+            l_df = SharedTable(l_df)
+            r_df = SharedTable(r_df)
+            shared_tables = [l_df, r_df]
+
+        # With an executor, the workers keep the feature table and the tables
+        # they have already received, so only handles to them are shipped.
+        tokenized_tables = _match_tokenized_tables(self.tokenized_tables,
+                                                   self.feature_table)
+        if n_procs > 1:
+            pickled_obj = share_pickled_object(pickled_obj)
+            if tokenized_tables is not None:
+                tokenized_tables = share_object(tokenized_tables)
+            if not shared_tables and not self.group_by_ltable:
+                l_df = share_object(l_df)
+                r_df = share_object(r_df)
+
+        # The memo is identified by a new id for each extraction, so that the
+        # values memoized by a (reused) worker process are not mixed up
+        # with the values of another feature table.
+        memo_spec = None
+        if self.memoize:
+            memo_spec = (uuid.uuid4().hex, self.memo_size)
+
+        try:
+            for chunk_start in range(0, max(len(candset), 1), chunk_size):
+                chunk = candset.iloc[chunk_start:chunk_start + chunk_size]
+
+                if self.group_by_ltable:
+                    # All the pairs of a left tuple go to the same job, and
+                    # each job gets only the tuples its pairs refer to.
+                    c_splits, order = gh.split_candset_by_ltable(
+                        chunk, fk_ltable, max(min(n_procs, len(chunk)), 1))
+                    split_bounds = np.cumsum(
+                        [0] + [len(c_split) for c_split in c_splits])
+                    split_rows = [chunk_start + order[start:end] for start, end
+                                  in zip(split_bounds[:-1], split_bounds[1:])]
+                    if shared_tables:
+                        l_dfs = [l_df] * len(c_splits)
+                        r_dfs = [r_df] * len(c_splits)
+                    else:
+                        l_dfs = [gh.project_to_keys(l_df, c_split[fk_ltable])
+                                 for c_split in c_splits]
+                        r_dfs = [gh.project_to_keys(r_df, c_split[fk_rtable])
+                                 for c_split in c_splits]
+                        if n_procs > 1:
+                            l_dfs = [share_object(df) for df in l_dfs]
+                            r_dfs = [share_object(df) for df in r_dfs]
+                else:
+                    c_splits = np.array_split(chunk,
+                                              min(n_procs, len(chunk)))
+                    split_starts = chunk_start + np.cumsum(
+                        [0] + [len(c_split) for c_split in c_splits[:-1]])
+                    split_rows = [slice(start, start + len(c_split))
+                                  for start, c_split in zip(split_starts,
+                                                            c_splits)]
+                    l_dfs = [l_df] * len(c_splits)
+                    r_dfs = [r_df] * len(c_splits)
+
+                results = run_parallel((
+                    delayed(worker_fn)(
+                        pickled_obj,
+                        fk_ltable_idx,
+                        fk_rtable_idx,
+                        l_dfs[i],
+                        r_dfs[i],
+                        c_split,
+                        self.show_progress and i == len(c_splits) - 1,
+                        *(get_worker_args(split_rows[i], n_procs)
+                          if get_worker_args is not None else []),
+                        memo_spec=memo_spec,
+                        profile=self.profile,
+                        tokenized_tables=tokenized_tables
+                    )
+                    for i, c_split in enumerate(c_splits)
+                ), n_procs)
+
+                # When profiling, each job also returns the cost of the
+                # features in its split.
+                if self.profile:
+                    results, feat_profiles = zip(*results)
+                    for feat_profile in feat_profiles:
+                        _merge_feat_profiles(self.feat_profile, feat_profile)
+
+                yield split_rows, results
+        finally:
+            for shared_table in shared_tables:
+                shared_table.cleanup()
+            if memo_spec is not None:
+                _feature_memos.pop(memo_spec[0], None)
 
 
 class DistinctFeatureExtractor(BaseFeatureExtractor):
@@ -90,7 +269,9 @@ class DistinctFeatureExtractor(BaseFeatureExtractor):
 def extract_feature_vecs(candset, attrs_before=None, feature_table=None,
                          attrs_after=None, verbose=False,
                          show_progress=True, n_jobs=1,
-                         FeatureExtractor=ParallelFeatureExtractor):
+                         FeatureExtractor=ParallelFeatureExtractor,
+                         share_tables=False, memoize=False,
+                         group_by_ltable=False, tokenized_tables=None):
     """
     This function extracts feature vectors from a DataFrame (typically a
     labeled candidate set).
@@ -113,7 +294,42 @@ def extract_feature_vecs(candset, attrs_before=None, feature_table=None,
             should be displayed (defaults to False).
         show_progress (boolean): A flag to indicate whether the progress of
             extracting feature vectors must be displayed (defaults to True).
-
+        n_jobs (int): The number of parallel jobs to be used for computation
+            (defaults to 1). If -1 all CPUs are used. If 0 or 1,
+            no parallel computation is used at all, which is useful for
+            debugging. For n_jobs below -1, (n_cpus + 1 + n_jobs) are
+            used (where n_cpus is the total number of CPUs in the
+            machine). Thus, for n_jobs = -2, all CPUs but one are used.
+        share_tables (boolean): A flag to indicate whether ltable and rtable
+            should be written once to memory mapped files (in the system's
+            temporary directory) that all the parallel jobs attach to,
+            instead of sending a copy of both tables to every job (defaults
+            to False). This is useful for large tables and many jobs.
+        memoize (boolean): A flag to indicate whether the values of the
+            auto-generated features should be computed only once for each
+            distinct (left attribute value, right attribute value)
+            combination, and copied to all the tuple pairs with the same
+            combination (defaults to False). This is useful when many tuple
+            pairs share the same values, e.g., for attributes such as city,
+            brand or year. The values are also remembered across chunks (in a
+            memo of bounded size, that forgets the least recently used
+            values first). Black box features are always computed for each
+            tuple pair.
+        group_by_ltable (boolean): A flag to indicate whether the tuple pairs
+            should be processed grouped by their ltable tuple (defaults to
+            False). If True, all the pairs of an ltable tuple are processed
+            together by the same job, and each job gets only the tuples its
+            pairs refer to (unless `share_tables` is True). This is useful
+            for black box features over large tables. The feature vectors
+            are returned in the order of the input candset either way.
+        tokenized_tables (tuple): The ltable and rtable tokenized with
+            :meth:`~py_entitymatching.tokenize_tables` (defaults to None).
+            If given, the set-based features (such as jaccard) whose
+            attributes and tokenizers are present in the tokenized tables
+            use their token ids, instead of tokenizing the attributes in
+            each job. This is useful when the features are extracted
+            several times (e.g., for different candsets) from the same
+            tables.
 
     Returns:
         A pandas DataFrame containing feature vectors.
@@ -136,6 +352,8 @@ def extract_feature_vecs(candset, attrs_before=None, feature_table=None,
         AssertionError: If `attrs_after` has attribtues that
             are not present in the input candset.
         AssertionError: If `feature_table` is set to None.
+        AssertionError: If `tokenized_tables` is not a pair of tables
+            tokenized together.
 
 
     Examples:
@@ -151,12 +369,646 @@ def extract_feature_vecs(candset, attrs_before=None, feature_table=None,
     # (Matt) Stage 1: Input validation
     # Validate input parameters
 
-    # # We expect the input candset to be of type pandas DataFrame.
-    validate_object_type(candset, pd.DataFrame, error_prefix='Input cand.set')
-    
     # # We expect the FeatureExtractor class to be of type BaseFeatureExtractor
     validate_subclass(FeatureExtractor, BaseFeatureExtractor, error_prefix='Input FeatureExtractor')
 
+    key, fk_ltable, fk_rtable, ltable, rtable, l_key, r_key = \
+        _validate_extract_inputs(candset, attrs_before, feature_table,
+                                 attrs_after, verbose)
+    _validate_tokenized_tables(tokenized_tables)
+
+    # Extract features
+
+
+
+    # id_list = [(row[fk_ltable], row[fk_rtable]) for i, row in
+    #            candset.iterrows()]
+    # id_list = [tuple(tup) for tup in candset[[fk_ltable, fk_rtable]].values]
+
+    # (Matt) ParallelFeatureExtractor implementation starts here
+    
+    # # Apply feature functions
+    feature_extractor = FeatureExtractor(
+        feature_table,
+        n_jobs=n_jobs,
+        verbose=verbose,
+        show_progress=show_progress,
+        share_tables=share_tables,
+        memoize=memoize,
+        group_by_ltable=group_by_ltable,
+        tokenized_tables=tokenized_tables
+    )
+    feat_vals = feature_extractor.extract_from(candset)
+    
+    # (Matt) ParallelFeatureExtractor implementation ends here; the rest is formatting
+
+    feature_vectors = _construct_feature_vectors(candset, feat_vals,
+                                                 feature_table, attrs_before,
+                                                 attrs_after, key, fk_ltable,
+                                                 fk_rtable, verbose)
+
+    # Reset the index
+    # feature_vectors.reset_index(inplace=True, drop=True)
+
+    # # Update the catalog
+    cm.init_properties(feature_vectors)
+    cm.copy_properties(candset, feature_vectors)
+    _set_feature_hashes(feature_vectors, feature_table)
+
+    # Finally, return the feature vectors
+    return feature_vectors
+
+
+def update_feature_vecs(feature_vectors, feature_table=None, verbose=False,
+                        show_progress=True, n_jobs=1, share_tables=False,
+                        memoize=False):
+    """
+    This function updates a DataFrame of feature vectors (typically the
+    output of :meth:`~py_entitymatching.extract_feature_vecs`) in place, so
+    that it contains the features of the given feature table.
+
+    Specifically, only the features that are not present in the
+    `feature_vectors` (e.g., features added to the feature table using
+    :meth:`~py_entitymatching.add_feature` or
+    :meth:`~py_entitymatching.add_blackbox_feature`) and the features whose
+    function was changed are computed; the values of all the other features
+    are kept. The new feature columns are inserted after the existing
+    feature columns, and the changed ones are replaced.
+
+    To detect changed features, a hash of the function source of each
+    feature (or of the function itself, if the source is not given) is
+    recorded in the catalog, as the 'feature_hashes' property of
+    `feature_vectors`, when the features are extracted or updated. A
+    feature that is already present but whose hash was not recorded (e.g.,
+    a column added by hand) is computed again.
+
+    Args:
+        feature_vectors (DataFrame): The DataFrame of feature vectors to
+            update. The metadata of the DataFrame (key, foreign key ltable,
+            foreign key rtable, ltable and rtable) must be present in the
+            catalog.
+        feature_table (DataFrame): A DataFrame containing a list of
+            features that the feature vectors should contain (defaults to
+            None).
+        verbose (boolean): A flag to indicate whether the debug information
+            should be displayed (defaults to False).
+        show_progress (boolean): A flag to indicate whether the progress of
+            extracting feature vectors must be displayed (defaults to True).
+        n_jobs (int): The number of parallel jobs to be used for computation
+            (defaults to 1). See
+            :meth:`~py_entitymatching.extract_feature_vecs`.
+        share_tables (boolean): A flag to indicate whether ltable and rtable
+            should be shared with the parallel jobs through memory mapped
+            files (defaults to False). See
+            :meth:`~py_entitymatching.extract_feature_vecs`.
+        memoize (boolean): A flag to indicate whether the values of the
+            auto-generated features should be computed only once for each
+            distinct combination of attribute values (defaults to False).
+            See :meth:`~py_entitymatching.extract_feature_vecs`.
+
+    Returns:
+        The input DataFrame of feature vectors (updated in place).
+
+    Raises:
+        AssertionError: If `feature_vectors` is not of type pandas
+            DataFrame.
+        AssertionError: If `feature_table` is set to None.
+
+    Examples:
+        >>> import py_entitymatching as em
+        >>> A = em.read_csv_metadata('path_to_csv_dir/table_A.csv', key='ID')
+        >>> B = em.read_csv_metadata('path_to_csv_dir/table_B.csv', key='ID')
+        >>> match_f = em.get_features_for_matching(A, B)
+        >>> H = em.extract_feature_vecs(G, feature_table=match_f, attrs_after=['gold_labels'])
+        >>> em.add_blackbox_feature(match_f, 'name_len_diff', name_len_diff)
+        >>> # Only the name_len_diff feature is computed
+        >>> em.update_feature_vecs(H, feature_table=match_f)
+
+    See Also:
+        :meth:`~py_entitymatching.extract_feature_vecs`
+    """
+    _validate_extract_inputs(feature_vectors, None, feature_table, None,
+                             verbose)
+
+    # Get the hashes recorded when the feature vectors were last updated
+    feature_hashes = {}
+    if cm.is_property_present_for_df(feature_vectors,
+                                     _FEATURE_HASHES_PROPERTY):
+        feature_hashes = json.loads(
+            cm.get_property(feature_vectors, _FEATURE_HASHES_PROPERTY))
+
+    # Find the features that are missing or whose function has changed
+    feature_names = list(feature_table['feature_name'])
+    new_hashes = dict((feature['feature_name'], _get_feature_hash(feature))
+                      for _, feature in feature_table.iterrows())
+    to_compute = [name for name in feature_names
+                  if name not in feature_vectors.columns or
+                  feature_hashes.get(name) != new_hashes[name]]
+    ch.log_info(logger, 'Computing features: %s' % ', '.join(to_compute),
+                verbose)
+
+    if len(to_compute) > 0:
+        feature_extractor = ParallelFeatureExtractor(
+            feature_table[feature_table['feature_name'].isin(to_compute)],
+            n_jobs=n_jobs,
+            verbose=verbose,
+            show_progress=show_progress,
+            share_tables=share_tables,
+            memoize=memoize
+        )
+        feat_vals = feature_extractor.extract_from(feature_vectors)
+
+        # Insert the new features after the existing feature columns (or at
+        # the end, if there are none)
+        col_names = list(feature_vectors.columns)
+        feature_cols = [i for i, col in enumerate(col_names)
+                        if col in new_hashes]
+        col_pos = max(feature_cols) + 1 if len(feature_cols) > 0 \
+            else len(col_names)
+        for name in to_compute:
+            if name in feature_vectors.columns:
+                feature_vectors[name] = feat_vals[name].values
+            else:
+                feature_vectors.insert(col_pos, name, feat_vals[name].values)
+                col_pos += 1
+
+    # Record the hashes of the features
+    feature_hashes.update(new_hashes)
+    cm.set_property(feature_vectors, _FEATURE_HASHES_PROPERTY,
+                    json.dumps(feature_hashes, sort_keys=True))
+
+    return feature_vectors
+
+
+def _set_feature_hashes(feature_vectors, feature_table):
+    """
+    Record the hashes of the features computed for the feature vectors in
+    the catalog, so that update_feature_vecs can find the changed features.
+    """
+    cm.set_property(feature_vectors, _FEATURE_HASHES_PROPERTY,
+                    _get_feature_hashes(feature_table))
+
+
+def _get_feature_hashes(feature_table):
+    """
+    Get the hashes of the features of a feature table, as a JSON string.
+    """
+    return json.dumps(dict((feature['feature_name'],
+                            _get_feature_hash(feature))
+                           for _, feature in feature_table.iterrows()),
+                      sort_keys=True)
+
+
+def _get_feature_hash(feature):
+    """
+    Get a hash of the function of a feature, computed from its source (or
+    from the pickled function, if the source is not given).
+    """
+    function_source = feature['function_source']
+    if isinstance(function_source, six.string_types):
+        content = function_source.encode('utf-8')
+    else:
+        content = cloudpickle.dumps(feature['function'])
+    return hashlib.md5(content).hexdigest()
+
+
+def profile_feature_vecs(candset, feature_table=None, sample_size=None,
+                         random_state=None, verbose=False, show_progress=True,
+                         n_jobs=1, share_tables=False, memoize=False):
+    """
+    This function measures the cost of each feature in a feature table, by
+    extracting the feature vectors from a DataFrame (typically a candidate
+    set, or a sample of it).
+
+    Specifically, for each feature this function records the cumulative
+    wall time spent in computing the feature (summed over all the parallel
+    jobs), the number of tuple pairs the feature was computed for and the
+    number of missing values (NaN) it returned. The time spent in
+    tokenizing an attribute is counted for the first feature that uses the
+    tokens, as the tokens are shared by all the features.
+
+    The auto-generated features are NaN for the tuple pairs with a missing
+    value in one of their attributes. These pairs are found using a mask of
+    the missing values of each attribute (computed once per table), and are
+    neither tokenized nor compared. The number of such pairs is also
+    recorded for each feature.
+
+    Args:
+        candset (DataFrame): The input candidate set for which the features
+            vectors should be extracted.
+        feature_table (DataFrame): A DataFrame containing a list of
+            features that should be profiled (defaults to None).
+        sample_size (int): The number of tuple pairs to sample from the
+            candset (defaults to None, in which case all the tuple pairs are
+            used).
+        random_state (object): The seed or the random state to be used for
+            sampling (defaults to None).
+        verbose (boolean): A flag to indicate whether the debug information
+            should be displayed (defaults to False).
+        show_progress (boolean): A flag to indicate whether the progress of
+            extracting feature vectors must be displayed (defaults to True).
+        n_jobs (int): The number of parallel jobs to be used for computation
+            (defaults to 1). See
+            :meth:`~py_entitymatching.extract_feature_vecs`.
+        share_tables (boolean): A flag to indicate whether ltable and rtable
+            should be shared with the parallel jobs through memory mapped
+            files (defaults to False). See
+            :meth:`~py_entitymatching.extract_feature_vecs`.
+        memoize (boolean): A flag to indicate whether the values of the
+            auto-generated features should be computed only once for each
+            distinct combination of attribute values (defaults to False).
+            See :meth:`~py_entitymatching.extract_feature_vecs`.
+
+    Returns:
+        A pandas DataFrame with the same index as the `feature_table`,
+        containing the following columns for each feature: 'feature_name',
+        'time' (in seconds), 'n_calls' (the number of tuple pairs the
+        feature was computed for), 'nan_count', 'null_count' (the number of
+        tuple pairs with a missing value in one of the feature's
+        attributes), 'time_per_call' and 'null_rate' (the fraction of the
+        tuple pairs with a missing value). The null count and rate are NaN
+        for the features whose attributes are not known (e.g. black box
+        features).
+
+    Raises:
+        AssertionError: If `candset` is not of type pandas
+            DataFrame.
+        AssertionError: If `feature_table` is set to None.
+        AssertionError: If `sample_size` is not a positive integer.
+
+    Examples:
+        >>> import py_entitymatching as em
+        >>> A = em.read_csv_metadata('path_to_csv_dir/table_A.csv', key='ID')
+        >>> B = em.read_csv_metadata('path_to_csv_dir/table_B.csv', key='ID')
+        >>> match_f = em.get_features_for_matching(A, B)
+        >>> profile = em.profile_feature_vecs(C, feature_table=match_f, sample_size=1000)
+        >>> profile.sort_values('time', ascending=False).head()
+
+    See Also:
+        :meth:`~py_entitymatching.extract_feature_vecs`
+    """
+    _validate_extract_inputs(candset, None, feature_table, None, verbose)
+
+    if sample_size is not None:
+        # We expect the sample size to be a positive integer
+        if not isinstance(sample_size, int) or \
+                isinstance(sample_size, bool) or sample_size <= 0:
+            logger.error('Sample size should be a positive integer')
+            raise AssertionError('Sample size should be a positive integer')
+        if sample_size < len(candset):
+            sample = candset.sample(sample_size, random_state=random_state)
+            cm.init_properties(sample)
+            cm.copy_properties(candset, sample)
+            candset = sample
+
+    feature_extractor = ParallelFeatureExtractor(
+        feature_table,
+        n_jobs=n_jobs,
+        verbose=verbose,
+        show_progress=show_progress,
+        share_tables=share_tables,
+        memoize=memoize,
+        profile=True
+    )
+    feature_extractor.extract_from(candset)
+    return feature_extractor.get_feature_profile()
+
+
+def extract_feature_matrix(candset, feature_table=None, dtype=np.float32,
+                           verbose=False, show_progress=True, n_jobs=1,
+                           share_tables=False, memoize=False,
+                           group_by_ltable=False, tokenized_tables=None):
+    """
+    This function extracts feature vectors from a DataFrame (typically a
+    candidate set) into a dense NumPy array.
+
+    Specifically, the feature values are written directly into a
+    preallocated array with one row per tuple pair of the `candset` (in the
+    same order) and one column per feature (in the same order as in the
+    `feature_table`), without building a pandas DataFrame of feature
+    vectors. With the default float32 type, the array takes half the memory
+    of a float64 feature matrix. The array can be given to the ML-matchers
+    as input (`x`) to fit and predict.
+
+    All the features must return numeric (or Boolean) values; missing
+    values are stored as NaN.
+
+    Args:
+        candset (DataFrame): The input candidate set for which the features
+            vectors should be extracted.
+        feature_table (DataFrame): A DataFrame containing a list of
+            features that should be used to compute the feature vectors (
+            defaults to None).
+        dtype (type): The type of the array, either numpy.float32 or
+            numpy.float64 (defaults to numpy.float32).
+        verbose (boolean): A flag to indicate whether the debug information
+            should be displayed (defaults to False).
+        show_progress (boolean): A flag to indicate whether the progress of
+            extracting feature vectors must be displayed (defaults to True).
+        n_jobs (int): The number of parallel jobs to be used for computation
+            (defaults to 1). See
+            :meth:`~py_entitymatching.extract_feature_vecs`.
+        share_tables (boolean): A flag to indicate whether ltable and rtable
+            should be shared with the parallel jobs through memory mapped
+            files (defaults to False). See
+            :meth:`~py_entitymatching.extract_feature_vecs`.
+        memoize (boolean): A flag to indicate whether the values of the
+            auto-generated features should be computed only once for each
+            distinct combination of attribute values (defaults to False).
+            See :meth:`~py_entitymatching.extract_feature_vecs`.
+        group_by_ltable (boolean): A flag to indicate whether the tuple pairs
+            should be processed grouped by their ltable tuple (defaults to
+            False). See :meth:`~py_entitymatching.extract_feature_vecs`.
+        tokenized_tables (tuple): The ltable and rtable tokenized with
+            :meth:`~py_entitymatching.tokenize_tables` (defaults to None).
+            See :meth:`~py_entitymatching.extract_feature_vecs`.
+
+    Returns:
+        A NumPy array of shape (number of tuple pairs, number of features)
+        containing the feature vectors.
+
+    Raises:
+        AssertionError: If `candset` is not of type pandas
+            DataFrame.
+        AssertionError: If `feature_table` is set to None.
+        AssertionError: If `dtype` is not numpy.float32 or numpy.float64.
+        AssertionError: If `tokenized_tables` is not a pair of tables
+            tokenized together.
+
+    Examples:
+        >>> import py_entitymatching as em
+        >>> A = em.read_csv_metadata('path_to_csv_dir/table_A.csv', key='ID')
+        >>> B = em.read_csv_metadata('path_to_csv_dir/table_B.csv', key='ID')
+        >>> match_f = em.get_features_for_matching(A, B)
+        >>> X = em.extract_feature_matrix(G, feature_table=match_f)
+        >>> rf = em.RFMatcher()
+        >>> rf.fit(x=X, y=G['gold_labels'].values)
+        >>> predictions = rf.predict(x=em.extract_feature_matrix(C, feature_table=match_f))
+
+    See Also:
+        :meth:`~py_entitymatching.extract_feature_vecs`
+    """
+    _validate_extract_inputs(candset, None, feature_table, None, verbose)
+    _validate_tokenized_tables(tokenized_tables)
+
+    # We expect the type of the array to be a float type
+    if dtype not in [np.float32, np.float64]:
+        logger.error('The dtype should be numpy.float32 or numpy.float64')
+        raise AssertionError('The dtype should be numpy.float32 or '
+                             'numpy.float64')
+
+    feature_extractor = ParallelFeatureExtractor(
+        feature_table,
+        n_jobs=n_jobs,
+        verbose=verbose,
+        show_progress=show_progress,
+        share_tables=share_tables,
+        memoize=memoize,
+        group_by_ltable=group_by_ltable,
+        tokenized_tables=tokenized_tables
+    )
+    return feature_extractor.extract_matrix_from(candset, dtype=dtype)
+
+
+def extract_feature_vecs_by_chunks(candset, attrs_before=None,
+                                   feature_table=None, attrs_after=None,
+                                   chunk_size=100000, verbose=False,
+                                   show_progress=True, n_jobs=1,
+                                   share_tables=False, memoize=False):
+    """
+    This function extracts feature vectors from a DataFrame (typically a
+    labeled candidate set) chunk by chunk.
+
+    Specifically, this function processes `chunk_size` tuple pairs of the
+    `candset` at a time and yields the feature vectors of each chunk, so
+    that the memory needed is bounded by the chunk size and not by the size
+    of the candset. Concatenating the yielded DataFrames gives the same
+    result as :meth:`~py_entitymatching.extract_feature_vecs`.
+
+    Args:
+        candset (DataFrame): The input candidate set for which the features
+            vectors should be extracted.
+        attrs_before (list): The list of attributes from the input candset,
+            that should be added before the feature vectors (defaults to None).
+        feature_table (DataFrame): A DataFrame containing a list of
+            features that should be used to compute the feature vectors (
+            defaults to None).
+        attrs_after (list): The list of attributes from the input candset
+            that should be added after the feature vectors (defaults to None).
+        chunk_size (int): The number of tuple pairs to process at a time
+            (defaults to 100000).
+        verbose (boolean): A flag to indicate whether the debug information
+            should be displayed (defaults to False).
+        show_progress (boolean): A flag to indicate whether the progress of
+            extracting feature vectors must be displayed (defaults to True).
+        n_jobs (int): The number of parallel jobs to be used for computation
+            (defaults to 1). See
+            :meth:`~py_entitymatching.extract_feature_vecs`.
+        share_tables (boolean): A flag to indicate whether ltable and rtable
+            should be shared with the parallel jobs through memory mapped
+            files (defaults to False). See
+            :meth:`~py_entitymatching.extract_feature_vecs`.
+        memoize (boolean): A flag to indicate whether the values of the
+            auto-generated features should be computed only once for each
+            distinct combination of attribute values (defaults to False).
+            See :meth:`~py_entitymatching.extract_feature_vecs`.
+
+    Returns:
+        A generator of pandas DataFrames containing the feature vectors of
+        consecutive chunks of the candset. The DataFrames have the same
+        columns and the same metadata in the catalog as the output of
+        :meth:`~py_entitymatching.extract_feature_vecs`.
+
+    Raises:
+        AssertionError: If `candset` is not of type pandas
+            DataFrame.
+        AssertionError: If `attrs_before` has attributes that
+            are not present in the input candset.
+        AssertionError: If `attrs_after` has attribtues that
+            are not present in the input candset.
+        AssertionError: If `feature_table` is set to None.
+        AssertionError: If `chunk_size` is not a positive integer.
+
+    Examples:
+        >>> import py_entitymatching as em
+        >>> A = em.read_csv_metadata('path_to_csv_dir/table_A.csv', key='ID')
+        >>> B = em.read_csv_metadata('path_to_csv_dir/table_B.csv', key='ID')
+        >>> match_f = em.get_features_for_matching(A, B)
+        >>> for H in em.extract_feature_vecs_by_chunks(C, feature_table=match_f, chunk_size=50000):
+        ...     predictions = rf.predict(table=H, exclude_attrs=['_id', 'ltable_ID', 'rtable_ID'])
+
+    See Also:
+        :meth:`~py_entitymatching.extract_feature_vecs_to_file`
+    """
+    # Validate input parameters (before the generator is started, so that
+    # the errors are raised when the function is called)
+    key, fk_ltable, fk_rtable, ltable, rtable, l_key, r_key = \
+        _validate_extract_inputs(candset, attrs_before, feature_table,
+                                 attrs_after, verbose)
+    _validate_chunk_size(chunk_size)
+
+    return _extract_feature_vecs_by_chunks(candset, attrs_before,
+                                           feature_table, attrs_after,
+                                           chunk_size, verbose, show_progress,
+                                           n_jobs, share_tables, memoize,
+                                           key, fk_ltable, fk_rtable)
+
+
+def _extract_feature_vecs_by_chunks(candset, attrs_before, feature_table,
+                                    attrs_after, chunk_size, verbose,
+                                    show_progress, n_jobs, share_tables,
+                                    memoize, key, fk_ltable, fk_rtable):
+    # The progress is shown per chunk, not per candset split
+    feature_extractor = ParallelFeatureExtractor(
+        feature_table,
+        n_jobs=n_jobs,
+        verbose=verbose,
+        show_progress=False,
+        share_tables=share_tables,
+        memoize=memoize
+    )
+    if show_progress:
+        n_chunks = max(int(np.ceil(len(candset) / float(chunk_size))), 1)
+        prog_bar = pyprind.ProgBar(n_chunks)
+
+    chunk_start = 0
+    for feat_vals in feature_extractor.extract_from_chunks(candset,
+                                                           chunk_size):
+        chunk = candset.iloc[chunk_start:chunk_start + len(feat_vals)]
+        chunk_start += len(feat_vals)
+        if show_progress:
+            prog_bar.update()
+        feature_vectors = _construct_feature_vectors(chunk, feat_vals,
+                                                     feature_table,
+                                                     attrs_before,
+                                                     attrs_after, key,
+                                                     fk_ltable, fk_rtable,
+                                                     verbose)
+        cm.init_properties(feature_vectors)
+        cm.copy_properties(candset, feature_vectors)
+        _set_feature_hashes(feature_vectors, feature_table)
+        yield feature_vectors
+
+
+def extract_feature_vecs_to_file(candset, file_path, attrs_before=None,
+                                 feature_table=None, attrs_after=None,
+                                 chunk_size=100000, file_format='parquet',
+                                 verbose=False, show_progress=True, n_jobs=1,
+                                 share_tables=False, memoize=False):
+    """
+    This function extracts feature vectors from a DataFrame (typically a
+    labeled candidate set) and writes them to a columnar file, chunk by chunk.
+
+    Specifically, the feature vectors of each chunk of `chunk_size` tuple
+    pairs are appended to a Parquet or Feather file as soon as they are
+    computed, so that the candset's feature vectors never have to fit in
+    memory at once. The metadata of the candset (key, foreign key ltable
+    and foreign key rtable) and the hashes of the features (used by
+    :meth:`~py_entitymatching.update_feature_vecs`) are stored in the file,
+    and the file can be read back (as a whole or lazily, chunk by chunk)
+    using :meth:`~py_entitymatching.read_columnar_metadata`.
+
+    This function requires the pyarrow package. All the feature values are
+    written as floats.
+
+    Args:
+        candset (DataFrame): The input candidate set for which the features
+            vectors should be extracted.
+        file_path (string): The file path to which the feature vectors
+            should be written.
+        attrs_before (list): The list of attributes from the input candset,
+            that should be added before the feature vectors (defaults to None).
+        feature_table (DataFrame): A DataFrame containing a list of
+            features that should be used to compute the feature vectors (
+            defaults to None).
+        attrs_after (list): The list of attributes from the input candset
+            that should be added after the feature vectors (defaults to None).
+        chunk_size (int): The number of tuple pairs to process at a time
+            (defaults to 100000).
+        file_format (string): The format of the file, either 'parquet' or
+            'feather' (defaults to 'parquet').
+        verbose (boolean): A flag to indicate whether the debug information
+            should be displayed (defaults to False).
+        show_progress (boolean): A flag to indicate whether the progress of
+            extracting feature vectors must be displayed (defaults to True).
+        n_jobs (int): The number of parallel jobs to be used for computation
+            (defaults to 1). See
+            :meth:`~py_entitymatching.extract_feature_vecs`.
+        share_tables (boolean): A flag to indicate whether ltable and rtable
+            should be shared with the parallel jobs through memory mapped
+            files (defaults to False). See
+            :meth:`~py_entitymatching.extract_feature_vecs`.
+        memoize (boolean): A flag to indicate whether the values of the
+            auto-generated features should be computed only once for each
+            distinct combination of attribute values (defaults to False).
+            See :meth:`~py_entitymatching.extract_feature_vecs`.
+
+    Returns:
+        A Boolean value of True is returned if the file was written
+        successfully.
+
+    Raises:
+        AssertionError: If `candset` is not of type pandas
+            DataFrame.
+        AssertionError: If `file_path` is not of type string.
+        AssertionError: If `attrs_before` has attributes that
+            are not present in the input candset.
+        AssertionError: If `attrs_after` has attribtues that
+            are not present in the input candset.
+        AssertionError: If `feature_table` is set to None.
+        AssertionError: If `chunk_size` is not a positive integer.
+        AssertionError: If `file_format` is not 'parquet' or 'feather'.
+        ImportError: If pyarrow is not installed.
+
+    Examples:
+        >>> import py_entitymatching as em
+        >>> A = em.read_csv_metadata('path_to_csv_dir/table_A.csv', key='ID')
+        >>> B = em.read_csv_metadata('path_to_csv_dir/table_B.csv', key='ID')
+        >>> match_f = em.get_features_for_matching(A, B)
+        >>> em.extract_feature_vecs_to_file(C, './C_feature_vecs.parquet', feature_table=match_f)
+        >>> H = em.read_columnar_metadata('./C_feature_vecs.parquet', ltable=A, rtable=B)
+
+    See Also:
+        :meth:`~py_entitymatching.extract_feature_vecs_by_chunks`,
+        :meth:`~py_entitymatching.read_columnar_metadata`
+    """
+    validate_object_type(file_path, six.string_types,
+                         error_prefix='Input file path')
+
+    feature_vecs_by_chunks = extract_feature_vecs_by_chunks(
+        candset, attrs_before=attrs_before, feature_table=feature_table,
+        attrs_after=attrs_after, chunk_size=chunk_size, verbose=verbose,
+        show_progress=show_progress, n_jobs=n_jobs,
+        share_tables=share_tables, memoize=memoize)
+
+    # The feature values are written as floats, so that every chunk has the
+    # same schema no matter whether it contains missing values.
+    feature_names = list(feature_table['feature_name'])
+    properties = dict(cm.get_all_properties(candset))
+    properties[_FEATURE_HASHES_PROPERTY] = _get_feature_hashes(feature_table)
+    # The attributes of the candset with only missing values in the first
+    # chunk are typed from the whole candset.
+    writer = ColumnarFileWriter(file_path, file_format, properties,
+                                type_source=candset)
+    try:
+        for feature_vectors in feature_vecs_by_chunks:
+            feature_vectors[feature_names] = \
+                feature_vectors[feature_names].astype(np.float64)
+            writer.write(feature_vectors)
+    finally:
+        writer.close()
+    return True
+
+
+def _validate_extract_inputs(candset, attrs_before, feature_table,
+                             attrs_after, verbose):
+    """
+    Validate the inputs of the extract feature vector commands and return
+    the candset's metadata.
+    """
+    # # We expect the input candset to be of type pandas DataFrame.
+    validate_object_type(candset, pd.DataFrame, error_prefix='Input cand.set')
+
     # (Matt) The two blocks below are making sure that attributes that are to be appended
     # to this function's output do in fact exist in the input DataFrame
     
@@ -209,29 +1061,45 @@ def extract_feature_vecs(candset, attrs_before=None, feature_table=None,
                                       ltable, rtable, l_key, r_key,
                                       logger, verbose)
 
-    # Extract features
+    return key, fk_ltable, fk_rtable, ltable, rtable, l_key, r_key
 
 
+def _validate_tokenized_tables(tokenized_tables):
+    if tokenized_tables is None:
+        return
+    # We expect the ltable and rtable tokenized with a common dictionary
+    if not isinstance(tokenized_tables, (tuple, list)) or \
+            len(tokenized_tables) != 2 or \
+            not all(isinstance(t, TokenizedTable) for t in tokenized_tables) or \
+            tokenized_tables[0].dictionary_id != \
+            tokenized_tables[1].dictionary_id:
+        logger.error('The tokenized tables should be the pair of tables '
+                     'returned by tokenize_tables')
+        raise AssertionError('The tokenized tables should be the pair of '
+                             'tables returned by tokenize_tables')
 
-    # id_list = [(row[fk_ltable], row[fk_rtable]) for i, row in
-    #            candset.iterrows()]
-    # id_list = [tuple(tup) for tup in candset[[fk_ltable, fk_rtable]].values]
 
-    # (Matt) ParallelFeatureExtractor implementation starts here
-    
-    # # Apply feature functions
-    feature_extractor = FeatureExtractor(
-        feature_table,
-        n_jobs=n_jobs,
-        verbose=verbose,
-        show_progress=show_progress
-    )
-    feat_vals = feature_extractor.extract_from(candset)
-    
-    # (Matt) ParallelFeatureExtractor implementation ends here; the rest is formatting
+def _validate_chunk_size(chunk_size):
+    # We expect the chunk size to be a positive integer
+    if not isinstance(chunk_size, int) or isinstance(chunk_size, bool) or \
+            chunk_size <= 0:
+        logger.error('Chunk size should be a positive integer')
+        raise AssertionError('Chunk size should be a positive integer')
 
+
+def _construct_feature_vectors(candset, feat_vals, feature_table,
+                               attrs_before, attrs_after, key, fk_ltable,
+                               fk_rtable, verbose):
+    """
+    Construct the output table from the feature values of the candset
+    tuple pairs.
+    """
     # Construct output table
-    feature_vectors = pd.DataFrame(feat_vals, index=candset.index.values)
+    if isinstance(feat_vals, pd.DataFrame):
+        feature_vectors = feat_vals
+        feature_vectors.index = candset.index.values
+    else:
+        feature_vectors = pd.DataFrame(feat_vals, index=candset.index.values)
     # # Rearrange the feature names in the input feature table order
     feature_names = list(feature_table['feature_name'])
     feature_vectors = feature_vectors[feature_names]
@@ -263,50 +1131,632 @@ def extract_feature_vecs(candset, attrs_before=None, feature_table=None,
             feature_vectors.insert(col_pos, a, candset[a])
             col_pos += 1
 
-    # Reset the index
-    # feature_vectors.reset_index(inplace=True, drop=True)
+    return feature_vectors
 
-    # # Update the catalog
-    cm.init_properties(feature_vectors)
-    cm.copy_properties(candset, feature_vectors)
 
-    # Finally, return the feature vectors
-    return feature_vectors
+def get_feature_cols_by_cand_split(pickled_obj, fk_ltable_idx, fk_rtable_idx,
+                                   l_df, r_df, candsplit, show_progress,
+                                   memo_spec=None, profile=False,
+                                   tokenized_tables=None):
+    """
+    Compute the feature values for a candset split, one feature column at
+    a time.
+
+    Auto-generated features are evaluated over whole attribute columns
+    (gathered from l_df and r_df using the foreign key values), while the
+    remaining (e.g. black box) features fall back to the per-pair path.
+    The result is a DataFrame with one column per feature, indexed like the
+    candset split.
+    """
+    feature_table = loads_shared_object(pickled_obj)
+    l_df, r_df = get_shared_object(l_df), get_shared_object(r_df)
+    tokenized_tables = get_shared_object(tokenized_tables)
+    feature_names = list(feature_table['feature_name'])
+
+    feat_profile = {} if profile else None
+    feat_cols = dict(_iter_feature_cols(feature_table, fk_ltable_idx,
+                                        fk_rtable_idx, l_df, r_df, candsplit,
+                                        show_progress, memo_spec,
+                                        feat_profile, tokenized_tables))
+
+    feat_vals = pd.DataFrame(feat_cols, index=candsplit.index)
+    if profile:
+        return feat_vals[feature_names], feat_profile
+    return feat_vals[feature_names]
+
+
+def get_feature_matrix_by_cand_split(pickled_obj, fk_ltable_idx,
+                                     fk_rtable_idx, l_df, r_df, candsplit,
+                                     show_progress, dtype, out=None,
+                                     memo_spec=None, profile=False,
+                                     tokenized_tables=None):
+    """
+    Compute the feature values for a candset split into a NumPy array with
+    one row per pair and one column per feature (in the feature table
+    order). If `out` is given, the values are written into it instead of a
+    new array.
+    """
+    feature_table = loads_shared_object(pickled_obj)
+    l_df, r_df = get_shared_object(l_df), get_shared_object(r_df)
+    tokenized_tables = get_shared_object(tokenized_tables)
+    feature_pos = dict((name, i) for i, name in
+                       enumerate(feature_table['feature_name']))
+
+    if out is None:
+        out = np.empty((len(candsplit), len(feature_pos)), dtype=dtype)
+
+    feat_profile = {} if profile else None
+    for name, vals in _iter_feature_cols(feature_table, fk_ltable_idx,
+                                         fk_rtable_idx, l_df, r_df, candsplit,
+                                         show_progress, memo_spec,
+                                         feat_profile, tokenized_tables):
+        # Missing values (None) are stored as NaN.
+        out[:, feature_pos[name]] = np.asarray(vals, dtype=np.float64)
+    if profile:
+        return out, feat_profile
+    return out
+
+
+def _iter_feature_cols(feature_table, fk_ltable_idx, fk_rtable_idx, l_df,
+                       r_df, candsplit, show_progress, memo_spec=None,
+                       feat_profile=None, tokenized_tables=None):
+    """
+    Compute the feature values for a candset split, yielding a (feature
+    name, list of values) tuple per feature. If a memo spec (memo id, memo
+    size) is given, the auto-generated features are computed once per
+    distinct combination of attribute values. If a feature profile
+    dictionary is given, the cost of each feature is added to it. If
+    tokenized tables are given, the set-based features use their token ids
+    instead of tokenizing the attributes.
+    """
+    # Split the features into the ones that can be computed column-wise and
+    # the ones that must be applied to each pair of tuples
+    batch_specs = []
+    pair_feature_table = []
+    for _, feature in feature_table.iterrows():
+        spec = _get_batch_spec(feature)
+        if spec is not None:
+            batch_specs.append(spec)
+        else:
+            pair_feature_table.append(feature)
+
+    if show_progress:
+        n_steps = len(batch_specs)
+        if len(pair_feature_table) > 0:
+            n_steps += len(candsplit)
+        prog_bar = pyprind.ProgBar(max(n_steps, 1))
+
+    # Get the positions of the tuples in l_df and r_df referred to by each
+    # pair in the candset split
+    l_pos = l_df.index.get_indexer(candsplit.iloc[:, fk_ltable_idx].values)
+    r_pos = r_df.index.get_indexer(candsplit.iloc[:, fk_rtable_idx].values)
+
+    # Each tuple is tokenized once per (attribute, tokenizer); the tokens are
+    # shared by all the features and all the pairs that refer to the tuple.
+    tok_cache = {}
+    if tokenized_tables is not None:
+        tok_cache['tokenized_tables'] = tokenized_tables
+    l_uniq_pos, l_inv = np.unique(l_pos, return_inverse=True)
+    r_uniq_pos, r_inv = np.unique(r_pos, return_inverse=True)
+
+    memo = _get_feature_memo(memo_spec)
+    for spec in batch_specs:
+        if memo is not None:
+            vals = _apply_feat_batch_memoized(
+                spec, memo, tok_cache, l_df, r_df, l_uniq_pos, l_inv,
+                r_uniq_pos, r_inv, feat_profile)
+        else:
+            vals = _apply_feat_batch(
+                spec, tok_cache, l_df, r_df, l_uniq_pos, l_inv, r_uniq_pos,
+                r_inv, feat_profile)
+        if feat_profile is not None:
+            null_count = 0
+            if _propagates_nulls(spec):
+                null_count = int(_get_pair_nulls(
+                    spec, tok_cache, l_df, r_df, l_uniq_pos, l_inv,
+                    r_uniq_pos, r_inv).sum())
+            _update_feat_profile(feat_profile, spec['feature_name'],
+                                 nan_count=_get_nan_count(vals),
+                                 null_count=null_count)
+        yield spec['feature_name'], vals
+        if show_progress:
+            prog_bar.update()
+
+    if len(pair_feature_table) > 0:
+        pair_feature_table = pd.DataFrame(pair_feature_table)
+        pair_rows = _get_feature_rows_by_pairs(pair_feature_table,
+                                               fk_ltable_idx, fk_rtable_idx,
+                                               l_df, r_df, candsplit,
+                                               prog_bar if show_progress
+                                               else None, feat_profile)
+        for i, name in enumerate(pair_feature_table['feature_name']):
+            vals = [row[i] for row in pair_rows]
+            if feat_profile is not None:
+                _update_feat_profile(feat_profile, name,
+                                     nan_count=_get_nan_count(vals))
+            yield name, vals
+
+
+def _get_required_attrs(feature_table):
+    """
+    Get the ltable and rtable attributes used by the features, or None if
+    some feature may use any attribute of the tuples.
+    """
+    l_attrs = []
+    r_attrs = []
+    for _, feature in feature_table.iterrows():
+        spec = _get_batch_spec(feature)
+        if spec is None:
+            return None
+        if spec['left_attribute'] not in l_attrs:
+            l_attrs.append(spec['left_attribute'])
+        if spec['right_attribute'] not in r_attrs:
+            r_attrs.append(spec['right_attribute'])
+    return l_attrs, r_attrs
+
+
+def _get_batch_spec(feature):
+    """
+    Get the attributes, tokenizers and similarity function of an
+    auto-generated feature, so that it can be computed column-wise. Returns
+    None if the feature must be computed pair by pair.
+    """
+    if isinstance(feature['function'], FeatureFunction):
+        spec = feature['function'].get_batch_spec()
+        spec['feature_name'] = feature['feature_name']
+        return spec
+    if feature['is_auto_generated'] != True:
+        return None
+    # The tokenizers and similarity functions of the features compiled from
+    # their source (e.g. loaded from older feature tables) are resolved from
+    # the namespace the feature function was compiled in.
+    fn_globals = getattr(feature['function'], '__globals__', {})
+    sim_fn = fn_globals.get(feature['simfunction'])
+    if sim_fn is None:
+        return None
+    l_tok = feature['left_attr_tokenizer']
+    r_tok = feature['right_attr_tokenizer']
+    if pd.isnull(l_tok) != pd.isnull(r_tok):
+        return None
+    if not pd.isnull(l_tok):
+        l_tok_fn = fn_globals.get(l_tok)
+        r_tok_fn = fn_globals.get(r_tok)
+        if l_tok_fn is None or r_tok_fn is None:
+            return None
+    else:
+        l_tok, r_tok, l_tok_fn, r_tok_fn = None, None, None, None
+    return {'feature_name': feature['feature_name'],
+            'left_attribute': feature['left_attribute'],
+            'right_attribute': feature['right_attribute'],
+            'left_attr_tokenizer': l_tok,
+            'right_attr_tokenizer': r_tok,
+            'left_tok_fn': l_tok_fn,
+            'right_tok_fn': r_tok_fn,
+            'simfunction': sim_fn}
+
+
+def _apply_feat_batch(spec, tok_cache, l_df, r_df, l_uniq_pos, l_inv,
+                      r_uniq_pos, r_inv, feat_profile=None):
+    """
+    Compute an auto-generated feature over the whole candset split.
+    """
+    if feat_profile is None:
+        return _compute_feat_batch(spec, tok_cache, l_df, r_df, l_uniq_pos,
+                                   l_inv, r_uniq_pos, r_inv)
+    # The time to tokenize the attributes is counted for the first feature
+    # that uses the tokens.
+    start_time = timeit.default_timer()
+    vals = _compute_feat_batch(spec, tok_cache, l_df, r_df, l_uniq_pos, l_inv,
+                               r_uniq_pos, r_inv)
+    _update_feat_profile(feat_profile, spec['feature_name'],
+                         time=timeit.default_timer() - start_time,
+                         n_calls=len(l_inv))
+    return vals
+
+
+def _compute_feat_batch(spec, tok_cache, l_df, r_df, l_uniq_pos, l_inv,
+                        r_uniq_pos, r_inv):
+    if _propagates_nulls(spec):
+        # The pairs with a missing value get NaN without being tokenized or
+        # compared.
+        pair_nulls = _get_pair_nulls(spec, tok_cache, l_df, r_df, l_uniq_pos,
+                                     l_inv, r_uniq_pos, r_inv)
+        if pair_nulls.any():
+            rows = np.flatnonzero(~pair_nulls)
+            vals = _compute_feat_batch_values(spec, tok_cache, l_df, r_df,
+                                              l_uniq_pos, l_inv[rows],
+                                              r_uniq_pos, r_inv[rows])
+            return _scatter_non_null_vals(vals, rows, len(pair_nulls))
+    return _compute_feat_batch_values(spec, tok_cache, l_df, r_df, l_uniq_pos,
+                                      l_inv, r_uniq_pos, r_inv)
+
+
+def _propagates_nulls(spec):
+    """
+    Check whether a feature is NaN for all the pairs with a missing value,
+    i.e. whether it uses the similarity functions (and tokenizers) of
+    py_entitymatching.
+    """
+    if spec['simfunction'] not in sim._null_propagating_sim_fns:
+        return False
+    if spec['left_tok_fn'] is None:
+        return True
+    return tok._preserves_nulls(spec['left_tok_fn']) and \
+        tok._preserves_nulls(spec['right_tok_fn'])
+
+
+def _get_null_mask(tok_cache, table_name, df, attr, uniq_pos):
+    """
+    Get the mask of the missing values of an attribute for the given tuple
+    positions, computing it only the first time it is requested.
+    """
+    cache_key = ('nulls', table_name, attr)
+    if cache_key not in tok_cache:
+        tok_cache[cache_key] = np.asarray(
+            pd.isnull(take_values(df, attr, uniq_pos)), dtype=bool)
+    return tok_cache[cache_key]
+
+
+def _get_pair_nulls(spec, tok_cache, l_df, r_df, l_uniq_pos, l_inv,
+                    r_uniq_pos, r_inv):
+    """
+    Get the mask of the pairs that have a missing value in the left or the
+    right attribute of a feature.
+    """
+    l_nulls = _get_null_mask(tok_cache, 'ltable', l_df,
+                             spec['left_attribute'], l_uniq_pos)
+    r_nulls = _get_null_mask(tok_cache, 'rtable', r_df,
+                             spec['right_attribute'], r_uniq_pos)
+    return l_nulls[l_inv] | r_nulls[r_inv]
+
+
+def _scatter_non_null_vals(vals, rows, n_pairs):
+    """
+    Put the feature values of the pairs without missing values at their
+    rows, and NaN at the other rows.
+    """
+    if isinstance(vals, np.ndarray):
+        out = np.full(n_pairs, np.NaN)
+        out[rows] = vals
+        return out
+    out = np.full(n_pairs, np.NaN, dtype=object)
+    out[rows] = np.asarray(vals, dtype=object)
+    return out.tolist()
+
+
+def _compute_feat_batch_values(spec, tok_cache, l_df, r_df, l_uniq_pos, l_inv,
+                               r_uniq_pos, r_inv):
+    measure_name = sim._set_sim_measure_names.get(spec['simfunction'])
+    if spec['left_tok_fn'] is not None and measure_name is not None:
+        # Set-based measures are computed for all the pairs at once over
+        # the interned tokens.
+        l_csr, r_csr = _get_token_id_csrs(tok_cache, spec, l_df, r_df,
+                                          l_uniq_pos, r_uniq_pos)
+        l_indptr, l_indices = sim._take_csr_rows(l_csr[0], l_csr[1], l_inv)
+        r_indptr, r_indices = sim._take_csr_rows(r_csr[0], r_csr[1], r_inv)
+        return sim._get_set_sim_scores(l_indptr, l_indices, l_csr[2][l_inv],
+                                       r_indptr, r_indices, r_csr[2][r_inv],
+                                       measure_name)
+    if spec['left_tok_fn'] is not None:
+        l_vals = _get_tokens(tok_cache, 'ltable', l_df,
+                             spec['left_attribute'], spec['left_tok_fn'],
+                             l_uniq_pos).take(l_inv)
+        r_vals = _get_tokens(tok_cache, 'rtable', r_df,
+                             spec['right_attribute'], spec['right_tok_fn'],
+                             r_uniq_pos).take(r_inv)
+    else:
+        l_uniq_vals = take_values(l_df, spec['left_attribute'], l_uniq_pos)
+        r_uniq_vals = take_values(r_df, spec['right_attribute'], r_uniq_pos)
+        if _is_numeric_array(l_uniq_vals) and \
+                _is_numeric_array(r_uniq_vals):
+            return _compute_numeric_feat_batch(spec['simfunction'],
+                                               l_uniq_vals, l_inv,
+                                               r_uniq_vals, r_inv)
+        l_vals = l_uniq_vals.take(l_inv)
+        r_vals = r_uniq_vals.take(r_inv)
+    return list(map(spec['simfunction'], l_vals, r_vals))
+
+
+def _is_numeric_array(vals):
+    return isinstance(vals, np.ndarray) and vals.dtype.kind in 'biuf'
+
+
+def _compute_numeric_feat_batch(sim_fn, l_uniq_vals, l_inv, r_uniq_vals,
+                                r_inv):
+    """
+    Compute a feature over two numeric attributes. The numeric measures are
+    evaluated over the whole aligned value arrays, and the other measures
+    (e.g. lev_sim) once per distinct (left value, right value) combination.
+    """
+    numeric_fn = sim._numeric_sim_batch_fns.get(sim_fn)
+    if numeric_fn is not None:
+        vals = numeric_fn(l_uniq_vals.take(l_inv), r_uniq_vals.take(r_inv))
+        if vals is not None:
+            return vals
+
+    # The missing values of numeric arrays are the NaNs, so NaN stands for
+    # all of them.
+    l_codes, l_keys = pd.factorize(l_uniq_vals)
+    r_codes, r_keys = pd.factorize(r_uniq_vals)
+    l_keys = np.append(l_keys.astype(object), np.NaN)
+    r_keys = np.append(r_keys.astype(object), np.NaN)
+    l_codes = np.where(l_codes < 0, len(l_keys) - 1, l_codes)[l_inv]
+    r_codes = np.where(r_codes < 0, len(r_keys) - 1, r_codes)[r_inv]
+    uniq_codes, pair_inv = np.unique(
+        l_codes.astype(np.int64) * len(r_keys) + r_codes,
+        return_inverse=True)
+    uniq_vals = np.empty(len(uniq_codes), dtype=object)
+    for i, code in enumerate(uniq_codes):
+        uniq_vals[i] = sim_fn(l_keys[code // len(r_keys)],
+                              r_keys[code % len(r_keys)])
+    return uniq_vals[pair_inv].tolist()
+
+
+def _get_tokens(tok_cache, table_name, df, attr, tok_fn, uniq_pos):
+    """
+    Get the tokens of an attribute for the given tuple positions, tokenizing
+    the values only the first time they are requested.
+    """
+    # The tokens are cached by tokenizer function, as the same tokenizer name
+    # may refer to different functions in different features.
+    cache_key = (table_name, attr, tok_fn)
+    if cache_key not in tok_cache:
+        vals = take_values(df, attr, uniq_pos)
+        # The tokenizers of py_entitymatching return the missing values as
+        # they are, so they are only applied to the other values.
+        nulls = None
+        if tok._preserves_nulls(tok_fn):
+            nulls = _get_null_mask(tok_cache, table_name, df, attr, uniq_pos)
+        # Fill the object array element-wise, so that numpy does not try to
+        # broadcast the token lists.
+        tokens = np.empty(len(vals), dtype=object)
+        for i, val in enumerate(vals):
+            if nulls is not None and nulls[i]:
+                tokens[i] = val
+            else:
+                tokens[i] = tok_fn(val)
+        tok_cache[cache_key] = tokens
+    return tok_cache[cache_key]
+
+
+def _apply_feat_batch_memoized(spec, memo, tok_cache, l_df, r_df, l_uniq_pos,
+                               l_inv, r_uniq_pos, r_inv, feat_profile=None):
+    """
+    Compute an auto-generated feature over the whole candset split, once per
+    distinct (left value, right value) combination that is not in the memo.
+    """
+    try:
+        l_codes, l_keys = _factorize_values(
+            take_values(l_df, spec['left_attribute'], l_uniq_pos))
+        r_codes, r_keys = _factorize_values(
+            take_values(r_df, spec['right_attribute'], r_uniq_pos))
+    except TypeError:
+        # The values cannot be hashed, so they cannot be memoized.
+        return _apply_feat_batch(spec, tok_cache, l_df, r_df, l_uniq_pos,
+                                 l_inv, r_uniq_pos, r_inv, feat_profile)
+
+    # Number the distinct value combinations of the pairs, and find a pair
+    # with each combination.
+    n_r_keys = len(r_keys)
+    pair_codes = l_codes[l_inv] * n_r_keys + r_codes[r_inv]
+    uniq_codes, first_pairs, pair_inv = np.unique(
+        pair_codes, return_index=True, return_inverse=True)
+
+    feature_name = spec['feature_name']
+    memo_keys = [(feature_name, l_keys[code // n_r_keys],
+                  r_keys[code % n_r_keys]) for code in uniq_codes]
+    uniq_vals = np.empty(len(uniq_codes), dtype=object)
+    missing = []
+    for i, memo_key in enumerate(memo_keys):
+        found, val = memo.get(memo_key)
+        if found:
+            uniq_vals[i] = val
+        else:
+            missing.append(i)
+
+    if len(missing) > 0:
+        missing_pairs = first_pairs[missing]
+        vals = _apply_feat_batch(spec, tok_cache, l_df, r_df, l_uniq_pos,
+                                 l_inv[missing_pairs], r_uniq_pos,
+                                 r_inv[missing_pairs], feat_profile)
+        for i, val in zip(missing, vals):
+            uniq_vals[i] = val
+            memo.put(memo_keys[i], val)
+
+    # Scatter the values back to all the pairs
+    return uniq_vals[pair_inv].tolist()
+
+
+def _factorize_values(vals):
+    """
+    Number the distinct values of an attribute. Returns the codes of the
+    values and the distinct values (with None standing for the missing
+    values), raising a TypeError if the values cannot be hashed.
+    """
+    codes, uniques = pd.factorize(vals)
+    codes = codes.astype(np.int64)
+    codes[codes < 0] = len(uniques)
+    return codes, list(uniques) + [None]
+
+
+class _FeatureValueMemo(object):
+    """
+    A memo of feature values keyed by (feature name, left value, right
+    value), that forgets the least recently used values once it holds
+    max_size values.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._values = OrderedDict()
+
+    def get(self, key):
+        """
+        Get a (found, value) tuple for the key.
+        """
+        if key not in self._values:
+            return False, None
+        # Move the key to the end, as the most recently used one
+        val = self._values.pop(key)
+        self._values[key] = val
+        return True, val
+
+    def put(self, key, val):
+        self._values[key] = val
+        if len(self._values) > self.max_size:
+            self._values.popitem(last=False)
+
+
+# The memos of the feature extractions that ran in this process (by memo
+# id). A worker process may be reused by later extractions, so only the
+# memos of the most recent extractions are kept.
+_feature_memos = OrderedDict()
+_MAX_FEATURE_MEMOS = 2
+
+
+def _get_feature_memo(memo_spec):
+    if memo_spec is None:
+        return None
+    memo_id, memo_size = memo_spec
+    if memo_id not in _feature_memos:
+        _feature_memos[memo_id] = _FeatureValueMemo(memo_size)
+        while len(_feature_memos) > _MAX_FEATURE_MEMOS:
+            _feature_memos.popitem(last=False)
+    return _feature_memos[memo_id]
+
+
+def _get_token_id_csrs(tok_cache, spec, l_df, r_df, l_uniq_pos, r_uniq_pos):
+    """
+    Get the tokens of the left and right attributes of a feature, for the
+    given tuple positions, as token ids (interned over both the attributes)
+    in CSR layout. Returns an (indptr, indices, nulls) tuple per attribute.
+    """
+    cache_key = ('token_ids', spec['left_attribute'], spec['left_tok_fn'],
+                 spec['right_attribute'], spec['right_tok_fn'])
+    if cache_key not in tok_cache and 'tokenized_tables' in tok_cache:
+        token_id_csrs = _get_tokenized_token_id_csrs(
+            tok_cache['tokenized_tables'], spec, l_df, r_df, l_uniq_pos,
+            r_uniq_pos)
+        if token_id_csrs is not None:
+            tok_cache[cache_key] = token_id_csrs
+    if cache_key not in tok_cache:
+        l_tokens = _get_tokens(tok_cache, 'ltable', l_df,
+                               spec['left_attribute'], spec['left_tok_fn'],
+                               l_uniq_pos)
+        r_tokens = _get_tokens(tok_cache, 'rtable', r_df,
+                               spec['right_attribute'], spec['right_tok_fn'],
+                               r_uniq_pos)
+        token_ids = {}
+        tok_cache[cache_key] = (intern_tokens(l_tokens, token_ids),
+                                intern_tokens(r_tokens, token_ids))
+    return tok_cache[cache_key]
+
+
+def _match_tokenized_tables(tokenized_tables, feature_table):
+    """
+    Get copies of the tokenized tables keeping only the tokens of the
+    (attribute, tokenizer name) combinations that all the features using them
+    tokenize with the same tokenizer functions, as the same tokenizer name
+    may refer to different functions.
+    """
+    if tokenized_tables is None:
+        return None
+    matches = [{}, {}]
+    for _, feature in feature_table.iterrows():
+        spec = _get_batch_spec(feature)
+        if spec is None or spec['left_tok_fn'] is None:
+            continue
+        for tokenized, match, side in zip(tokenized_tables, matches,
+                                          ['left', 'right']):
+            attr = spec[side + '_attribute']
+            tok_name = spec[side + '_attr_tokenizer']
+            if tokenized.has_tokens(attr, tok_name):
+                match[(attr, tok_name)] = match.get((attr, tok_name), True) \
+                    and tokenized.is_tokenized_with(attr, tok_name,
+                                                    spec[side + '_tok_fn'])
+    return tuple(tokenized._select_tokens(
+        [csr_key for csr_key, is_match in six.iteritems(match) if is_match])
+        for tokenized, match in zip(tokenized_tables, matches))
+
+
+def _get_tokenized_token_id_csrs(tokenized_tables, spec, l_df, r_df,
+                                 l_uniq_pos, r_uniq_pos):
+    """
+    Get the token ids of the left and right attributes of a feature from the
+    tokenized tables, or None if they are not tokenized with the feature's
+    tokenizers.
+    """
+    l_tokenized, r_tokenized = tokenized_tables
+    if not l_tokenized.has_tokens(spec['left_attribute'],
+                                  spec['left_attr_tokenizer']) or \
+            not r_tokenized.has_tokens(spec['right_attribute'],
+                                       spec['right_attr_tokenizer']):
+        return None
+    l_rows = l_tokenized.get_positions(l_df.index[l_uniq_pos])
+    r_rows = r_tokenized.get_positions(r_df.index[r_uniq_pos])
+    if (l_rows < 0).any() or (r_rows < 0).any():
+        return None
+    return (l_tokenized.get_token_ids(spec['left_attribute'],
+                                      spec['left_attr_tokenizer'], l_rows),
+            r_tokenized.get_token_ids(spec['right_attribute'],
+                                      spec['right_attr_tokenizer'], r_rows))
 
 
 def get_feature_vals_by_cand_split(pickled_obj, fk_ltable_idx, fk_rtable_idx, l_df, r_df, candsplit, show_progress):
     feature_table = cloudpickle.loads(pickled_obj)
+    prog_bar = None
     if show_progress:
         prog_bar = pyprind.ProgBar(len(candsplit))
+    return _get_feature_vals_by_pairs(feature_table, fk_ltable_idx,
+                                      fk_rtable_idx, l_df, r_df, candsplit,
+                                      prog_bar)
 
-    l_dict = {}
-    r_dict = {}
 
-    feat_vals = []
-    for row in candsplit.itertuples(index=False):
-        if show_progress:
-            prog_bar.update()
+def _get_feature_vals_by_pairs(feature_table, fk_ltable_idx, fk_rtable_idx,
+                               l_df, r_df, candsplit, prog_bar):
+    feat_names = list(feature_table['feature_name'])
+    feat_rows = _get_feature_rows_by_pairs(feature_table, fk_ltable_idx,
+                                           fk_rtable_idx, l_df, r_df,
+                                           candsplit, prog_bar)
+    return [dict(zip(feat_names, row)) for row in feat_rows]
 
-        fk_ltable_val = row[fk_ltable_idx]
-        fk_rtable_val = row[fk_rtable_idx]
 
-        if fk_ltable_val not in l_dict:
-            l_dict[fk_ltable_val] = l_df.loc[fk_ltable_val]
-        l_tuple = l_dict[fk_ltable_val]
+def _get_feature_rows_by_pairs(feature_table, fk_ltable_idx, fk_rtable_idx,
+                               l_df, r_df, candsplit, prog_bar,
+                               feat_profile=None):
+    """
+    Apply the feature functions to each pair of the candset split, returning
+    a list of feature values (in the feature table order) per pair.
+    """
+    feat_names = list(feature_table['feature_name'])
+    feat_funcs = list(feature_table['function'])
+    # Only the recently used tuples are kept; when the pairs are grouped by
+    # ltable tuple, the current left tuple always stays in the lookup.
+    l_dict = gh.TupleLookup(functools.partial(get_row, l_df))
+    r_dict = gh.TupleLookup(functools.partial(get_row, r_df))
+
+    feat_rows = []
+    for row in candsplit.itertuples(index=False):
+        if prog_bar is not None:
+            prog_bar.update()
 
-        if fk_rtable_val not in r_dict:
-            r_dict[fk_rtable_val] = r_df.loc[fk_rtable_val]
-        r_tuple = r_dict[fk_rtable_val]
+        l_tuple = l_dict[row[fk_ltable_idx]]
+        r_tuple = r_dict[row[fk_rtable_idx]]
 
-        f = apply_feat_fns(l_tuple, r_tuple, feature_table)
-        feat_vals.append(f)
+        if feat_profile is None:
+            feat_rows.append([f(l_tuple, r_tuple) for f in feat_funcs])
+        else:
+            feat_rows.append(_apply_feat_fns_timed(l_tuple, r_tuple,
+                                                   feat_names, feat_funcs,
+                                                   feat_profile))
 
-    return feat_vals
+    return feat_rows
 
 
-def apply_feat_fns(tuple1, tuple2, feat_dict):
+def apply_feat_fns(tuple1, tuple2, feat_dict, feat_profile=None):
     """
-    Apply feature functions to two tuples.
+    Apply feature functions to two tuples. If a feature profile dictionary
+    is given, the time taken by each feature function is added to it.
     """
     # Get the feature names
     feat_names = list(feat_dict['feature_name'])
@@ -314,12 +1764,87 @@ def apply_feat_fns(tuple1, tuple2, feat_dict):
     feat_funcs = list(feat_dict['function'])
     # Compute the feature value by applying the feature function to the input
     #  tuples.
-    feat_vals = [f(tuple1, tuple2) for f in feat_funcs]
+    if feat_profile is None:
+        feat_vals = [f(tuple1, tuple2) for f in feat_funcs]
+    else:
+        feat_vals = _apply_feat_fns_timed(tuple1, tuple2, feat_names,
+                                          feat_funcs, feat_profile)
+        for name, val in zip(feat_names, feat_vals):
+            _update_feat_profile(feat_profile, name,
+                                 nan_count=int(pd.isnull(val)))
     # Return a dictionary where the keys are the feature names and the values
     #  are the feature values.
     return dict(zip(feat_names, feat_vals))
 
 
+def _apply_feat_fns_timed(tuple1, tuple2, feat_names, feat_funcs,
+                          feat_profile):
+    """
+    Apply feature functions to two tuples, adding the time taken by each
+    function to the feature profile.
+    """
+    feat_vals = []
+    for name, f in zip(feat_names, feat_funcs):
+        start_time = timeit.default_timer()
+        feat_vals.append(f(tuple1, tuple2))
+        _update_feat_profile(feat_profile, name,
+                             time=timeit.default_timer() - start_time,
+                             n_calls=1)
+    return feat_vals
+
+
+def _update_feat_profile(feat_profile, feature_name, time=0.0, n_calls=0,
+                         nan_count=0, null_count=0):
+    """
+    Add to the cost of a feature in a feature profile dictionary, that maps
+    each feature name to a [time, number of calls, NaN count, number of
+    pairs with a missing value] list.
+    """
+    if feature_name not in feat_profile:
+        feat_profile[feature_name] = [0.0, 0, 0, 0]
+    cost = feat_profile[feature_name]
+    cost[0] += time
+    cost[1] += n_calls
+    cost[2] += nan_count
+    cost[3] += null_count
+
+
+def _merge_feat_profiles(feat_profile, other_feat_profile):
+    for feature_name, cost in six.iteritems(other_feat_profile):
+        _update_feat_profile(feat_profile, feature_name, *cost)
+
+
+def _get_nan_count(vals):
+    return int(np.sum(pd.isnull(np.asarray(vals, dtype=object))))
+
+
+def _get_feature_profile_table(feature_table, feat_profile):
+    """
+    Convert a feature profile dictionary into a DataFrame aligned with the
+    feature table.
+    """
+    costs = [feat_profile.get(name, [0.0, 0, 0, 0])
+             for name in feature_table['feature_name']]
+    profile_table = pd.DataFrame(
+        costs, index=feature_table.index,
+        columns=['time', 'n_calls', 'nan_count', 'null_count'])
+    profile_table.insert(0, 'feature_name',
+                         feature_table['feature_name'].values)
+    # The pairs with a missing value are only known for the features that
+    # are NaN for all of them.
+    null_counted = [_get_batch_spec(feature) is not None and
+                    _propagates_nulls(_get_batch_spec(feature))
+                    for _, feature in feature_table.iterrows()]
+    profile_table['null_count'] = profile_table['null_count'].where(
+        null_counted)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        profile_table['time_per_call'] = \
+            profile_table['time'] / profile_table['n_calls']
+        profile_table['null_rate'] = \
+            profile_table['null_count'] / profile_table['n_calls']
+    return profile_table
+
+
 def get_num_procs(n_jobs, min_procs):
     # determine number of processes to launch parallely
     n_cpus = multiprocessing.cpu_count()
@@ -0,0 +1,154 @@
+# coding=utf-8
+"""
+This module contains the function object of the features that apply a
+similarity function to a pair of attributes.
+"""
+import logging
+
+import numpy as np
+
+import py_entitymatching.feature.simfunctions as sim
+from py_entitymatching.feature.tokenizedtable import intern_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class FeatureFunction(object):
+    """
+    A feature that applies a similarity function to the values of an
+    attribute pair, tokenizing the values first if tokenizers are given.
+
+    The automatically generated features (and the declarative features that
+    only apply a similarity function to two, possibly tokenized, attributes)
+    use this object as their function. Unlike a function compiled from the
+    feature source, it only holds the attribute names and references to the
+    similarity function and the tokenizers, so the feature tables pickle
+    quickly and take little space when sent to worker processes.
+
+    Args:
+        left_attribute (string): The attribute of the left tuple.
+        right_attribute (string): The attribute of the right tuple.
+        simfunction (string): The name of the similarity function.
+        sim_fn (function): The similarity function.
+        left_attr_tokenizer (string): The name of the tokenizer of the left
+            attribute (defaults to None).
+        left_tok_fn (function): The tokenizer of the left attribute
+            (defaults to None).
+        right_attr_tokenizer (string): The name of the tokenizer of the
+            right attribute (defaults to None).
+        right_tok_fn (function): The tokenizer of the right attribute
+            (defaults to None).
+
+    Examples:
+        >>> import py_entitymatching as em
+        >>> match_t = em.get_tokenizers_for_matching()
+        >>> f = em.FeatureFunction('name', 'name', 'jaccard', em.jaccard, 'qgm_3', match_t['qgm_3'], 'qgm_3', match_t['qgm_3'])
+        >>> f(A.loc[0], B.loc[0])
+        >>> f.batch(A['name'], B['name'])
+    """
+
+    def __init__(self, left_attribute, right_attribute, simfunction, sim_fn,
+                 left_attr_tokenizer=None, left_tok_fn=None,
+                 right_attr_tokenizer=None, right_tok_fn=None):
+        if (left_tok_fn is None) != (right_tok_fn is None):
+            logger.error('Both or none of the attributes should be tokenized')
+            raise AssertionError('Both or none of the attributes should be '
+                                 'tokenized')
+        self.left_attribute = left_attribute
+        self.right_attribute = right_attribute
+        self.simfunction = simfunction
+        self.sim_fn = sim_fn
+        self.left_attr_tokenizer = left_attr_tokenizer
+        self.left_tok_fn = left_tok_fn
+        self.right_attr_tokenizer = right_attr_tokenizer
+        self.right_tok_fn = right_tok_fn
+
+    def __call__(self, ltuple, rtuple):
+        l_val = ltuple[self.left_attribute]
+        r_val = rtuple[self.right_attribute]
+        if self.left_tok_fn is None:
+            return self.sim_fn(l_val, r_val)
+        return self.sim_fn(self.left_tok_fn(l_val), self.right_tok_fn(r_val))
+
+    def __repr__(self):
+        if self.left_tok_fn is None:
+            return '%s(ltuple["%s"], rtuple["%s"])' % (
+                self.simfunction, self.left_attribute, self.right_attribute)
+        return '%s(%s(ltuple["%s"]), %s(rtuple["%s"]))' % (
+            self.simfunction, self.left_attr_tokenizer, self.left_attribute,
+            self.right_attr_tokenizer, self.right_attribute)
+
+    def batch(self, l_values, r_values):
+        """
+        Compute the feature for each pair of the aligned left and right
+        attribute values, returning a NumPy array of the feature values.
+
+        The set-based similarity functions (and the numeric ones, over
+        numeric values) are computed for all the pairs at once; the other
+        similarity functions are applied pair by pair.
+        """
+        if len(l_values) != len(r_values):
+            logger.error('The input sequences are not of the same length')
+            raise AssertionError('The input sequences are not of the same '
+                                 'length')
+        if self.left_tok_fn is not None:
+            l_tokens = [self.left_tok_fn(val) for val in l_values]
+            r_tokens = [self.right_tok_fn(val) for val in r_values]
+            measure_name = sim._set_sim_measure_names.get(self.sim_fn)
+            if measure_name is not None:
+                token_ids = {}
+                l_indptr, l_indices, l_nulls = intern_tokens(l_tokens,
+                                                             token_ids)
+                r_indptr, r_indices, r_nulls = intern_tokens(r_tokens,
+                                                             token_ids)
+                return sim._get_set_sim_scores(l_indptr, l_indices, l_nulls,
+                                               r_indptr, r_indices, r_nulls,
+                                               measure_name)
+            return _to_float_array(map(self.sim_fn, l_tokens, r_tokens))
+
+        l_values = np.asarray(l_values)
+        r_values = np.asarray(r_values)
+        numeric_fn = sim._numeric_sim_batch_fns.get(self.sim_fn)
+        if numeric_fn is not None and l_values.dtype.kind in 'biuf' and \
+                r_values.dtype.kind in 'biuf':
+            vals = numeric_fn(l_values, r_values)
+            if vals is not None:
+                return vals.astype(np.float64)
+        return _to_float_array(map(self.sim_fn, l_values, r_values))
+
+    def get_batch_spec(self):
+        """
+        Get the attributes, tokenizers and similarity function of the
+        feature, in the form used to compute the feature column-wise.
+        """
+        return {'left_attribute': self.left_attribute,
+                'right_attribute': self.right_attribute,
+                'left_attr_tokenizer': self.left_attr_tokenizer,
+                'right_attr_tokenizer': self.right_attr_tokenizer,
+                'left_tok_fn': self.left_tok_fn,
+                'right_tok_fn': self.right_tok_fn,
+                'simfunction': self.sim_fn}
+
+
+def get_feature_function(left_attribute, right_attribute, simfunction,
+                         left_attr_tokenizer, right_attr_tokenizer,
+                         tokenizers, similarity_functions):
+    """
+    Create the function object of a feature, given the names of its
+    similarity function and tokenizers (None for the attributes that are not
+    tokenized) and the dictionaries the names refer to.
+    """
+    left_tok_fn, right_tok_fn = None, None
+    if left_attr_tokenizer is not None:
+        left_tok_fn = tokenizers[left_attr_tokenizer]
+        right_tok_fn = tokenizers[right_attr_tokenizer]
+    return FeatureFunction(left_attribute, right_attribute, simfunction,
+                           similarity_functions[simfunction],
+                           left_attr_tokenizer, left_tok_fn,
+                           right_attr_tokenizer, right_tok_fn)
+
+
+def _to_float_array(vals):
+    # The similarity functions return None or NaN for missing values.
+    return np.array([np.NaN if val is None else val for val in vals],
+                    dtype=np.float64)
@@ -2,6 +2,7 @@
 """
 This module contains similarity functions supported by py_entitymatching
 """
+import logging
 
 import pandas as pd
 import numpy as np
@@ -10,6 +11,8 @@ import six
 import py_stringmatching as sm
 import py_entitymatching.utils.generic_helper as gh
 
+logger = logging.getLogger(__name__)
+
 # These are the sim. function names
 sim_function_names = ['affine',
                 'hamming_dist', 'hamming_sim',
@@ -39,6 +42,13 @@ abbreviations = ['aff',
 _global_sim_fns = pd.DataFrame({'function_name': sim_function_names,
                                 'short_name': abbreviations})
 
+# The set-based measures do not keep any state, so the measure objects are
+# created once and shared by all the calls.
+_jaccard_measure = sm.Jaccard()
+_cosine_measure = sm.Cosine()
+_overlap_coeff_measure = sm.OverlapCoefficient()
+_dice_measure = sm.Dice()
+
 
 def get_sim_funs_for_blocking():
     """
@@ -478,8 +488,7 @@ def jaccard(arr1, arr2):
         arr2 = [arr2]
     if any(pd.isnull(arr2)):
         return np.NaN
-    # Create jaccard measure object
-    measure = sm.Jaccard()
+    measure = _jaccard_measure
     # Call a function to compute a similarity score
     return measure.get_raw_score(arr1, arr2)
 
@@ -516,8 +525,7 @@ def cosine(arr1, arr2):
         arr2 = [arr2]
     if any(pd.isnull(arr2)):
         return np.NaN
-    # Create cosine measure object
-    measure = sm.Cosine()
+    measure = _cosine_measure
     # Call the function to compute the cosine measure.
     return measure.get_raw_score(arr1, arr2)
 
@@ -554,8 +562,7 @@ def overlap_coeff(arr1, arr2):
         arr2 = [arr2]
     if any(pd.isnull(arr2)):
         return np.NaN
-    # Create overlap coefficient measure object
-    measure = sm.OverlapCoefficient()
+    measure = _overlap_coeff_measure
     # Call the function to return the overlap coefficient
     return measure.get_raw_score(arr1, arr2)
 
@@ -592,11 +599,259 @@ def dice(arr1, arr2):
     if any(pd.isnull(arr2)):
         return np.NaN
 
-    # Create Dice object
-    measure = sm.Dice()
+    measure = _dice_measure
     # Call the function to return the dice score
     return measure.get_raw_score(arr1, arr2)
 
+# Batch versions of the set-based measures
+def jaccard_batch(token_ids1, token_ids2):
+    """
+    This function computes the Jaccard measure between each pair of token
+    sets of the two input sequences.
+
+    The tokens are given as integer ids (e.g., obtained by interning the
+    string tokens), and the scores of all the pairs are computed at once
+    using NumPy instead of one function call per pair.
+
+    Args:
+        token_ids1,token_ids2 (list): The input sequences (of the same
+            length) of token id lists or arrays. A missing value (None or
+            NaN) in place of a token id list denotes missing tokens.
+
+    Returns:
+        A NumPy array with the Jaccard measure of each pair. Like in
+        :meth:`~py_entitymatching.jaccard`, the measure is NaN if one of the
+        token id lists of the pair is missing.
+
+    Raises:
+        AssertionError: If the input sequences are not of the same length.
+        AssertionError: If the token ids are not non-negative integers.
+
+    Examples:
+        >>> import py_entitymatching as em
+        >>> em.jaccard_batch([[0, 1], [0, 1], None], [[0], [2, 3], [0]])
+        array([0.5, 0. , nan])
+    """
+    return _get_set_sim_batch(token_ids1, token_ids2, 'jaccard')
+
+
+def cosine_batch(token_ids1, token_ids2):
+    """
+    This function computes the cosine measure between each pair of token
+    sets of the two input sequences.
+
+    The tokens are given as integer ids (e.g., obtained by interning the
+    string tokens), and the scores of all the pairs are computed at once
+    using NumPy instead of one function call per pair.
+
+    Args:
+        token_ids1,token_ids2 (list): The input sequences (of the same
+            length) of token id lists or arrays. A missing value (None or
+            NaN) in place of a token id list denotes missing tokens.
+
+    Returns:
+        A NumPy array with the cosine measure of each pair. Like in
+        :meth:`~py_entitymatching.cosine`, the measure is NaN if one of the
+        token id lists of the pair is missing.
+
+    Raises:
+        AssertionError: If the input sequences are not of the same length.
+        AssertionError: If the token ids are not non-negative integers.
+
+    Examples:
+        >>> import py_entitymatching as em
+        >>> em.cosine_batch([[0, 1], None], [[0], [0]])
+        array([0.70710678,        nan])
+    """
+    return _get_set_sim_batch(token_ids1, token_ids2, 'cosine')
+
+
+def overlap_coeff_batch(token_ids1, token_ids2):
+    """
+    This function computes the overlap coefficient between each pair of
+    token sets of the two input sequences.
+
+    The tokens are given as integer ids (e.g., obtained by interning the
+    string tokens), and the scores of all the pairs are computed at once
+    using NumPy instead of one function call per pair.
+
+    Args:
+        token_ids1,token_ids2 (list): The input sequences (of the same
+            length) of token id lists or arrays. A missing value (None or
+            NaN) in place of a token id list denotes missing tokens.
+
+    Returns:
+        A NumPy array with the overlap coefficient of each pair. Like in
+        :meth:`~py_entitymatching.overlap_coeff`, the coefficient is NaN if
+        one of the token id lists of the pair is missing.
+
+    Raises:
+        AssertionError: If the input sequences are not of the same length.
+        AssertionError: If the token ids are not non-negative integers.
+
+    Examples:
+        >>> import py_entitymatching as em
+        >>> em.overlap_coeff_batch([[0, 1], None], [[0], [0]])
+        array([ 1., nan])
+    """
+    return _get_set_sim_batch(token_ids1, token_ids2, 'overlap_coeff')
+
+
+def dice_batch(token_ids1, token_ids2):
+    """
+    This function computes the Dice score between each pair of token sets
+    of the two input sequences.
+
+    The tokens are given as integer ids (e.g., obtained by interning the
+    string tokens), and the scores of all the pairs are computed at once
+    using NumPy instead of one function call per pair.
+
+    Args:
+        token_ids1,token_ids2 (list): The input sequences (of the same
+            length) of token id lists or arrays. A missing value (None or
+            NaN) in place of a token id list denotes missing tokens.
+
+    Returns:
+        A NumPy array with the Dice score of each pair. Like in
+        :meth:`~py_entitymatching.dice`, the score is NaN if one of the
+        token id lists of the pair is missing.
+
+    Raises:
+        AssertionError: If the input sequences are not of the same length.
+        AssertionError: If the token ids are not non-negative integers.
+
+    Examples:
+        >>> import py_entitymatching as em
+        >>> em.dice_batch([[0, 1], None], [[0], [0]])
+        array([0.66666667,        nan])
+    """
+    return _get_set_sim_batch(token_ids1, token_ids2, 'dice')
+
+
+def _get_set_sim_batch(token_ids1, token_ids2, measure_name):
+    if len(token_ids1) != len(token_ids2):
+        logger.error('The input sequences are not of the same length')
+        raise AssertionError('The input sequences are not of the same length')
+    indptr1, indices1, nulls1 = _get_token_id_csr(token_ids1)
+    indptr2, indices2, nulls2 = _get_token_id_csr(token_ids2)
+    return _get_set_sim_scores(indptr1, indices1, nulls1,
+                               indptr2, indices2, nulls2, measure_name)
+
+
+def _get_token_id_csr(token_ids):
+    """
+    Convert a sequence of token id lists into a CSR layout, that is the
+    concatenated token ids (indices) along with the row boundaries (indptr),
+    and a mask of the missing rows.
+    """
+    nulls = np.zeros(len(token_ids), dtype=bool)
+    rows = []
+    for i, ids in enumerate(token_ids):
+        if ids is None or (np.isscalar(ids) and pd.isnull(ids)):
+            nulls[i] = True
+            continue
+        ids = np.asarray(ids).ravel()
+        if ids.dtype.kind == 'f' and np.isnan(ids).any():
+            nulls[i] = True
+            continue
+        if len(ids) > 0 and ids.dtype.kind not in 'iu':
+            if not np.all(np.mod(ids, 1) == 0):
+                logger.error('The token ids should be integers')
+                raise AssertionError('The token ids should be integers')
+        rows.append((i, ids.astype(np.int64)))
+    lengths = np.zeros(len(token_ids), dtype=np.int64)
+    for i, ids in rows:
+        lengths[i] = len(ids)
+    indptr = np.zeros(len(token_ids) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    if len(rows) > 0:
+        indices = np.concatenate([ids for _, ids in rows])
+    else:
+        indices = np.zeros(0, dtype=np.int64)
+    if len(indices) > 0 and indices.min() < 0:
+        logger.error('The token ids should be non-negative')
+        raise AssertionError('The token ids should be non-negative')
+    return indptr, indices, nulls
+
+
+def _take_csr_rows(indptr, indices, rows):
+    """
+    Get the CSR layout of the given rows (positions) of a CSR layout.
+    """
+    lengths = np.diff(indptr)[rows]
+    new_indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_indptr[1:])
+    offsets = np.repeat(indptr[:-1][rows] - new_indptr[:-1], lengths)
+    return new_indptr, indices[np.arange(new_indptr[-1]) + offsets]
+
+
+def _get_set_sizes_and_overlaps(indptr1, indices1, indptr2, indices2):
+    """
+    Get the number of distinct tokens of each row of two aligned CSR layouts
+    and the number of tokens that each pair of rows have in common.
+    """
+    n_rows = len(indptr1) - 1
+    row_ids1 = np.repeat(np.arange(n_rows, dtype=np.int64), np.diff(indptr1))
+    row_ids2 = np.repeat(np.arange(n_rows, dtype=np.int64), np.diff(indptr2))
+    n_tokens = 1
+    if len(indices1) > 0:
+        n_tokens = max(n_tokens, int(indices1.max()) + 1)
+    if len(indices2) > 0:
+        n_tokens = max(n_tokens, int(indices2.max()) + 1)
+    if n_rows * n_tokens >= np.iinfo(np.int64).max:
+        # Renumber the token ids so that the (row, token) keys fit in 64 bits
+        all_tokens, inv = np.unique(np.concatenate([indices1, indices2]),
+                                    return_inverse=True)
+        indices1, indices2 = inv[:len(indices1)], inv[len(indices1):]
+        n_tokens = max(len(all_tokens), 1)
+
+    # Identify each (row, token) pair by a single integer, so that the
+    # duplicate tokens of a row and the common tokens of a pair of rows are
+    # the equal neighbours in the sorted keys.
+    keys1 = np.unique(row_ids1 * n_tokens + indices1)
+    keys2 = np.unique(row_ids2 * n_tokens + indices2)
+    sizes1 = np.bincount(keys1 // n_tokens, minlength=n_rows)
+    sizes2 = np.bincount(keys2 // n_tokens, minlength=n_rows)
+    keys = np.concatenate([keys1, keys2])
+    keys.sort()
+    common_keys = keys[1:][keys[1:] == keys[:-1]]
+    overlaps = np.bincount(common_keys // n_tokens, minlength=n_rows)
+    return sizes1, sizes2, overlaps
+
+
+def _get_set_sim_scores(indptr1, indices1, nulls1, indptr2, indices2, nulls2,
+                        measure_name):
+    """
+    Compute a set-based measure between the aligned rows of two CSR layouts.
+    """
+    sizes1, sizes2, overlaps = _get_set_sizes_and_overlaps(
+        indptr1, indices1, indptr2, indices2)
+    sizes1 = sizes1.astype(np.float64)
+    sizes2 = sizes2.astype(np.float64)
+    overlaps = overlaps.astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if measure_name == 'jaccard':
+            scores = overlaps / (sizes1 + sizes2 - overlaps)
+        elif measure_name == 'cosine':
+            scores = overlaps / (np.sqrt(sizes1) * np.sqrt(sizes2))
+        elif measure_name == 'dice':
+            scores = 2.0 * overlaps / (sizes1 + sizes2)
+        else:
+            scores = overlaps / np.minimum(sizes1, sizes2)
+    # Follow the conventions of the scalar measures: a score of 0 if one of
+    # the sets is empty, and 1 if both the sets are the same (or empty).
+    scores[(sizes1 == 0) | (sizes2 == 0)] = 0.0
+    scores[(overlaps == sizes1) & (overlaps == sizes2)] = 1.0
+    scores[nulls1 | nulls2] = np.NaN
+    return scores
+
+
+# The set-based measures that have a batch version, used to compute the
+# auto-generated features over whole columns.
+_set_sim_measure_names = {jaccard: 'jaccard', cosine: 'cosine',
+                          overlap_coeff: 'overlap_coeff', dice: 'dice'}
+
+
 # Hybrid measure
 def monge_elkan(arr1, arr2):
     """
@@ -765,3 +1020,70 @@ def abs_norm(d1, d2):
         if x <= 10e-5:
             x = 0
         return 1.0 - x
+
+
+# Batch versions of the numeric measures, over aligned arrays of numbers
+def _exact_match_numeric_batch(vals1, vals2):
+    """
+    Compute exact_match between the aligned values of two numeric arrays.
+    """
+    nulls = _get_numeric_nulls(vals1) | _get_numeric_nulls(vals2)
+    scores = (vals1 == vals2).astype(np.int64)
+    if not nulls.any():
+        return scores
+    scores = scores.astype(np.float64)
+    scores[nulls] = np.NaN
+    return scores
+
+
+def _rel_diff_numeric_batch(vals1, vals2):
+    """
+    Compute rel_diff between the aligned values of two numeric arrays.
+    Returns None if some pair sums to zero without both numbers being zero,
+    which the scalar version does not handle.
+    """
+    vals1 = vals1.astype(np.float64)
+    vals2 = vals2.astype(np.float64)
+    sums = vals1 + vals2
+    both_zero = (vals1 == 0.0) & (vals2 == 0.0)
+    if np.any((sums == 0.0) & ~both_zero):
+        return None
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = (2 * np.abs(vals1 - vals2)) / sums
+    scores[both_zero] = 0.0
+    return scores
+
+
+def _abs_norm_numeric_batch(vals1, vals2):
+    """
+    Compute abs_norm between the aligned values of two numeric arrays.
+    """
+    vals1 = vals1.astype(np.float64)
+    vals2 = vals2.astype(np.float64)
+    both_zero = (vals1 == 0.0) & (vals2 == 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = np.abs(vals1 - vals2) / np.maximum(np.abs(vals1), np.abs(vals2))
+    x[x <= 10e-5] = 0.0
+    scores = 1.0 - x
+    # Like the scalar version, two zeros have a score of 0 (and not 1).
+    scores[both_zero] = 0.0
+    return scores
+
+
+def _get_numeric_nulls(vals):
+    if vals.dtype.kind == 'f':
+        return np.isnan(vals)
+    return np.zeros(len(vals), dtype=bool)
+
+
+# The measures that have a batch version over numeric arrays, used to compute
+# the auto-generated features of numeric attributes over whole columns.
+_numeric_sim_batch_fns = {exact_match: _exact_match_numeric_batch,
+                          rel_diff: _rel_diff_numeric_batch,
+                          abs_norm: _abs_norm_numeric_batch}
+
+
+# The similarity functions supported by py_entitymatching return NaN if one
+# of their inputs is missing, so the pairs with a missing value can be
+# skipped when computing the features over whole columns.
+_null_propagating_sim_fns = frozenset(get_sim_funs().values())
@@ -0,0 +1,286 @@
+# coding=utf-8
+"""
+This module contains a table whose attributes are tokenized once and stored
+as integer token ids.
+"""
+import copy
+import logging
+import uuid
+
+import numpy as np
+import pandas as pd
+import six
+
+import py_entitymatching.catalog.catalog_manager as cm
+import py_entitymatching.feature.simfunctions as sim
+from py_entitymatching.feature.tokenizers import get_tokenizers_for_matching, \
+    _is_same_tokenizer
+from py_entitymatching.utils.validation_helper import validate_object_type
+
+logger = logging.getLogger(__name__)
+
+
+class TokenizedTable(object):
+    """
+    The tokens of the attributes of a table, for one or more tokenizers,
+    stored as integer token ids.
+
+    Each distinct value of an attribute is tokenized only once, and each
+    distinct token is interned into an int32 id. The token ids of an
+    (attribute, tokenizer) combination are stored in CSR layout: the token
+    ids of all the tuples one after the other (indices), the positions where
+    the token ids of each tuple start (indptr), and a mask of the tuples
+    whose value is missing (nulls).
+
+    Tables tokenized with the same token dictionary (such as the ones
+    returned by :meth:`~py_entitymatching.tokenize_tables`) share the token
+    ids, so that their token sets can be compared as integers. The token
+    dictionary is not pickled along with the table, so sending a tokenized
+    table to another process only sends the integer arrays.
+
+    Args:
+        table (DataFrame): The input table. The key of the table must be
+            set in the catalog.
+        attrs (list): The attributes to tokenize (defaults to None, in which
+            case all the attributes of type object except the key are
+            tokenized).
+        tokenizers (dict): A Python dictionary with the tokenizer name as
+            the key and the tokenizer function as the value (defaults to
+            None, in which case the tokenizers returned by
+            :meth:`~py_entitymatching.get_tokenizers_for_matching` are used).
+        token_ids (dict): The token dictionary to intern the tokens into
+            (defaults to None, in which case a new dictionary is used).
+
+    Raises:
+        AssertionError: If `table` is not of type pandas DataFrame.
+        AssertionError: If `attrs` contains attributes that are not in the
+            table.
+        AssertionError: If `tokenizers` is not of type dict.
+        KeyError: If the key of the table is not set in the catalog.
+
+    Examples:
+        >>> A_tok = em.TokenizedTable(A, attrs=['name', 'address'])
+        >>> indptr, indices, nulls = A_tok.get_token_ids('name', 'qgm_3')
+    """
+
+    def __init__(self, table, attrs=None, tokenizers=None, token_ids=None):
+        validate_object_type(table, pd.DataFrame, error_prefix='Input table')
+        key = cm.get_key(table)
+        if attrs is None:
+            attrs = [attr for attr in table.columns
+                     if attr != key and table[attr].dtype == object]
+        missing_attrs = [attr for attr in attrs if attr not in table.columns]
+        if len(missing_attrs) > 0:
+            logger.error('Attributes %s are not in the input table'
+                         % missing_attrs)
+            raise AssertionError('Attributes %s are not in the input table'
+                                 % missing_attrs)
+        if tokenizers is None:
+            tokenizers = get_tokenizers_for_matching()
+        validate_object_type(tokenizers, dict,
+                             error_prefix='Input tokenizers')
+
+        if token_ids is None:
+            token_ids = {}
+        self.token_ids = token_ids
+        # Identifies the token dictionary, also in pickled copies
+        self.dictionary_id = uuid.uuid4().hex
+        self.index = pd.Index(table[key].values)
+        self.attrs = list(attrs)
+        self.tokenizer_names = list(tokenizers.keys())
+        self.tokenizers = dict(tokenizers)
+        self._csrs = {}
+        for attr in self.attrs:
+            for tok_name, tok_fn in six.iteritems(tokenizers):
+                self._csrs[(attr, tok_name)] = tokenize_column(
+                    table[attr].values, tok_fn, token_ids)
+
+    def __getstate__(self):
+        # The token dictionary is not needed to compare the token ids, and
+        # the tokenizer functions are only needed to match the tokens to the
+        # features before sending the table to other processes.
+        state = self.__dict__.copy()
+        state['token_ids'] = None
+        state['tokenizers'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def __len__(self):
+        return len(self.index)
+
+    def has_tokens(self, attr, tok_name):
+        """
+        Check whether the attribute is tokenized with the given tokenizer.
+        """
+        return (attr, tok_name) in self._csrs
+
+    def is_tokenized_with(self, attr, tok_name, tok_fn):
+        """
+        Check whether the attribute is tokenized with the given tokenizer
+        name, using a tokenizer function that tokenizes the values the same
+        way as tok_fn.
+        """
+        if not self.has_tokens(attr, tok_name) or self.tokenizers is None:
+            return False
+        return _is_same_tokenizer(self.tokenizers[tok_name], tok_fn)
+
+    def get_token_ids(self, attr, tok_name, positions=None):
+        """
+        Get the token ids of an attribute for a tokenizer, for all the tuples
+        or for the tuples at the given positions, as an (indptr, indices,
+        nulls) tuple.
+        """
+        if not self.has_tokens(attr, tok_name):
+            logger.error('Attribute %s is not tokenized with %s'
+                         % (attr, tok_name))
+            raise AssertionError('Attribute %s is not tokenized with %s'
+                                 % (attr, tok_name))
+        indptr, indices, nulls = self._csrs[(attr, tok_name)]
+        if positions is None:
+            return indptr, indices, nulls
+        positions = np.asarray(positions)
+        indptr, indices = sim._take_csr_rows(indptr, indices, positions)
+        return indptr, indices, nulls[positions]
+
+    def get_positions(self, keys):
+        """
+        Get the positions of the tuples with the given keys (-1 for the keys
+        that are not in the table).
+        """
+        return self.index.get_indexer(keys)
+
+    @property
+    def nbytes(self):
+        """
+        The number of bytes taken by the token ids.
+        """
+        return sum(indptr.nbytes + indices.nbytes + nulls.nbytes
+                   for indptr, indices, nulls in self._csrs.values())
+
+    def _select_tokens(self, csr_keys):
+        # get a copy of the table with only the tokens of the given
+        # (attribute, tokenizer name) combinations
+        selected = copy.copy(self)
+        selected._csrs = dict((csr_key, self._csrs[csr_key])
+                              for csr_key in csr_keys)
+        return selected
+
+    def _remap_token_ids(self, new_ids):
+        for csr_key, (indptr, indices, nulls) in six.iteritems(self._csrs):
+            self._csrs[csr_key] = (indptr, new_ids[indices], nulls)
+
+
+def tokenize_tables(ltable, rtable, l_attrs=None, r_attrs=None,
+                    tokenizers=None):
+    """
+    Tokenizes the attributes of two tables with a common token dictionary.
+
+    The token ids are ordered by the frequency of the tokens in both tables
+    (the least frequent tokens get the smallest ids), which is the global
+    token order used by :meth:`~py_entitymatching.debug_blocker` for prefix
+    filtering.
+
+    Args:
+        ltable (DataFrame): The left input table.
+        rtable (DataFrame): The right input table.
+        l_attrs (list): The attributes of the left table to tokenize
+            (defaults to None, in which case all the attributes of type
+            object except the key are tokenized).
+        r_attrs (list): The attributes of the right table to tokenize
+            (defaults to None, in which case all the attributes of type
+            object except the key are tokenized).
+        tokenizers (dict): A Python dictionary with the tokenizer name as
+            the key and the tokenizer function as the value (defaults to
+            None, in which case the tokenizers returned by
+            :meth:`~py_entitymatching.get_tokenizers_for_matching` are used).
+
+    Returns:
+        A tuple of two TokenizedTable objects, for the left and the right
+        table.
+
+    Raises:
+        AssertionError: If `ltable` or `rtable` is not of type pandas
+            DataFrame.
+        AssertionError: If `l_attrs` or `r_attrs` contains attributes that
+            are not in the table.
+        KeyError: If the key of a table is not set in the catalog.
+
+    Examples:
+        >>> A_tok, B_tok = em.tokenize_tables(A, B)
+        >>> H = em.extract_feature_vecs(C, feature_table=match_f, tokenized_tables=(A_tok, B_tok))
+
+    See Also:
+        :meth:`~py_entitymatching.TokenizedTable`
+    """
+    token_ids = {}
+    l_tokenized = TokenizedTable(ltable, l_attrs, tokenizers, token_ids)
+    r_tokenized = TokenizedTable(rtable, r_attrs, tokenizers, token_ids)
+    r_tokenized.dictionary_id = l_tokenized.dictionary_id
+
+    # Renumber the tokens by their frequency in both tables.
+    counts = np.zeros(len(token_ids), dtype=np.int64)
+    for tokenized in [l_tokenized, r_tokenized]:
+        for _, indices, _ in tokenized._csrs.values():
+            counts += np.bincount(indices, minlength=len(token_ids))
+    tokens = sorted(token_ids, key=token_ids.get)
+    token_order = get_token_order(dict(zip(tokens, counts)))
+    new_ids = np.empty(len(tokens), dtype=np.int32)
+    for new_id, token in enumerate(token_order):
+        new_ids[token_ids[token]] = new_id
+        token_ids[token] = new_id
+    for tokenized in [l_tokenized, r_tokenized]:
+        tokenized._remap_token_ids(new_ids)
+    return l_tokenized, r_tokenized
+
+
+def get_token_order(token_freqs):
+    """
+    Order the tokens by increasing frequency (and then by the token itself),
+    given a dictionary of the token frequencies.
+    """
+    return sorted(token_freqs, key=lambda token: (token_freqs[token], token))
+
+
+def tokenize_column(values, tok_fn, token_ids):
+    """
+    Tokenize the distinct values of a column and intern the tokens, returning
+    the token ids of all the values in CSR layout.
+    """
+    codes, uniques = pd.factorize(values)
+    uniq_tokens = [tok_fn(val) for val in uniques]
+    uniq_indptr, uniq_indices, uniq_nulls = intern_tokens(uniq_tokens,
+                                                          token_ids)
+    # The missing values have the code -1 (and no tokens).
+    nulls = codes < 0
+    rows = np.where(nulls, 0, codes)
+    if len(uniques) == 0:
+        return (np.zeros(len(values) + 1, dtype=np.int64),
+                np.zeros(0, dtype=np.int32), nulls)
+    lengths = np.where(nulls, 0, np.diff(uniq_indptr)[rows])
+    indptr = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    offsets = np.repeat(uniq_indptr[:-1][rows] - indptr[:-1], lengths)
+    indices = uniq_indices[np.arange(indptr[-1]) + offsets]
+    return indptr, indices, nulls | uniq_nulls[rows]
+
+
+def intern_tokens(tokens, token_ids):
+    """
+    Replace the tokens by int32 ids (adding the new tokens to the token_ids
+    dictionary), following the conventions of the scalar set-based measures
+    for missing values. Returns the ids in CSR layout.
+    """
+    id_lists = []
+    for toks in tokens:
+        if not isinstance(toks, list):
+            toks = [toks]
+        if any(not isinstance(t, six.string_types) and pd.isnull(t)
+               for t in toks):
+            id_lists.append(None)
+        else:
+            id_lists.append([token_ids.setdefault(t, len(token_ids))
+                             for t in toks])
+    indptr, indices, nulls = sim._get_token_id_csr(id_lists)
+    return indptr, indices.astype(np.int32), nulls
@@ -2,6 +2,8 @@
 """
 This module contains the tokenizer functions supported by py_entitymatching.
 """
+import copy
+import functools
 import logging
 
 import pandas as pd
@@ -148,22 +150,25 @@ def _make_tok_delim(d):
     """
     This function returns a delimiter-based tokenizer with a fixed delimiter
     """
-    def tok_delim(s):
-        # check if the input is of type base string
-        if pd.isnull(s):
-            return s
-        # Remove non ascii  characters. Note: This should be fixed in the
-        # next version.
-        #s = remove_non_ascii(s)
+    # Initialize the tokenizer measure object once, it is shared by all the
+    # calls to the returned tokenizer. Binding it with partial (instead of a
+    # closure) keeps the tokenizer picklable.
+    return functools.partial(_tok_delim_with_measure,
+                             sm.DelimiterTokenizer(delim_set=[d]))
 
-        s = gh.convert_to_str_unicode(s)
 
-        # Initialize the tokenizer measure object
-        measure = sm.DelimiterTokenizer(delim_set=[d])
-        # Call the function that will tokenize the input string.
-        return measure.tokenize(s)
+def _tok_delim_with_measure(measure, s):
+    # check if the input is of type base string
+    if pd.isnull(s):
+        return s
+    # Remove non ascii  characters. Note: This should be fixed in the
+    # next version.
+    #s = remove_non_ascii(s)
 
-    return tok_delim
+    s = gh.convert_to_str_unicode(s)
+
+    # Call the function that will tokenize the input string.
+    return measure.tokenize(s)
 
 
 # return a qgram-based tokenizer with a fixed q
@@ -171,17 +176,72 @@ def _make_tok_qgram(q):
     """
     This function returns a qgran-based tokenizer with a fixed delimiter
     """
+    # Initialize the tokenizer measure object once, it is shared by all the
+    # calls to the returned tokenizer.
+    return functools.partial(_tok_qgram_with_measure,
+                             sm.QgramTokenizer(qval=q))
+
+
+def _tok_qgram_with_measure(measure, s):
+    # check if the input is of type base string
+    if pd.isnull(s):
+        return s
+
+    s = gh.convert_to_str_unicode(s)
 
-    def tok_qgram(s):
-        # check if the input is of type base string
-        if pd.isnull(s):
-            return s
+    return measure.tokenize(s)
 
-        s = gh.convert_to_str_unicode(s)
 
-        measure = sm.QgramTokenizer(qval=q)
-        return measure.tokenize(s)
-    return tok_qgram
+def _preserves_nulls(tok_fn):
+    """
+    Check whether a tokenizer is one of the single argument tokenizers of
+    py_entitymatching, which return the missing values as they are.
+    """
+    if isinstance(tok_fn, functools.partial):
+        return tok_fn.func in (_tok_delim_with_measure, _tok_qgram_with_measure)
+    return tok_fn in (tok_wspace, tok_alphabetic, tok_alphanumeric)
+
+
+def _is_same_tokenizer(tok_fn1, tok_fn2):
+    """
+    Check whether two tokenizer functions tokenize the values the same way,
+    i.e., they are the same function, or they wrap equal py_stringmatching
+    measures (as the q-gram and delimiter tokenizers returned by
+    get_tokenizers_for_blocking and get_tokenizers_for_matching do).
+    """
+    if tok_fn1 is tok_fn2:
+        return True
+    if not isinstance(tok_fn1, functools.partial) or \
+            not isinstance(tok_fn2, functools.partial) or \
+            tok_fn1.func is not tok_fn2.func or \
+            tok_fn1.func not in (_tok_delim_with_measure,
+                                 _tok_qgram_with_measure):
+        return False
+    measure1, measure2 = tok_fn1.args[0], tok_fn2.args[0]
+    return type(measure1) is type(measure2) and \
+        vars(measure1) == vars(measure2)
+
+
+def _get_join_tokenizer(tok_fn):
+    """
+    Get a py_stringmatching tokenizer (returning sets of tokens) that
+    tokenizes the values the same way as one of the single argument
+    tokenizers of py_entitymatching, so that the string similarity joins can
+    be used for it. Returns None for the other tokenizers.
+    """
+    if isinstance(tok_fn, functools.partial) and \
+            tok_fn.func in (_tok_delim_with_measure, _tok_qgram_with_measure):
+        measure = copy.deepcopy(tok_fn.args[0])
+    elif tok_fn is tok_wspace:
+        measure = sm.WhitespaceTokenizer()
+    elif tok_fn is tok_alphabetic:
+        measure = sm.AlphabeticTokenizer()
+    elif tok_fn is tok_alphanumeric:
+        measure = sm.AlphanumericTokenizer()
+    else:
+        return None
+    measure.set_return_set(True)
+    return measure
 
 
 # q-gram tokenizer
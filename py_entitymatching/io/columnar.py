@@ -0,0 +1,275 @@
+# coding=utf-8
+"""This module defines functions to read and write columnar (Parquet and
+Feather) files"""
+import json
+import logging
+import os
+
+import six
+
+import py_entitymatching.catalog.catalog_manager as cm
+from py_entitymatching.io.parsers import _update_metadata_for_read_cmd, \
+    _check_metadata_for_read_cmd, _check_file_path
+from py_entitymatching.utils.validation_helper import validate_object_type
+
+logger = logging.getLogger(__name__)
+
+# The key under which the catalog properties are stored in the file's
+# schema metadata.
+_METADATA_KEY = b'py_entitymatching'
+
+_FILE_FORMATS = ['parquet', 'feather']
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('pyarrow is not installed. Please install pyarrow '
+                          'to read and write Parquet or Feather files.')
+    return pyarrow
+
+
+class ColumnarFileWriter(object):
+    """
+    Writes DataFrames (with the same columns) one after the other to a
+    Parquet or Feather file, along with the catalog properties.
+
+    Only the properties whose values are strings (such as key, fk_ltable and
+    fk_rtable) are stored in the file. The properties that point to other
+    DataFrames (such as ltable and rtable) must be given again when the file
+    is read back.
+
+    The schema of the file is fixed by the first DataFrame written. A column
+    with only missing values in the first DataFrame is typed from the same
+    column of `type_source` (e.g., the whole DataFrame being written in
+    parts), if given, and written as strings otherwise.
+    """
+
+    def __init__(self, file_path, file_format='parquet', properties=None,
+                 type_source=None):
+        validate_object_type(file_path, six.string_types,
+                             error_prefix='Input file path')
+        if file_format not in _FILE_FORMATS:
+            logger.error('File format should be one of %s' % _FILE_FORMATS)
+            raise AssertionError('File format should be one of %s'
+                                 % _FILE_FORMATS)
+        can_write, file_exists = _check_file_path(file_path)
+        if not can_write:
+            logger.error('Cannot write in the file path %s; Exiting'
+                         % file_path)
+            raise AssertionError('Cannot write in the file path %s'
+                                 % file_path)
+        if file_exists:
+            logger.warning('File already exists at %s; Overwriting it',
+                           file_path)
+        self.pa = _import_pyarrow()
+        self.file_path = file_path
+        self.file_format = file_format
+        self.properties = {}
+        if properties is not None:
+            for property_name, property_value in six.iteritems(properties):
+                if isinstance(property_value, six.string_types):
+                    self.properties[property_name] = property_value
+        self.type_source = type_source
+        self._schema = None
+        self._writer = None
+
+    def write(self, data_frame):
+        """
+        Append the contents of a DataFrame to the file.
+        """
+        pa = self.pa
+        if self._writer is None:
+            table = pa.Table.from_pandas(data_frame, preserve_index=False)
+            # A column with only missing values in the first DataFrame has
+            # no type yet.
+            fields = [pa.field(f.name, self._get_column_type(f.name))
+                      if f.type == pa.null() else f for f in table.schema]
+            metadata = dict(table.schema.metadata or {})
+            metadata[_METADATA_KEY] = json.dumps(self.properties).encode()
+            self._schema = pa.schema(fields, metadata=metadata)
+            table = table.cast(self._schema)
+            if self.file_format == 'parquet':
+                self._writer = pa.parquet.ParquetWriter(self.file_path,
+                                                        self._schema)
+            else:
+                self._writer = pa.ipc.new_file(self.file_path, self._schema)
+        else:
+            table = pa.Table.from_pandas(data_frame, schema=self._schema,
+                                         preserve_index=False)
+        self._writer.write_table(table)
+
+    def _get_column_type(self, column):
+        """
+        Get the type of a column with only missing values in the first
+        DataFrame, from the type source (or strings, if it does not tell).
+        """
+        pa = self.pa
+        if self.type_source is not None and \
+                column in self.type_source.columns:
+            column_type = pa.Array.from_pandas(self.type_source[column]).type
+            if column_type != pa.null():
+                return column_type
+        return pa.string()
+
+    def close(self):
+        """
+        Close the file.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def read_columnar_metadata(file_path, columns=None, chunk_size=None,
+                           **kwargs):
+    """
+    Reads a Parquet or Feather file into a pandas DataFrame and updates the
+    catalog with the metadata stored in the file.
+
+    The files are typically written using
+    :meth:`~py_entitymatching.extract_feature_vecs_to_file`. Like in
+    :meth:`~py_entitymatching.read_csv_metadata`, the metadata can also be
+    given as key-value parameters, which take precedence over the metadata
+    stored in the file. The ltable and rtable of a candidate set are not
+    stored in the file, so they must be given as parameters.
+
+    The file can also be read lazily: if `chunk_size` is given, a generator
+    of DataFrames with (at most) `chunk_size` rows is returned instead, and
+    only one chunk is held in memory at a time. These DataFrames are not
+    registered in the catalog.
+
+    Args:
+        file_path (string): The Parquet or Feather file path.
+        columns (list): The list of columns to read (defaults to None, in
+            which case all the columns are read).
+        chunk_size (int): The number of rows to read at a time (defaults to
+            None, in which case the whole file is read at once).
+        kwargs (dictionary): A Python dictionary containing the metadata
+            (key, ltable, rtable, fk_ltable, fk_rtable) to set.
+
+    Returns:
+        A pandas DataFrame read from the input file, or a generator of pandas
+        DataFrames if `chunk_size` is given.
+
+    Raises:
+        AssertionError: If `file_path` is not of type string.
+        AssertionError: If a file does not exist in the
+            given `file_path`.
+        AssertionError: If unknown key-value parameters are given.
+        ImportError: If pyarrow is not installed.
+
+    Examples:
+        >>> H = em.read_columnar_metadata('./C_feature_vecs.parquet', ltable=A, rtable=B)
+        >>> for H in em.read_columnar_metadata('./C_feature_vecs.parquet', chunk_size=50000):
+        ...     predictions = rf.predict(table=H, exclude_attrs=['_id', 'ltable_ID', 'rtable_ID'])
+
+    See Also:
+        :meth:`~py_entitymatching.extract_feature_vecs_to_file`
+    """
+    # Validate the input parameters.
+    validate_object_type(file_path, six.string_types,
+                         error_prefix='Input file path')
+
+    # # Check if the given path is valid.
+    if not os.path.exists(file_path):
+        logger.error('File does not exist at path %s' % file_path)
+        raise AssertionError('File does not exist at path %s' % file_path)
+
+    pa = _import_pyarrow()
+
+    is_parquet = _is_parquet_file(file_path)
+    if is_parquet:
+        parquet_file = pa.parquet.ParquetFile(file_path)
+        schema = parquet_file.schema_arrow
+    else:
+        ipc_reader = pa.ipc.open_file(pa.memory_map(file_path))
+        schema = ipc_reader.schema
+
+    if chunk_size is not None:
+        if is_parquet:
+            batches = parquet_file.iter_batches(batch_size=chunk_size,
+                                                columns=columns)
+        else:
+            batches = _iter_ipc_batches(ipc_reader, chunk_size, columns)
+        return (batch.to_pandas() for batch in batches)
+
+    # Get the metadata stored in the file, and update it with the key-value
+    # pairs given in the command.
+    metadata = {}
+    if schema.metadata is not None and _METADATA_KEY in schema.metadata:
+        metadata = json.loads(schema.metadata[_METADATA_KEY].decode())
+    metadata, kwargs = _update_metadata_for_read_cmd(metadata, **kwargs)
+    if len(kwargs) > 0:
+        logger.error('Unknown arguments: %s' % ', '.join(kwargs.keys()))
+        raise AssertionError('Unknown arguments: %s'
+                             % ', '.join(kwargs.keys()))
+
+    # Validate the metadata.
+    _check_metadata_for_read_cmd(metadata)
+
+    if is_parquet:
+        table = parquet_file.read(columns=columns)
+    else:
+        table = ipc_reader.read_all()
+        if columns is not None:
+            table = table.select(columns)
+    data_frame = table.to_pandas()
+    # The DataFrame is new, so any properties in the catalog for its id are
+    # left over from a DataFrame that no longer exists.
+    cm.init_properties(data_frame)
+
+    # If only some columns are read, the key and foreign key properties may
+    # refer to columns that are not present.
+    for property_name in ['key', 'fk_ltable', 'fk_rtable']:
+        if metadata.get(property_name, None) is not None and \
+                metadata[property_name] not in data_frame.columns:
+            logger.warning('Attribute %s (%s) is not read; ignoring the '
+                           'property' % (metadata[property_name],
+                                         property_name))
+            metadata.pop(property_name)
+
+    # Get the value for 'key' property and update the catalog.
+    key = metadata.pop('key', None)
+    if key is not None:
+        cm.set_key(data_frame, key)
+
+    fk_ltable = metadata.pop('fk_ltable', None)
+    if fk_ltable is not None:
+        cm.set_fk_ltable(data_frame, fk_ltable)
+
+    fk_rtable = metadata.pop('fk_rtable', None)
+    if fk_rtable is not None:
+        cm.set_fk_rtable(data_frame, fk_rtable)
+
+    # Update the catalog with other properties.
+    for property_name, property_value in six.iteritems(metadata):
+        cm.set_property(data_frame, property_name, property_value)
+    if not cm.is_dfinfo_present(data_frame):
+        cm.init_properties(data_frame)
+
+    # Return the DataFrame
+    return data_frame
+
+
+def _is_parquet_file(file_path):
+    """
+    Check whether the file is a Parquet file (else it is a Feather file).
+    """
+    with open(file_path, 'rb') as file_handler:
+        return file_handler.read(4) == b'PAR1'
+
+
+def _iter_ipc_batches(ipc_reader, chunk_size, columns):
+    """
+    Iterate over the record batches of a Feather file, with at most
+    chunk_size rows per batch.
+    """
+    for i in range(ipc_reader.num_record_batches):
+        batch = ipc_reader.get_batch(i)
+        if columns is not None:
+            batch = batch.select(columns)
+        for offset in range(0, batch.num_rows, chunk_size):
+            yield batch.slice(offset, chunk_size)
@@ -123,6 +123,9 @@ def read_csv_metadata(file_path, **kwargs):
 
     # Read the csv file using pandas read_csv method.
     data_frame = pd.read_csv(file_path, **kwargs)
+    # The DataFrame is new, so any properties in the catalog for its id are
+    # left over from a DataFrame that no longer exists.
+    cm.init_properties(data_frame)
 
     # Get the value for 'key' property and update the catalog.
     key = metadata.pop('key', None)
@@ -97,7 +97,7 @@ class MLMatcher(Matcher):
 
         Args:
             x (DataFrame): The input feature vectors given as pandas
-             DataFrame (defaults to None).
+             DataFrame or as a NumPy array (defaults to None).
             y (DatFrame): The input target attribute given as pandas
                 DataFrame with a single column (defaults to None).
             table (DataFrame): The input pandas DataFrame containing feature
@@ -207,8 +207,8 @@ class MLMatcher(Matcher):
 
 
         Args:
-            x (DataFrame): The input pandas DataFrame containing only feature
-                vectors (defaults to None).
+            x (DataFrame): The input pandas DataFrame (or NumPy array)
+                containing only feature vectors (defaults to None).
             table (DataFrame): The input pandas DataFrame containing feature
                 vectors, and may be other attributes (defaults to None).
             exclude_attrs (list): A list of attributes to be excluded from the
@@ -287,6 +287,15 @@ class MLMatcher(Matcher):
         Gets data in a format that can be used to call sk-learn methods such
         as fit and predict.
         """
+        # A NumPy array (such as the output of extract_feature_matrix)
+        # contains only the feature values, so it is used as it is.
+        if isinstance(x, np.ndarray):
+            if y is not None:
+                if isinstance(y, (pd.Series, pd.DataFrame)):
+                    y = y.values
+                return x, y
+            return x
+
         # Validate input parameters.
         # # We expect the input object (x) to be of type pandas DataFrame.
         if not isinstance(x, pd.DataFrame):
@@ -523,6 +523,28 @@ class AttrEquivBlockerTestCases(unittest.TestCase):
         validate_metadata_two_candsets(C, D)
         validate_data(D, [('a5','b5')])
 
+    def test_ab_block_candset_different_dtypes(self):
+        A = pd.DataFrame({'ID': ['a1', 'a2', 'a3', 'a4'],
+                          'year': [1990.0, 1991.0, None, 1993.0]})
+        em.set_key(A, 'ID')
+        B = pd.DataFrame({'ID': ['b1', 'b2', 'b3'],
+                          'year': [1990, 1993, 1991]})
+        em.set_key(B, 'ID')
+        C = pd.DataFrame({'_id': range(12),
+                          'ltable_ID': [l for l in A.ID for r in B.ID],
+                          'rtable_ID': [r for l in A.ID for r in B.ID]})
+        em.set_key(C, '_id')
+        em.set_fk_ltable(C, 'ltable_ID')
+        em.set_fk_rtable(C, 'rtable_ID')
+        em.set_ltable(C, A)
+        em.set_rtable(C, B)
+        D = self.ab.block_candset(C, 'year', 'year')
+        validate_metadata_two_candsets(C, D)
+        validate_data(D, [('a1', 'b1'), ('a2', 'b3'), ('a4', 'b2')])
+        D = self.ab.block_candset(C, 'year', 'year', allow_missing=True)
+        validate_data(D, [('a1', 'b1'), ('a2', 'b3'), ('a3', 'b1'),
+                          ('a3', 'b2'), ('a3', 'b3'), ('a4', 'b2')])
+
 
     def test_ab_block_tuples(self):
         self.assertEqual(self.ab.block_tuples(self.A.loc[1], self.B.loc[2],
@@ -39,6 +39,18 @@ expected_ids_2 = [('a2', 'b3'), ('a3', 'b2'), ('a3', 'b6'), ('a5', 'b5')]
 def _evil_block_fn(x, y):
     return True
 
+# blocks the tuple pairs (or batches of them) with different zipcodes
+def _zipcode_batch_block_fn(x, y):
+    return x['zipcode'] != y['zipcode']
+
+# returns a mask of the wrong length
+def _bogus_batch_block_fn(x, y):
+    return [True]
+
+# blocks the tuple pairs using _block_fn, or with different birth years
+def _birth_year_block_fn(x, y):
+    return x['birth_year'] != y['birth_year'] or _block_fn(x, y)
+
 class BlackBoxBlockerTestCases(unittest.TestCase):
 
     def setUp(self):
@@ -257,6 +269,28 @@ class BlackBoxBlockerTestCases(unittest.TestCase):
         validate_metadata_two_candsets(C, D)
         validate_data(D, expected_ids_2)
 
+    def test_bb_block_candset_group_by_ltable(self):
+        ab = em.AttrEquivalenceBlocker()
+        C = ab.block_tables(self.A, self.B, 'zipcode', 'zipcode',
+                            l_output_attrs, r_output_attrs,
+                            l_output_prefix, r_output_prefix)
+        # the pairs of an ltable tuple are not consecutive
+        C_sorted = C.sort_values(r_output_prefix + 'ID')
+        em.copy_properties(C, C_sorted)
+        C = C_sorted
+        self.bb.set_black_box_function(_block_fn)
+        D = self.bb.block_candset(C)
+        for n_jobs in [1, 2]:
+            E = self.bb.block_candset(C, n_jobs=n_jobs, group_by_ltable=True)
+            validate_metadata_two_candsets(C, E)
+            validate_data(E, expected_ids_2)
+            pd.testing.assert_frame_equal(D, E)
+
+    @raises(AssertionError)
+    def test_bb_block_candset_invalid_group_by_ltable(self):
+        C = self.bb.block_tables(self.A, self.B)
+        self.bb.block_candset(C, group_by_ltable='yes')
+
     def test_bb_block_candset_empty_input(self):
         self.bb.set_black_box_function(_evil_block_fn)
         C = self.bb.block_tables(self.A, self.B)
@@ -277,6 +311,107 @@ class BlackBoxBlockerTestCases(unittest.TestCase):
         validate_metadata_two_candsets(C, D)
         validate_data(D)
 
+    def test_bb_block_tables_wi_batch_fn(self):
+        self.bb.set_black_box_batch_function(_zipcode_batch_block_fn)
+        C = self.bb.block_tables(self.A, self.B, l_output_attrs,
+                                 r_output_attrs, l_output_prefix,
+                                 r_output_prefix)
+        validate_metadata(C, l_output_attrs, r_output_attrs,
+                          l_output_prefix, r_output_prefix)
+        validate_data(C, expected_ids_zip)
+        self.assertEqual(C['l_name'].tolist(),
+                         self.A.set_index('ID').loc[C['l_ID'], 'name'].tolist())
+
+    def test_bb_block_candset_wi_batch_fn(self):
+        self.bb.set_black_box_function(_block_fn)
+        C = self.bb.block_tables(self.A, self.B)
+        validate_data(C, expected_ids_1)
+        self.bb.set_black_box_batch_function(_zipcode_batch_block_fn)
+        for group_by_ltable in [False, True]:
+            D = self.bb.block_candset(C, group_by_ltable=group_by_ltable)
+            validate_metadata_two_candsets(C, D)
+            validate_data(D, expected_ids_2)
+        self.assertEqual(self.bb.black_box_function, None)
+
+    @raises(AssertionError)
+    def test_bb_block_tables_wi_invalid_batch_fn_output(self):
+        self.bb.set_black_box_batch_function(_bogus_batch_block_fn)
+        self.bb.block_tables(self.A, self.B)
+
+    def test_bb_block_tuples_wi_batch_fn(self):
+        self.bb.set_black_box_batch_function(_zipcode_batch_block_fn)
+        self.assertEqual(self.bb.block_tuples(self.A.loc[0], self.B.loc[0]),
+                         False)
+        self.assertEqual(self.bb.block_tuples(self.A.loc[0], self.B.loc[2]),
+                         True)
+
+    def test_bb_block_tables_wi_equality_prefilter(self):
+        self.bb.set_black_box_function(_block_fn)
+        self.bb.set_prefilter(em.EqualityPrefilter('zipcode', 'zipcode'))
+        C = self.bb.block_tables(self.A, self.B, l_output_attrs,
+                                 r_output_attrs, l_output_prefix,
+                                 r_output_prefix)
+        validate_metadata(C, l_output_attrs, r_output_attrs,
+                          l_output_prefix, r_output_prefix)
+        validate_data(C, expected_ids_2)
+        self.assertEqual(C['l_name'].tolist(),
+                         self.A.set_index('ID').loc[C['l_ID'], 'name'].tolist())
+        self.assertEqual(C['r_address'].tolist(),
+                         self.B.set_index('ID').loc[C['r_ID'], 'address'].tolist())
+
+    def test_bb_block_tables_wi_equality_prefilter_batch_fn(self):
+        self.bb.set_black_box_batch_function(_zipcode_batch_block_fn)
+        self.bb.set_prefilter(em.EqualityPrefilter('zipcode', 'zipcode'))
+        C = self.bb.block_tables(self.A, self.B)
+        validate_data(C, expected_ids_zip)
+
+    def test_bb_block_tables_wi_range_prefilter(self):
+        self.bb.set_black_box_function(_birth_year_block_fn)
+        C1 = self.bb.block_tables(self.A, self.B, show_progress=False)
+        self.bb.set_prefilter(em.RangePrefilter('birth_year', 'birth_year', 0))
+        C2 = self.bb.block_tables(self.A, self.B, show_progress=False)
+        validate_data(C1, [('a2', 'b3'), ('a3', 'b2'), ('a5', 'b5')])
+        self.assertEqual(C2.drop(columns='_id').values.tolist(),
+                         C1.drop(columns='_id').values.tolist())
+
+    def test_bb_block_tables_wi_overlap_prefilter(self):
+        self.bb.set_black_box_function(_block_fn)
+        self.bb.set_prefilter(em.OverlapPrefilter('address', 'address',
+                                                  overlap_size=3))
+        C = self.bb.block_tables(self.A, self.B)
+        ob = em.OverlapBlocker()
+        D = ob.block_tables(self.A, self.B, 'address', 'address',
+                            overlap_size=3)
+        overlapping = set(zip(D['ltable_ID'], D['rtable_ID']))
+        validate_data(C, [ids for ids in expected_ids_1 if ids in overlapping])
+
+    def test_bb_block_tables_wi_prefilter_no_pairs(self):
+        self.bb.set_black_box_function(_block_fn)
+        self.bb.set_prefilter(em.RangePrefilter('birth_year', 'hourly_wage',
+                                                0))
+        C = self.bb.block_tables(self.A, self.B, l_output_attrs,
+                                 r_output_attrs, l_output_prefix,
+                                 r_output_prefix)
+        validate_metadata(C, l_output_attrs, r_output_attrs,
+                          l_output_prefix, r_output_prefix)
+        validate_data(C)
+
+    @raises(AssertionError)
+    def test_bb_set_invalid_prefilter(self):
+        self.bb.set_prefilter('zipcode')
+
+    @raises(AssertionError)
+    def test_bb_block_tables_wi_bogus_prefilter_attr(self):
+        self.bb.set_black_box_function(_block_fn)
+        self.bb.set_prefilter(em.EqualityPrefilter('zipcode', 'bogus'))
+        self.bb.block_tables(self.A, self.B)
+
+    @raises(AssertionError)
+    def test_bb_block_tables_wi_non_numeric_range_prefilter(self):
+        self.bb.set_black_box_function(_block_fn)
+        self.bb.set_prefilter(em.RangePrefilter('name', 'name', 1))
+        self.bb.block_tables(self.A, self.B)
+
     def test_bb_block_tuples(self):
         self.bb.set_black_box_function(_block_fn)
         self.assertEqual(self.bb.block_tuples(self.A.loc[1], self.B.loc[2]),
@@ -350,6 +485,30 @@ class BlackBoxBlockerMulticoreTestCases(unittest.TestCase):
                           l_output_prefix, r_output_prefix)
         validate_data(C, expected_ids_1)
 
+    def test_bb_block_tables_wi_batch_fn_njobs_2(self):
+        self.bb.set_black_box_batch_function(_zipcode_batch_block_fn)
+        C = self.bb.block_tables(self.A, self.B, l_output_attrs=l_output_attrs,
+                                 r_output_attrs=r_output_attrs,
+                                 l_output_prefix=l_output_prefix,
+                                 r_output_prefix=r_output_prefix, n_jobs=2)
+        validate_metadata(C, l_output_attrs, r_output_attrs,
+                          l_output_prefix, r_output_prefix)
+        validate_data(C, expected_ids_zip)
+        D = self.bb.block_candset(C, n_jobs=2)
+        validate_metadata_two_candsets(C, D)
+        validate_data(D, expected_ids_zip)
+
+    def test_bb_block_tables_wi_prefilter_njobs_2(self):
+        self.bb.set_black_box_function(_block_fn)
+        self.bb.set_prefilter(em.EqualityPrefilter('zipcode', 'zipcode'))
+        C = self.bb.block_tables(self.A, self.B, l_output_attrs=l_output_attrs,
+                                 r_output_attrs=r_output_attrs,
+                                 l_output_prefix=l_output_prefix,
+                                 r_output_prefix=r_output_prefix, n_jobs=2)
+        validate_metadata(C, l_output_attrs, r_output_attrs,
+                          l_output_prefix, r_output_prefix)
+        validate_data(C, expected_ids_2)
+
     def test_bb_block_candset_njobs_2(self):
         ab = em.AttrEquivalenceBlocker()
         C = ab.block_tables(self.A, self.B, 'zipcode', 'zipcode',
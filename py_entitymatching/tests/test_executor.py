@@ -0,0 +1,123 @@
+import os
+import pickle
+import time
+import unittest
+
+import pandas as pd
+from joblib import delayed
+from .utils import raises
+
+import py_entitymatching as em
+import py_entitymatching.feature.simfunctions as sim
+import py_entitymatching.utils.executor as ex
+
+p = em.get_install_path()
+path_a = os.sep.join([p, 'tests', 'test_datasets', 'A.csv'])
+path_b = os.sep.join([p, 'tests', 'test_datasets', 'B.csv'])
+
+
+def _block_fn(x, y):
+    return sim.monge_elkan(x['name'], y['name']) < 0.6
+
+
+def _timed_job():
+    start = time.time()
+    time.sleep(0.2)
+    return start, time.time()
+
+
+class ExecutorTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.A = em.read_csv_metadata(path_a, key='ID')
+        self.B = em.read_csv_metadata(path_b, key='ID')
+        self.executor = em.Executor(n_jobs=2, cache_size=4)
+
+    def tearDown(self):
+        em.set_executor(None)
+        self.executor.shutdown()
+        ex._worker_cache.clear()
+
+    def test_set_executor(self):
+        self.assertEqual(em.get_executor(), None)
+        em.set_executor(self.executor)
+        self.assertIs(em.get_executor(), self.executor)
+        em.set_executor(None)
+        self.assertEqual(em.get_executor(), None)
+
+    @raises(AssertionError)
+    def test_set_executor_invalid(self):
+        em.set_executor(2)
+
+    @raises(AssertionError)
+    def test_executor_invalid_n_jobs(self):
+        em.Executor(n_jobs=0)
+
+    @raises(AssertionError)
+    def test_executor_invalid_cache_size(self):
+        em.Executor(cache_size=0)
+
+    def test_share_same_content(self):
+        handle1 = self.executor.share(self.A)
+        handle2 = self.executor.share(self.A.copy())
+        self.assertEqual(handle1.content_hash, handle2.content_hash)
+        # Only the handle is pickled, not the table.
+        handle = pickle.loads(pickle.dumps(handle1))
+        self.assertTrue(len(pickle.dumps(handle1)) < 1000)
+        pd.testing.assert_frame_equal(handle.get(), self.A)
+        self.assertIn(handle1.content_hash, ex._worker_cache)
+
+    def test_share_modified_object(self):
+        A = self.A.copy()
+        handle1 = self.executor.share(A)
+        A.loc[A.index[0], 'name'] = 'changed'
+        handle2 = self.executor.share(A)
+        self.assertNotEqual(handle1.content_hash, handle2.content_hash)
+        pd.testing.assert_frame_equal(handle2.get(), A)
+
+    def test_run_honours_n_jobs(self):
+        intervals = self.executor.run([delayed(_timed_job)()
+                                       for _ in range(3)], n_jobs=1)
+        intervals = sorted(intervals)
+        for (_, end), (start, _) in zip(intervals[:-1], intervals[1:]):
+            self.assertTrue(end <= start)
+
+    def test_get_num_jobs(self):
+        em.set_executor(self.executor)
+        self.assertEqual(ex.get_num_jobs(1), 1)
+        self.assertEqual(ex.get_num_jobs(4), 2)
+
+    def test_worker_cache_size(self):
+        for i in range(6):
+            self.executor.share(i).get()
+        self.assertEqual(len(ex._worker_cache), 4)
+        self.executor.run([])
+        self.assertEqual(len(os.listdir(self.executor.dir_path)), 4)
+
+    def test_block_and_extract_with_executor(self):
+        bb = em.BlackBoxBlocker()
+        bb.set_black_box_function(_block_fn)
+        C = bb.block_tables(self.A, self.B, show_progress=False)
+        F = em.get_features_for_matching(self.A, self.B,
+                                         validate_inferred_attr_types=False)
+        D = bb.block_candset(C, show_progress=False)
+        H = em.extract_feature_vecs(C, feature_table=F, show_progress=False)
+
+        em.set_executor(self.executor)
+        for _ in range(2):
+            C_ex = bb.block_tables(self.A, self.B, show_progress=False,
+                                   n_jobs=2)
+            D_ex = bb.block_candset(C, show_progress=False, n_jobs=2)
+            H_ex = em.extract_feature_vecs(C, feature_table=F,
+                                           show_progress=False, n_jobs=2)
+            # The parallel blocking output is in the order of the splits.
+            self.assertEqual(
+                sorted(zip(C_ex['ltable_ID'], C_ex['rtable_ID'])),
+                sorted(zip(C['ltable_ID'], C['rtable_ID'])))
+            pd.testing.assert_frame_equal(D_ex, D)
+            pd.testing.assert_frame_equal(H_ex, H)
+
+    @raises(AssertionError)
+    def test_run_after_shutdown(self):
+        self.executor.shutdown()
+        self.executor.run([])
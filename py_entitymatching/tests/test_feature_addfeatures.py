@@ -13,6 +13,10 @@ from py_entitymatching.feature.autofeaturegen import get_features_for_matching
 from py_entitymatching.feature.addfeatures import add_feature, add_blackbox_feature, get_feature_fn, _parse_feat_str, \
     create_feature_table
 
+from py_entitymatching.feature.featurefunction import FeatureFunction
+from py_entitymatching.feature.simfunctions import jaccard, lev_sim
+from py_entitymatching.feature.tokenizers import tok_qgram
+
 import py_entitymatching.catalog.catalog_manager as cm
 
 datasets_path = os.sep.join([get_install_path(), 'tests', 'test_datasets'])
@@ -27,6 +31,30 @@ class AddFeaturesTestCases(unittest.TestCase):
     def tearDown(self):
         cm.del_catalog()
 
+    def test_get_feature_fn_function_object(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        feature_string = "jaccard(qgm_3(ltuple['name']), qgm_3(rtuple['name']))"
+        f_dict = get_feature_fn(feature_string, get_tokenizers_for_matching(),
+                                get_sim_funs_for_matching())
+        self.assertEqual(isinstance(f_dict['function'], FeatureFunction), True)
+        self.assertEqual(f_dict['function'].left_attr_tokenizer, 'qgm_3')
+        self.assertEqual(f_dict['function'](A.loc[1], B.loc[1]),
+                         jaccard(tok_qgram(A.loc[1, 'name'], 3),
+                                 tok_qgram(B.loc[1, 'name'], 3)))
+
+    def test_get_feature_fn_compiled(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        # Only a similarity function applied to two attributes is turned
+        # into a function object.
+        feature_string = "1 - lev_sim(ltuple['name'], rtuple['name'])"
+        f_dict = get_feature_fn(feature_string, get_tokenizers_for_matching(),
+                                get_sim_funs_for_matching())
+        self.assertEqual(isinstance(f_dict['function'], FeatureFunction), False)
+        self.assertEqual(f_dict['function'](A.loc[1], B.loc[1]),
+                         1 - lev_sim(A.loc[1, 'name'], B.loc[1, 'name']))
+
     def test_add_features_valid_1(self):
         A = read_csv_metadata(path_a)
         B = read_csv_metadata(path_b, key='ID')
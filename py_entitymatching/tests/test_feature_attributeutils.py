@@ -28,6 +28,19 @@ class AttributeUtilsTestCases(unittest.TestCase):
     def test_get_attr_types_invalid_df(self):
         x = get_attr_types(None)
 
+    def test_get_attr_types_sample_size(self):
+        A = read_csv_metadata(path_a)
+        x = get_attr_types(A)
+        y = get_attr_types(A, sample_size=2, random_state=0)
+        self.assertEqual(set(x.keys()), set(y.keys()))
+        for attr in A.columns:
+            self.assertEqual(x[attr], y[attr])
+
+    @raises(AssertionError)
+    def test_get_attr_types_invalid_sample_size(self):
+        A = read_csv_metadata(path_a)
+        x = get_attr_types(A, sample_size=0)
+
     def test_get_attr_corres_valid_1(self):
         A = read_csv_metadata(path_a)
         B = read_csv_metadata(path_b, key='ID')
@@ -90,6 +103,25 @@ class AttributeUtilsTestCases(unittest.TestCase):
         t = _get_type(A['temp'])
         self.assertEqual(t, "str_gt_10w")
 
+    def test_get_type_sample_size(self):
+        s = pd.Series(['a b'] * 50 + ['a b c d e f'] * 50)
+        t = _get_type(s, sample_size=10, random_state=0)
+        self.assertEqual(t, _get_type(s.sample(n=10, random_state=0)))
+
+    @raises(AssertionError)
+    def test_get_type_sample_size_multiple_types(self):
+        # The mixed values are checked over the whole column, also when
+        # they are not sampled.
+        A = read_csv_metadata(path_a)
+        A.loc[0, 'ID'] = 1000
+        t = _get_type(A['ID'], sample_size=1, random_state=1)
+
+    def test_get_type_numeric_dtype(self):
+        self.assertEqual(_get_type(pd.Series([1.5, None, 2.0])), 'numeric')
+        self.assertEqual(_get_type(pd.Series([True, False])), 'boolean')
+        self.assertEqual(_get_type(pd.Series([None, None], dtype=float)),
+                         'un_determined')
+
     def test_len_handle_nan_invalid(self):
         result = _len_handle_nan(None)
         self.assertEqual(pd.isnull(result), True)
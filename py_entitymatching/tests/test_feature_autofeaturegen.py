@@ -120,6 +120,20 @@ class AutoFeatureGenerationTestCases(unittest.TestCase):
             x = f(A.loc[1], B.loc[2])
             self.assertEqual(x >= 0, True)
 
+    def test_get_features_for_matching_attr_types_sample_size(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        feat_table = afg.get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        sampled_feat_table = afg.get_features_for_matching(
+            A, B, validate_inferred_attr_types=False,
+            attr_types_sample_size=max(len(A), len(B)), random_state=0)
+        self.assertEqual(list(sampled_feat_table['feature_name']),
+                         list(feat_table['feature_name']))
+        sampled_feat_table = afg.get_features_for_matching(
+            A, B, validate_inferred_attr_types=False,
+            attr_types_sample_size=5, random_state=0)
+        self.assertEqual(isinstance(sampled_feat_table, pd.DataFrame), True)
+
     @raises(AssertionError)
     def test_get_features_for_matching_invalid_df1(self):
         # A = read_csv_metadata(path_a)
@@ -132,6 +146,99 @@ class AutoFeatureGenerationTestCases(unittest.TestCase):
         # B = read_csv_metadata(path_b, key='ID')
         feat_table = afg.get_features_for_matching(A, None, validate_inferred_attr_types=False)
 
+    def test_get_features_for_matching_prune_with_candset(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        feat_table = afg.get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        pruned_table = afg.get_features_for_matching(A, B, validate_inferred_attr_types=False,
+                                                     candset=C)
+        self.assertEqual(isinstance(pruned_table, pd.DataFrame), True)
+        self.assertEqual(list(pruned_table.columns), list(feat_table.columns))
+        self.assertEqual(len(pruned_table) < len(feat_table), True)
+        self.assertEqual(set(pruned_table['feature_name']).issubset(feat_table['feature_name']),
+                         True)
+        # Every attribute correspondence keeps at least one feature
+        self.assertEqual(set(zip(pruned_table['left_attribute'], pruned_table['right_attribute'])),
+                         set(zip(feat_table['left_attribute'], feat_table['right_attribute'])))
+
+    def test_get_features_for_matching_prune_with_time_budget(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        feat_table = afg.get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        pruned_table = afg.get_features_for_matching(A, B, validate_inferred_attr_types=False,
+                                                     time_budget=1e-9, sample_size=50,
+                                                     random_state=0)
+        attr_pairs = list(zip(pruned_table['left_attribute'], pruned_table['right_attribute']))
+        # Only one feature per attribute correspondence fits in the budget
+        self.assertEqual(len(attr_pairs), len(set(attr_pairs)))
+        self.assertEqual(set(attr_pairs),
+                         set(zip(feat_table['left_attribute'], feat_table['right_attribute'])))
+
+    def test_get_features_for_matching_prune_removes_sample_metadata(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        catalog_len = cm.get_catalog_len()
+        afg.get_features_for_matching(A, B, validate_inferred_attr_types=False,
+                                      sample_size=50, random_state=0)
+        afg.get_features_for_matching(A, B, validate_inferred_attr_types=False,
+                                      candset=C, sample_size=5, random_state=0)
+        self.assertEqual(cm.get_catalog_len(), catalog_len)
+        self.assertEqual(cm.is_dfinfo_present(C), True)
+
+    def test_get_pair_sample_projects_tables(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        for candset in [None, C]:
+            sample = afg._get_pair_sample(A, B, candset, 3, 0)
+            l_df, r_df = cm.get_ltable(sample), cm.get_rtable(sample)
+            self.assertEqual(set(l_df['ID']),
+                             set(sample[cm.get_fk_ltable(sample)]))
+            self.assertEqual(set(r_df['ID']),
+                             set(sample[cm.get_fk_rtable(sample)]))
+            self.assertEqual(cm.get_key(l_df), 'ID')
+            self.assertEqual(cm.get_key(r_df), 'ID')
+            self.assertEqual(sample is C, False)
+        self.assertEqual(cm.get_ltable(C) is A, True)
+
+    def test_drop_features_by_time_budget_shared_tokens(self):
+        # Features 0 and 1 share the tokens of a group that is expensive to
+        # tokenize, so dropping only one of them saves little time.
+        feature_names = ['f0', 'f1', 'f2', 'f3']
+        attr_pairs = [('a', 'a'), ('a', 'a'), ('a', 'a'), ('b', 'b')]
+        sim_costs = [1.0, 1.0, 5.0, 1.0]
+        group = ('ltable', 'a', None)
+        feature_groups = [(group,), (group,), (), ()]
+        tok_costs = {group: 10.0}
+        kept = afg._drop_features_by_time_budget([0, 1, 2, 3], feature_names,
+                                                 attr_pairs, sim_costs,
+                                                 feature_groups, tok_costs, 8.0)
+        self.assertEqual(sorted(kept), [2, 3])
+
+    def test_drop_features_by_time_budget_over_budget(self):
+        feature_names = ['f0', 'f1']
+        attr_pairs = [('a', 'a'), ('b', 'b')]
+        kept = afg._drop_features_by_time_budget([0, 1], feature_names,
+                                                 attr_pairs, [1.0, 1.0],
+                                                 [(), ()], {}, 1.0)
+        self.assertEqual(sorted(kept), [0, 1])
+
+    @raises(AssertionError)
+    def test_get_features_for_matching_prune_invalid_time_budget(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        afg.get_features_for_matching(A, B, validate_inferred_attr_types=False,
+                                      time_budget=-1)
+
+    @raises(AssertionError)
+    def test_get_features_for_matching_prune_invalid_sample_size(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        afg.get_features_for_matching(A, B, validate_inferred_attr_types=False,
+                                      candset=C, sample_size=0)
 
     def test_check_table_order_valid(self):
         A = read_csv_metadata(path_a)
@@ -1,21 +1,48 @@
 import os
 # from nose.tools import *
+import shutil
+import tempfile
 import unittest
 import pandas as pd
+import numpy as np
 from .utils import raises
 
-from py_entitymatching.utils.generic_helper import get_install_path
+from py_entitymatching.utils.generic_helper import get_install_path, \
+    split_candset_by_ltable
 from py_entitymatching.io.parsers import read_csv_metadata
 
-from py_entitymatching.feature.extractfeatures import extract_feature_vecs
+from py_entitymatching.feature.extractfeatures import extract_feature_vecs, apply_feat_fns, \
+    extract_feature_matrix, extract_feature_vecs_by_chunks, extract_feature_vecs_to_file, \
+    update_feature_vecs, profile_feature_vecs, _FeatureValueMemo
+from py_entitymatching.io.columnar import read_columnar_metadata, \
+    ColumnarFileWriter
 from py_entitymatching.feature.autofeaturegen import get_features_for_matching
+from py_entitymatching.feature.addfeatures import add_blackbox_feature, \
+    add_feature, get_feature_fn
+from py_entitymatching.feature.simfunctions import get_sim_funs_for_matching
+from py_entitymatching.feature.tokenizers import tok_delim, tok_qgram
 import py_entitymatching.catalog.catalog_manager as cm
+from py_entitymatching.utils.shared_table import SharedTable
 
 datasets_path = os.sep.join([get_install_path(), 'tests', 'test_datasets'])
 path_a = os.sep.join([datasets_path, 'A.csv'])
 path_b = os.sep.join([datasets_path, 'B.csv'])
 path_c = os.sep.join([datasets_path, 'C.csv'])
 
+try:
+    import pyarrow
+    PYARROW_INSTALLED = True
+except ImportError:
+    PYARROW_INSTALLED = False
+
+
+def get_candset_properties(feature_vectors):
+    # The properties of the feature vectors, other than the hashes of the
+    # features (which the candset does not have)
+    properties = dict(cm.get_all_properties(feature_vectors))
+    properties.pop('feature_hashes')
+    return properties
+
 
 class ExtractFeaturesTestCases(unittest.TestCase):
     def test_extract_feature_vecs_valid_1(self):
@@ -34,7 +61,7 @@ class ExtractFeaturesTestCases(unittest.TestCase):
         self.assertEqual(F.columns[3], 'ltable_name')
         self.assertEqual(F.columns[4], 'rtable_name')
         self.assertEqual(F.columns[len(F.columns) - 1], 'label')
-        self.assertEqual(cm.get_all_properties(C) == cm.get_all_properties(F), True)
+        self.assertEqual(cm.get_all_properties(C), get_candset_properties(F))
 
     def test_extract_feature_vecs_valid_2(self):
         A = read_csv_metadata(path_a)
@@ -51,7 +78,7 @@ class ExtractFeaturesTestCases(unittest.TestCase):
         self.assertEqual(F.columns[3], 'ltable_name')
         self.assertEqual(F.columns[4], 'rtable_name')
         self.assertEqual(F.columns[len(F.columns) - 1] == 'label', False)
-        self.assertEqual(cm.get_all_properties(C) == cm.get_all_properties(F), True)
+        self.assertEqual(cm.get_all_properties(C), get_candset_properties(F))
 
     def test_extract_feature_vecs_with_default_value_for_n_jobs(self):
         A = read_csv_metadata(path_a)
@@ -68,7 +95,7 @@ class ExtractFeaturesTestCases(unittest.TestCase):
         self.assertEqual(F.columns[3], 'ltable_name')
         self.assertEqual(F.columns[4], 'rtable_name')
         self.assertEqual(F.columns[len(F.columns) - 1] == 'label', False)
-        self.assertEqual(cm.get_all_properties(C) == cm.get_all_properties(F), True)
+        self.assertEqual(cm.get_all_properties(C), get_candset_properties(F))
 
     def test_extract_feature_vecs_with_parralel_job_count_more_than_one(self):
         A = read_csv_metadata(path_a)
@@ -84,7 +111,7 @@ class ExtractFeaturesTestCases(unittest.TestCase):
         self.assertEqual(F.columns[2], cm.get_fk_rtable(C))
         self.assertEqual(F.columns[4], 'rtable_name')
         self.assertEqual(F.columns[len(F.columns) - 1] == 'label', False)
-        self.assertEqual(cm.get_all_properties(C) == cm.get_all_properties(F), True)
+        self.assertEqual(cm.get_all_properties(C), get_candset_properties(F))
 
     def test_extract_feature_vecs_with_parralel_job_count_less_than_zero(self):
         A = read_csv_metadata(path_a)
@@ -100,7 +127,7 @@ class ExtractFeaturesTestCases(unittest.TestCase):
         self.assertEqual(F.columns[2], cm.get_fk_rtable(C))
         self.assertEqual(F.columns[4], 'rtable_name')
         self.assertEqual(F.columns[len(F.columns) - 1] == 'label', False)
-        self.assertEqual(cm.get_all_properties(C) == cm.get_all_properties(F), True)
+        self.assertEqual(cm.get_all_properties(C), get_candset_properties(F))
 
     def test_extract_feature_vecs_valid_3(self):
         A = read_csv_metadata(path_a)
@@ -119,7 +146,7 @@ class ExtractFeaturesTestCases(unittest.TestCase):
         self.assertEqual(F.columns[3], 'ltable_name')
         self.assertEqual(F.columns[4], 'rtable_name')
         self.assertEqual(F.columns[len(F.columns) - 1] == 'label', True)
-        self.assertEqual(cm.get_all_properties(C) == cm.get_all_properties(F), True)
+        self.assertEqual(cm.get_all_properties(C), get_candset_properties(F))
 
     def test_extract_feature_vecs_valid_4(self):
         A = read_csv_metadata(path_a)
@@ -138,7 +165,7 @@ class ExtractFeaturesTestCases(unittest.TestCase):
         self.assertEqual(F.columns[3], 'ltable_name')
         self.assertEqual(F.columns[4], 'rtable_name')
         self.assertEqual(F.columns[len(F.columns) - 1] == 'label', True)
-        self.assertEqual(cm.get_all_properties(C) == cm.get_all_properties(F), True)
+        self.assertEqual(cm.get_all_properties(C), get_candset_properties(F))
 
     def test_extract_feature_vecs_valid_5(self):
         A = read_csv_metadata(path_a)
@@ -157,7 +184,7 @@ class ExtractFeaturesTestCases(unittest.TestCase):
         self.assertEqual(F.columns[3], 'ltable_name')
         self.assertEqual(F.columns[4], 'rtable_name')
         self.assertEqual(F.columns[len(F.columns) - 1] == 'label', True)
-        self.assertEqual(cm.get_all_properties(C) == cm.get_all_properties(F), True)
+        self.assertEqual(cm.get_all_properties(C), get_candset_properties(F))
 
     def test_extract_feature_vecs_valid_6(self):
         A = read_csv_metadata(path_a)
@@ -176,7 +203,7 @@ class ExtractFeaturesTestCases(unittest.TestCase):
         self.assertEqual(F.columns[3], 'ltable_name')
         self.assertEqual(F.columns[4], 'rtable_name')
         self.assertEqual(F.columns[len(F.columns) - 1] == 'label', True)
-        self.assertEqual(cm.get_all_properties(C) == cm.get_all_properties(F), True)
+        self.assertEqual(cm.get_all_properties(C), get_candset_properties(F))
 
     def test_extract_feature_vecs_valid_7(self):
         A = read_csv_metadata(path_a)
@@ -194,7 +221,7 @@ class ExtractFeaturesTestCases(unittest.TestCase):
         self.assertEqual(F.columns[2], cm.get_fk_rtable(C))
         self.assertEqual(F.columns[3], 'ltable_name')
         self.assertEqual(F.columns[len(F.columns) - 1] == 'label', True)
-        self.assertEqual(cm.get_all_properties(C) == cm.get_all_properties(F), True)
+        self.assertEqual(cm.get_all_properties(C), get_candset_properties(F))
 
     def test_extract_feature_vecs_valid_8(self):
         A = read_csv_metadata(path_a)
@@ -212,7 +239,7 @@ class ExtractFeaturesTestCases(unittest.TestCase):
         self.assertEqual(F.columns[2], cm.get_fk_rtable(C))
         # self.assertEqual(F.columns[3], 'ltable_name')
         self.assertEqual(F.columns[len(F.columns) - 1] == 'label', True)
-        self.assertEqual(cm.get_all_properties(C) == cm.get_all_properties(F), True)
+        self.assertEqual(cm.get_all_properties(C), get_candset_properties(F))
 
     @raises(AssertionError)
     def test_extract_feature_vecs_invalid_df(self):
@@ -255,3 +282,425 @@ class ExtractFeaturesTestCases(unittest.TestCase):
         F = extract_feature_vecs(C, attrs_before='ltable_name',
                                  feature_table=None,
                                  attrs_after=['label', '_id'])
+
+    def test_extract_feature_vecs_batch_matches_per_pair(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        feature_table = get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        add_blackbox_feature(feature_table, 'name_len_diff',
+                             lambda l, r: len(str(l['name'])) - len(str(r['name'])))
+        F = extract_feature_vecs(C, feature_table=feature_table,
+                                 show_progress=False)
+        l_df = A.set_index('ID', drop=False)
+        r_df = B.set_index('ID', drop=False)
+        feat_vals = [apply_feat_fns(l_df.loc[l_id], r_df.loc[r_id], feature_table)
+                     for l_id, r_id in zip(C['ltable_ID'], C['rtable_ID'])]
+        expected = pd.DataFrame(feat_vals, index=C.index.values)
+        feature_names = list(feature_table['feature_name'])
+        pd.testing.assert_frame_equal(F[feature_names], expected[feature_names])
+
+    def test_extract_feature_vecs_same_tokenizer_name_different_functions(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        feature_table = get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        feature_string = "jaccard(mytok(ltuple['name']), mytok(rtuple['name']))"
+        for feature_name, tok_fn in [('name_words', lambda s: tok_delim(s, ' ')),
+                                     ('name_2grams', lambda s: tok_qgram(s, 2))]:
+            f_dict = get_feature_fn(feature_string, {'mytok': tok_fn},
+                                    get_sim_funs_for_matching())
+            add_feature(feature_table, feature_name, f_dict)
+        F = extract_feature_vecs(C, feature_table=feature_table,
+                                 show_progress=False)
+        l_df = A.set_index('ID', drop=False)
+        r_df = B.set_index('ID', drop=False)
+        feat_vals = [apply_feat_fns(l_df.loc[l_id], r_df.loc[r_id], feature_table)
+                     for l_id, r_id in zip(C['ltable_ID'], C['rtable_ID'])]
+        expected = pd.DataFrame(feat_vals, index=C.index.values)
+        feature_names = ['name_words', 'name_2grams']
+        pd.testing.assert_frame_equal(F[feature_names], expected[feature_names])
+        self.assertFalse(F['name_words'].equals(F['name_2grams']))
+
+    def test_extract_feature_vecs_numeric_batch_matches_per_pair(self):
+        A = pd.DataFrame({'ID': ['a1', 'a2', 'a3', 'a4'],
+                          'price': [10.0, np.NaN, 0.0, 7.5],
+                          'year': [2001, 1999, 2010, 2001]})
+        B = pd.DataFrame({'ID': ['b1', 'b2', 'b3'],
+                          'price': [10.0, 0.0, 3.0],
+                          'year': [2001, 2000, 1999]})
+        cm.set_key(A, 'ID')
+        cm.set_key(B, 'ID')
+        C = pd.DataFrame({'_id': range(8),
+                          'ltable_ID': ['a1', 'a2', 'a3', 'a4', 'a1', 'a3',
+                                        'a4', 'a4'],
+                          'rtable_ID': ['b1', 'b1', 'b2', 'b3', 'b3', 'b1',
+                                        'b1', 'b3']})
+        cm.set_candset_properties(C, '_id', 'ltable_ID', 'rtable_ID', A, B)
+        feature_table = get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        F = extract_feature_vecs(C, feature_table=feature_table,
+                                 show_progress=False)
+        l_df = A.set_index('ID', drop=False)
+        r_df = B.set_index('ID', drop=False)
+        feat_vals = [apply_feat_fns(l_df.loc[l_id], r_df.loc[r_id], feature_table)
+                     for l_id, r_id in zip(C['ltable_ID'], C['rtable_ID'])]
+        expected = pd.DataFrame(feat_vals, index=C.index.values)
+        feature_names = list(feature_table['feature_name'])
+        pd.testing.assert_frame_equal(F[feature_names], expected[feature_names])
+
+    def test_extract_feature_vecs_missing_values(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        A.loc[A.index[::2], 'name'] = np.NaN
+        B.loc[B.index[:4], 'name'] = None
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        feature_table = get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        F = extract_feature_vecs(C, feature_table=feature_table,
+                                 show_progress=False)
+        l_df = A.set_index('ID', drop=False)
+        r_df = B.set_index('ID', drop=False)
+        feat_vals = [apply_feat_fns(l_df.loc[l_id], r_df.loc[r_id], feature_table)
+                     for l_id, r_id in zip(C['ltable_ID'], C['rtable_ID'])]
+        expected = pd.DataFrame(feat_vals, index=C.index.values)
+        feature_names = list(feature_table['feature_name'])
+        pd.testing.assert_frame_equal(F[feature_names], expected[feature_names])
+
+        profile = profile_feature_vecs(C, feature_table=feature_table,
+                                       show_progress=False)
+        pair_nulls = pd.isnull(l_df.loc[C['ltable_ID'], 'name'].values) | \
+            pd.isnull(r_df.loc[C['rtable_ID'], 'name'].values)
+        name_features = profile['feature_name'].str.startswith('name_name')
+        self.assertEqual(
+            list(profile.loc[name_features, 'null_count'].unique()),
+            [pair_nulls.sum()])
+        self.assertEqual((profile.loc[name_features, 'nan_count'] >=
+                          pair_nulls.sum()).all(), True)
+
+    def test_extract_feature_vecs_share_tables(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        feature_table = get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        add_blackbox_feature(feature_table, 'name_len_diff',
+                             lambda l, r: len(str(l['name'])) - len(str(r['name'])))
+        F1 = extract_feature_vecs(C, feature_table=feature_table,
+                                  show_progress=False)
+        F2 = extract_feature_vecs(C, feature_table=feature_table,
+                                  show_progress=False, n_jobs=2,
+                                  share_tables=True)
+        pd.testing.assert_frame_equal(F1, F2)
+        self.assertEqual(cm.get_all_properties(C), get_candset_properties(F2))
+
+    def test_shared_table_get_row_missing_values(self):
+        A = pd.DataFrame({'ID': ['a', 'b', 'c'],
+                          'name': ['x', None, np.NaN],
+                          'age': [1.0, np.NaN, 3.0]}).set_index('ID', drop=False)
+        shared_A = SharedTable(A)
+        try:
+            for key in A.index:
+                row = shared_A.get_row(key)
+                expected = A.loc[key]
+                self.assertEqual(list(row.index), list(expected.index))
+                for col in A.columns:
+                    if pd.isnull(expected[col]):
+                        self.assertIs(type(row[col]), type(expected[col]))
+                    else:
+                        self.assertEqual(row[col], expected[col])
+            self.assertIs(shared_A.get_row('b')['name'], None)
+        finally:
+            shared_A.cleanup()
+
+    def test_extract_feature_vecs_memoize(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        feature_table = get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        add_blackbox_feature(feature_table, 'name_len_diff',
+                             lambda l, r: len(str(l['name'])) - len(str(r['name'])))
+        F1 = extract_feature_vecs(C, feature_table=feature_table,
+                                  show_progress=False)
+        F2 = extract_feature_vecs(C, feature_table=feature_table,
+                                  show_progress=False, memoize=True)
+        pd.testing.assert_frame_equal(F1, F2)
+        F3 = pd.concat(extract_feature_vecs_by_chunks(
+            C, feature_table=feature_table, chunk_size=3, show_progress=False,
+            n_jobs=2, memoize=True))
+        pd.testing.assert_frame_equal(F1, F3)
+
+    def test_extract_feature_vecs_group_by_ltable(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        feature_table = get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        add_blackbox_feature(feature_table, 'name_len_diff',
+                             lambda l, r: len(str(l['name'])) - len(str(r['name'])))
+        F1 = extract_feature_vecs(C, feature_table=feature_table,
+                                  show_progress=False)
+        for n_jobs in [1, 2]:
+            F2 = extract_feature_vecs(C, feature_table=feature_table,
+                                      show_progress=False, n_jobs=n_jobs,
+                                      group_by_ltable=True)
+            pd.testing.assert_frame_equal(F1, F2)
+            M = extract_feature_matrix(C, feature_table=feature_table,
+                                       dtype=np.float64,
+                                       show_progress=False, n_jobs=n_jobs,
+                                       group_by_ltable=True)
+            np.testing.assert_array_equal(
+                M, F1[list(feature_table['feature_name'])].values)
+
+    def test_split_candset_by_ltable(self):
+        C = pd.DataFrame({'ltable_ID': ['a2', 'a1', 'a2', 'a3', 'a1', 'a2'],
+                          'rtable_ID': ['b1', 'b2', 'b3', 'b4', 'b5', 'b6']})
+        splits, order = split_candset_by_ltable(C, 'ltable_ID', 2)
+        self.assertEqual([list(c_split['ltable_ID']) for c_split in splits],
+                         [['a2', 'a2', 'a2'], ['a1', 'a1', 'a3']])
+        self.assertEqual(list(order), [0, 2, 5, 1, 4, 3])
+
+    def test_feature_value_memo_evicts_least_recently_used(self):
+        memo = _FeatureValueMemo(2)
+        memo.put(('f', 'a', 'b'), 1.0)
+        memo.put(('f', 'a', 'c'), 0.5)
+        self.assertEqual(memo.get(('f', 'a', 'b')), (True, 1.0))
+        memo.put(('f', 'a', 'd'), 0.0)
+        self.assertEqual(memo.get(('f', 'a', 'c')), (False, None))
+        self.assertEqual(memo.get(('f', 'a', 'b')), (True, 1.0))
+        self.assertEqual(memo.get(('f', 'a', 'd')), (True, 0.0))
+
+    def test_update_feature_vecs_new_features(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        col_pos = len(C.columns)
+        C.insert(col_pos, 'label', [0] * len(C))
+        feature_table = get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        F = extract_feature_vecs(C, attrs_before=['ltable_name'],
+                                 feature_table=feature_table.head(5),
+                                 attrs_after='label', show_progress=False)
+        add_blackbox_feature(feature_table, 'name_len_diff',
+                             lambda l, r: len(str(l['name'])) - len(str(r['name'])))
+        G = update_feature_vecs(F, feature_table=feature_table, show_progress=False)
+        expected = extract_feature_vecs(C, attrs_before=['ltable_name'],
+                                        feature_table=feature_table,
+                                        attrs_after='label', show_progress=False)
+        self.assertEqual(G is F, True)
+        pd.testing.assert_frame_equal(F, expected)
+        self.assertEqual(cm.get_key(F), cm.get_key(C))
+        self.assertEqual(cm.is_property_present_for_df(F, 'feature_hashes'), True)
+
+    def test_update_feature_vecs_changed_features(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        feature_table = get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        add_blackbox_feature(feature_table, 'name_len_diff',
+                             lambda l, r: len(str(l['name'])) - len(str(r['name'])))
+        F = extract_feature_vecs(C, feature_table=feature_table, show_progress=False)
+        update_feature_vecs(F, feature_table=feature_table, show_progress=False)
+        name = feature_table['feature_name'].iloc[0]
+        old_values = list(F[name])
+        # Change the function of the first feature
+        feature_table.at[feature_table.index[0], 'function'] = lambda l, r: -1.0
+        feature_table.at[feature_table.index[0], 'function_source'] = 'changed'
+        update_feature_vecs(F, feature_table=feature_table, show_progress=False)
+        self.assertEqual(list(F[name]), [-1.0] * len(C))
+        self.assertEqual(list(F.columns)[3], name)
+        self.assertNotEqual(old_values, list(F[name]))
+
+    def test_update_feature_vecs_changed_after_extract(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        feature_table = get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        add_blackbox_feature(feature_table, 'f1', lambda l, r: 1.0)
+        F = extract_feature_vecs(C, feature_table=feature_table, show_progress=False)
+        chunks = list(extract_feature_vecs_by_chunks(C, feature_table=feature_table,
+                                                     chunk_size=4, show_progress=False))
+        # Replace the black box feature with another function
+        feature_table = feature_table[feature_table['feature_name'] != 'f1']
+        add_blackbox_feature(feature_table, 'f1', lambda l, r: 2.0)
+        for G in [F, chunks[0]]:
+            update_feature_vecs(G, feature_table=feature_table, show_progress=False)
+            self.assertEqual(list(G['f1']), [2.0] * len(G))
+
+    @raises(AssertionError)
+    def test_update_feature_vecs_invalid_feature_table(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        update_feature_vecs(C, feature_table=None)
+
+    def test_profile_feature_vecs(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        feature_table = get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        add_blackbox_feature(feature_table, 'always_nan', lambda l, r: np.NaN)
+        for n_jobs in [1, 2]:
+            profile = profile_feature_vecs(C, feature_table=feature_table,
+                                           show_progress=False, n_jobs=n_jobs)
+            self.assertEqual(list(profile.index), list(feature_table.index))
+            self.assertEqual(list(profile['feature_name']),
+                             list(feature_table['feature_name']))
+            self.assertEqual(list(profile.columns),
+                             ['feature_name', 'time', 'n_calls', 'nan_count',
+                              'null_count', 'time_per_call', 'null_rate'])
+            self.assertEqual(list(profile['n_calls'].unique()), [len(C)])
+            self.assertEqual(profile['nan_count'].iloc[-1], len(C))
+            self.assertEqual(pd.isnull(profile['null_rate'].iloc[-1]), True)
+            self.assertEqual((profile['null_rate'].iloc[:-1] <= 1).all(), True)
+            self.assertEqual((profile['time'] >= 0).all(), True)
+        profile = profile_feature_vecs(C, feature_table=feature_table,
+                                       sample_size=5, random_state=0,
+                                       show_progress=False)
+        self.assertEqual(list(profile['n_calls'].unique()), [5])
+
+    @raises(AssertionError)
+    def test_profile_feature_vecs_invalid_sample_size(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        feature_table = get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        profile_feature_vecs(C, feature_table=feature_table, sample_size=0)
+
+    def test_apply_feat_fns_profile(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        feature_table = get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        feat_profile = {}
+        apply_feat_fns(A.iloc[0], B.iloc[0], feature_table, feat_profile)
+        apply_feat_fns(A.iloc[1], B.iloc[1], feature_table, feat_profile)
+        self.assertEqual(sorted(feat_profile.keys()),
+                         sorted(feature_table['feature_name']))
+        self.assertEqual(set(cost[1] for cost in feat_profile.values()), {2})
+
+    def test_extract_feature_matrix(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        feature_table = get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        add_blackbox_feature(feature_table, 'name_len_diff',
+                             lambda ltuple, rtuple: len(ltuple['name']) - len(rtuple['name']))
+        F = extract_feature_vecs(C, feature_table=feature_table, show_progress=False)
+        feature_names = list(feature_table['feature_name'])
+        expected = F[feature_names].values.astype(np.float64)
+        for n_jobs in [1, 2]:
+            X = extract_feature_matrix(C, feature_table=feature_table,
+                                       show_progress=False, n_jobs=n_jobs)
+            self.assertEqual(X.dtype, np.float32)
+            self.assertEqual(X.shape, (len(C), len(feature_names)))
+            np.testing.assert_allclose(X, expected, rtol=1e-6)
+        X = extract_feature_matrix(C, feature_table=feature_table,
+                                   dtype=np.float64, show_progress=False)
+        np.testing.assert_array_equal(X, expected)
+
+    @raises(AssertionError)
+    def test_extract_feature_matrix_invalid_dtype(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        feature_table = get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        extract_feature_matrix(C, feature_table=feature_table, dtype=np.int32)
+
+    def test_extract_feature_vecs_by_chunks(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        col_pos = len(C.columns)
+        C.insert(col_pos, 'label', [0] * len(C))
+        feature_table = get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        F = extract_feature_vecs(C, attrs_before=['ltable_name', 'rtable_name'],
+                                 feature_table=feature_table,
+                                 attrs_after='label', show_progress=False)
+        chunks = list(extract_feature_vecs_by_chunks(
+            C, attrs_before=['ltable_name', 'rtable_name'],
+            feature_table=feature_table, attrs_after='label', chunk_size=4,
+            show_progress=False))
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(max(len(chunk) for chunk in chunks), 4)
+        pd.testing.assert_frame_equal(pd.concat(chunks), F)
+
+    @raises(AssertionError)
+    def test_extract_feature_vecs_by_chunks_invalid_chunk_size(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        feature_table = get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        extract_feature_vecs_by_chunks(C, feature_table=feature_table,
+                                       chunk_size=0)
+
+    @unittest.skipIf(not PYARROW_INSTALLED, 'pyarrow is not installed')
+    def test_extract_feature_vecs_to_file(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        col_pos = len(C.columns)
+        C.insert(col_pos, 'label', [0] * len(C))
+        feature_table = get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        F = extract_feature_vecs(C, attrs_before=['ltable_name'],
+                                 feature_table=feature_table,
+                                 attrs_after='label', show_progress=False)
+        F_hashes = F
+        feature_names = list(feature_table['feature_name'])
+        F = F.reset_index(drop=True)
+        F[feature_names] = F[feature_names].astype(float)
+        dir_path = tempfile.mkdtemp()
+        try:
+            for file_format in ['parquet', 'feather']:
+                file_path = os.sep.join([dir_path, 'C_feature_vecs.' + file_format])
+                extract_feature_vecs_to_file(C, file_path, attrs_before=['ltable_name'],
+                                             feature_table=feature_table,
+                                             attrs_after='label', chunk_size=4,
+                                             file_format=file_format,
+                                             show_progress=False)
+                G = read_columnar_metadata(file_path, ltable=A, rtable=B)
+                pd.testing.assert_frame_equal(G, F)
+                self.assertEqual(cm.get_key(G), '_id')
+                self.assertEqual(cm.get_fk_ltable(G), cm.get_fk_ltable(C))
+                self.assertEqual(cm.get_fk_rtable(G), cm.get_fk_rtable(C))
+                self.assertEqual(cm.get_ltable(G) is A, True)
+                self.assertEqual(cm.get_property(G, 'feature_hashes'),
+                                 cm.get_property(F_hashes, 'feature_hashes'))
+                chunks = list(read_columnar_metadata(file_path, chunk_size=4,
+                                                     columns=['_id', feature_names[0]]))
+                self.assertEqual(sum(len(chunk) for chunk in chunks), len(C))
+                self.assertEqual(list(chunks[0].columns), ['_id', feature_names[0]])
+        finally:
+            shutil.rmtree(dir_path)
+
+    @unittest.skipIf(not PYARROW_INSTALLED, 'pyarrow is not installed')
+    def test_columnar_file_writer_missing_values_in_first_chunk(self):
+        dir_path = tempfile.mkdtemp()
+        try:
+            for file_format in ['parquet', 'feather']:
+                file_path = os.sep.join([dir_path, 'labels.' + file_format])
+                labels = pd.DataFrame({'_id': [0, 1, 2, 3],
+                                       'label': [None, None, 1, 0]})
+                writer = ColumnarFileWriter(file_path, file_format,
+                                            type_source=labels)
+                writer.write(labels.iloc[:2])
+                writer.write(labels.iloc[2:])
+                writer.close()
+                G = read_columnar_metadata(file_path)
+                self.assertEqual(list(G['label'].fillna(-1)), [-1, -1, 1, 0])
+        finally:
+            shutil.rmtree(dir_path)
+
+    @unittest.skipIf(not PYARROW_INSTALLED, 'pyarrow is not installed')
+    def test_extract_feature_vecs_to_file_partly_labeled(self):
+        A = read_csv_metadata(path_a)
+        B = read_csv_metadata(path_b, key='ID')
+        C = read_csv_metadata(path_c, ltable=A, rtable=B)
+        labels = [None] * 4 + [i % 2 for i in range(len(C) - 4)]
+        C.insert(len(C.columns), 'gold', pd.Series(labels, dtype=object).values)
+        feature_table = get_features_for_matching(A, B, validate_inferred_attr_types=False)
+        dir_path = tempfile.mkdtemp()
+        try:
+            file_path = os.sep.join([dir_path, 'C_feature_vecs.parquet'])
+            extract_feature_vecs_to_file(C, file_path, feature_table=feature_table,
+                                         attrs_after=['gold'], chunk_size=4,
+                                         show_progress=False)
+            G = read_columnar_metadata(file_path, ltable=A, rtable=B)
+            self.assertEqual(list(G['gold'].fillna(-1)),
+                             [-1 if label is None else label for label in labels])
+        finally:
+            shutil.rmtree(dir_path)
@@ -0,0 +1,74 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from .utils import raises
+
+import py_entitymatching as em
+from py_entitymatching.feature.featurefunction import FeatureFunction
+
+p = em.get_install_path()
+path_a = os.sep.join([p, 'tests', 'test_datasets', 'A.csv'])
+path_b = os.sep.join([p, 'tests', 'test_datasets', 'B.csv'])
+
+
+class FeatureFunctionTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.A = em.read_csv_metadata(path_a, key='ID')
+        self.B = em.read_csv_metadata(path_b, key='ID')
+        self.feature_table = em.get_features_for_matching(
+            self.A, self.B, validate_inferred_attr_types=False)
+
+    def _assert_same_values(self, vals1, vals2):
+        np.testing.assert_allclose(np.asarray(vals1, dtype=np.float64),
+                                   np.asarray(vals2, dtype=np.float64))
+
+    def test_auto_generated_features(self):
+        for f in self.feature_table['function']:
+            self.assertEqual(isinstance(f, FeatureFunction), True)
+
+    def test_pickle_feature_table(self):
+        # The feature table pickles without cloudpickle.
+        feature_table = pickle.loads(pickle.dumps(self.feature_table))
+        for f1, f2 in zip(self.feature_table['function'],
+                          feature_table['function']):
+            self._assert_same_values(
+                [f1(self.A.loc[i], self.B.loc[i]) for i in range(3)],
+                [f2(self.A.loc[i], self.B.loc[i]) for i in range(3)])
+
+    def test_save_load_feature_table(self):
+        dir_path = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(dir_path, 'features.pkl')
+            em.save_object(self.feature_table, file_path)
+            feature_table = em.load_object(file_path)
+        finally:
+            shutil.rmtree(dir_path)
+        self.assertEqual(list(feature_table['feature_name']),
+                         list(self.feature_table['feature_name']))
+        self.assertEqual(
+            [repr(f) for f in feature_table['function']],
+            [repr(f) for f in self.feature_table['function']])
+
+    def test_batch(self):
+        n = min(len(self.A), len(self.B))
+        for f in self.feature_table['function']:
+            l_values = self.A[f.left_attribute].values[:n]
+            r_values = self.B[f.right_attribute].values[:n]
+            expected = [f(self.A.iloc[i], self.B.iloc[i]) for i in range(n)]
+            self._assert_same_values(f.batch(l_values, r_values), expected)
+
+    @raises(AssertionError)
+    def test_batch_invalid_lengths(self):
+        f = self.feature_table['function'].iloc[0]
+        f.batch(['a', 'b'], ['a'])
+
+    @raises(AssertionError)
+    def test_feature_function_invalid_tokenizers(self):
+        FeatureFunction('name', 'name', 'jaccard', em.jaccard, 'qgm_3',
+                        em.get_tokenizers_for_matching()['qgm_3'])
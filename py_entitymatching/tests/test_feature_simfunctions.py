@@ -235,3 +235,61 @@ class SimFunctionsTestCases(unittest.TestCase):
         # v = abs(a-b)/(a+b)
         # v = 1.0 - v
         self.assertEqual(sim.abs_norm(a, b), 1.0)
+
+    def test_set_sim_batch_valid_1(self):
+        token_ids1 = [[0, 1], [0, 1, 1], [], [], [2, 3], None, [0], np.NaN]
+        token_ids2 = [[0], [1, 0], [], [1], [4], [0], None, [0]]
+        batch_measures = {sim.jaccard: sim.jaccard_batch,
+                          sim.cosine: sim.cosine_batch,
+                          sim.overlap_coeff: sim.overlap_coeff_batch,
+                          sim.dice: sim.dice_batch}
+        for measure, batch_measure in six.iteritems(batch_measures):
+            expected = [measure(ids1, ids2) for ids1, ids2 in
+                        zip(token_ids1, token_ids2)]
+            scores = batch_measure(token_ids1, token_ids2)
+            self.assertEqual(len(scores), len(expected))
+            for score, expected_score in zip(scores, expected):
+                if pd.isnull(expected_score):
+                    self.assertEqual(pd.isnull(score), True)
+                else:
+                    self.assertAlmostEqual(score, expected_score)
+
+    def test_set_sim_batch_valid_2(self):
+        token_ids1 = [np.array([0, 5, 7], dtype=np.int32), [7]]
+        token_ids2 = [np.array([5, 7], dtype=np.int32), [5, 7]]
+        self.assertEqual(list(sim.jaccard_batch(token_ids1, token_ids2)),
+                         [2.0 / 3.0, 0.5])
+        self.assertEqual(list(sim.jaccard_batch([], [])), [])
+
+    @raises(AssertionError)
+    def test_set_sim_batch_invalid_lengths(self):
+        sim.jaccard_batch([[0, 1]], [[0], [1]])
+
+    @raises(AssertionError)
+    def test_set_sim_batch_invalid_token_ids(self):
+        sim.jaccard_batch([[0, -1]], [[0]])
+
+    def test_numeric_sim_batch_valid(self):
+        vals1 = np.array([100.0, 100.0, 0.0, 0.0, np.NaN, 3.0, -2.0])
+        vals2 = np.array([200.0, 100.0, 0.0, 5.0, 1.0, np.NaN, 4.0])
+        for measure, batch_measure in six.iteritems(
+                sim._numeric_sim_batch_fns):
+            expected = [measure(val1, val2) for val1, val2 in
+                        zip(vals1, vals2)]
+            scores = batch_measure(vals1, vals2)
+            self.assertEqual(len(scores), len(expected))
+            for score, expected_score in zip(scores, expected):
+                if pd.isnull(expected_score):
+                    self.assertEqual(pd.isnull(score), True)
+                else:
+                    self.assertAlmostEqual(score, expected_score)
+
+    def test_numeric_sim_batch_valid_2(self):
+        vals1 = np.array([1, 2, 3])
+        vals2 = np.array([1.0, 5.0, 3.0])
+        scores = sim._exact_match_numeric_batch(vals1, vals2)
+        self.assertEqual(scores.dtype, np.int64)
+        self.assertEqual(list(scores), [1, 0, 1])
+        # A pair that sums to zero is left to the scalar version.
+        self.assertEqual(sim._rel_diff_numeric_batch(np.array([1.0]),
+                                                     np.array([-1.0])), None)
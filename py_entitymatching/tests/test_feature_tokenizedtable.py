@@ -0,0 +1,131 @@
+import os
+import pickle
+import unittest
+
+import numpy as np
+import pandas as pd
+from .utils import raises
+
+import py_entitymatching as em
+import py_entitymatching.catalog.catalog_manager as cm
+from py_entitymatching.feature.extractfeatures import _match_tokenized_tables
+from py_entitymatching.feature.tokenizedtable import get_token_order
+
+p = em.get_install_path()
+path_a = os.sep.join([p, 'tests', 'test_datasets', 'A.csv'])
+path_b = os.sep.join([p, 'tests', 'test_datasets', 'B.csv'])
+path_c = os.sep.join([p, 'tests', 'test_datasets', 'C.csv'])
+
+
+class TokenizedTableTestCases(unittest.TestCase):
+
+    def setUp(self):
+        self.A = em.read_csv_metadata(path_a, key='ID')
+        self.B = em.read_csv_metadata(path_b, key='ID')
+
+    def test_tokenized_table_valid(self):
+        tokenizers = {'wspace': em.tok_wspace}
+        A = pd.DataFrame({'ID': ['a1', 'a2', 'a3', 'a4'],
+                          'name': ['x y', None, 'y z', 'x y']})
+        cm.set_key(A, 'ID')
+        A_tok = em.TokenizedTable(A, tokenizers=tokenizers)
+        self.assertEqual(A_tok.attrs, ['name'])
+        indptr, indices, nulls = A_tok.get_token_ids('name', 'wspace')
+        self.assertEqual(list(indptr), [0, 2, 2, 4, 6])
+        self.assertEqual(indices.dtype, np.int32)
+        self.assertEqual(list(indices), [0, 1, 1, 2, 0, 1])
+        self.assertEqual(list(nulls), [False, True, False, False])
+        indptr, indices, nulls = A_tok.get_token_ids(
+            'name', 'wspace', A_tok.get_positions(['a3', 'a1']))
+        self.assertEqual(list(indptr), [0, 2, 4])
+        self.assertEqual(list(indices), [1, 2, 0, 1])
+
+    def test_tokenize_tables_frequency_order(self):
+        A_tok, B_tok = em.tokenize_tables(self.A, self.B,
+                                          l_attrs=['name'], r_attrs=['name'],
+                                          tokenizers={'wspace': em.tok_wspace})
+        self.assertEqual(A_tok.dictionary_id, B_tok.dictionary_id)
+        counts = {}
+        for tokenized in [A_tok, B_tok]:
+            for token in tokenized.get_token_ids('name', 'wspace')[1]:
+                counts[token] = counts.get(token, 0) + 1
+        # The least frequent tokens get the smallest ids.
+        self.assertEqual(sorted(counts, key=lambda t: (counts[t], t)),
+                         sorted(counts))
+        tokens = sorted(A_tok.token_ids, key=A_tok.token_ids.get)
+        freqs = dict((token, counts[A_tok.token_ids[token]])
+                     for token in tokens)
+        self.assertEqual(get_token_order(freqs), tokens)
+
+    def test_tokenized_table_pickle(self):
+        A_tok = em.TokenizedTable(self.A, attrs=['name'])
+        A_tok_copy = pickle.loads(pickle.dumps(A_tok))
+        self.assertEqual(A_tok_copy.token_ids, None)
+        for tok_name in A_tok.tokenizer_names:
+            for x, y in zip(A_tok.get_token_ids('name', tok_name),
+                            A_tok_copy.get_token_ids('name', tok_name)):
+                np.testing.assert_array_equal(x, y)
+
+    @raises(AssertionError)
+    def test_tokenized_table_invalid_attrs(self):
+        em.TokenizedTable(self.A, attrs=['name', 'nattr'])
+
+    @raises(AssertionError)
+    def test_tokenized_table_not_tokenized(self):
+        A_tok = em.TokenizedTable(self.A, attrs=['name'])
+        A_tok.get_token_ids('address', 'qgm_3')
+
+    def test_extract_feature_vecs_tokenized_tables(self):
+        C = em.read_csv_metadata(path_c, ltable=self.A, rtable=self.B)
+        feature_table = em.get_features_for_matching(
+            self.A, self.B, validate_inferred_attr_types=False)
+        tokenized_tables = em.tokenize_tables(self.A, self.B)
+        F1 = em.extract_feature_vecs(C, feature_table=feature_table,
+                                     show_progress=False)
+        for n_jobs in [1, 2]:
+            F2 = em.extract_feature_vecs(C, feature_table=feature_table,
+                                         show_progress=False, n_jobs=n_jobs,
+                                         tokenized_tables=tokenized_tables)
+            pd.testing.assert_frame_equal(F1, F2)
+
+    def test_extract_feature_vecs_tokenized_tables_other_tokenizer(self):
+        C = em.read_csv_metadata(path_c, ltable=self.A, rtable=self.B)
+        feature_table = em.get_features_for_matching(
+            self.A, self.B, validate_inferred_attr_types=False)
+        # qgm_3 names another tokenizer than the one of the features
+        tokenized_tables = em.tokenize_tables(
+            self.A, self.B, tokenizers={'qgm_3': em.tok_wspace})
+        l_matched, r_matched = _match_tokenized_tables(tokenized_tables,
+                                                       feature_table)
+        self.assertFalse(l_matched.has_tokens('name', 'qgm_3'))
+        self.assertFalse(r_matched.has_tokens('name', 'qgm_3'))
+        F1 = em.extract_feature_vecs(C, feature_table=feature_table,
+                                     show_progress=False)
+        F2 = em.extract_feature_vecs(C, feature_table=feature_table,
+                                     show_progress=False,
+                                     tokenized_tables=tokenized_tables)
+        pd.testing.assert_frame_equal(F1, F2)
+
+    def test_match_tokenized_tables_same_tokenizers(self):
+        feature_table = em.get_features_for_matching(
+            self.A, self.B, validate_inferred_attr_types=False)
+        tokenized_tables = em.tokenize_tables(self.A, self.B)
+        l_matched, r_matched = _match_tokenized_tables(tokenized_tables,
+                                                       feature_table)
+        self.assertTrue(l_matched.has_tokens('name', 'qgm_3'))
+        self.assertTrue(r_matched.has_tokens('name', 'dlm_dc0'))
+        # the tokenizers are not known after pickling
+        l_copy, r_copy = [pickle.loads(pickle.dumps(tokenized))
+                          for tokenized in tokenized_tables]
+        l_matched, r_matched = _match_tokenized_tables((l_copy, r_copy),
+                                                       feature_table)
+        self.assertFalse(l_matched.has_tokens('name', 'qgm_3'))
+
+    @raises(AssertionError)
+    def test_extract_feature_vecs_invalid_tokenized_tables(self):
+        C = em.read_csv_metadata(path_c, ltable=self.A, rtable=self.B)
+        feature_table = em.get_features_for_matching(
+            self.A, self.B, validate_inferred_attr_types=False)
+        em.extract_feature_vecs(C, feature_table=feature_table,
+                                tokenized_tables=(em.TokenizedTable(self.A),
+                                                  em.TokenizedTable(self.B)))
@@ -4,6 +4,7 @@ import unittest
 # from nose.tools import *
 from .utils import raises
 
+import numpy as np
 import six
 
 from py_entitymatching.matcher.dtmatcher import DTMatcher
@@ -130,6 +131,27 @@ class MLMatcherTestCases(unittest.TestCase):
         self.assertEqual(len(probs), len(test))
 
 
+    def test_ml_matcher_valid_numpy_array(self):
+        A = read_csv_metadata(fpath_a, key='id')
+        B = read_csv_metadata(fpath_b, key='id')
+        feature_vectors = read_csv_metadata(fpath_f, ltable=A, rtable=B)
+        train_test = mu.split_train_test(feature_vectors)
+        train, test = train_test['train'], train_test['test']
+        dt = DTMatcher(name='DecisionTree')
+
+        col_list = list(feature_vectors.columns)
+        l = list_diff(col_list, [cm.get_key(feature_vectors), cm.get_fk_ltable(feature_vectors),
+                                 cm.get_fk_rtable(feature_vectors),
+                                 'gold'])
+        X = train[l].values.astype(np.float32)
+        Y = train['gold']
+
+        dt.fit(x=X, y=Y)
+        predictions, probs = dt.predict(test[l].values.astype(np.float32),
+                                        return_probs=True)
+        self.assertEqual(len(predictions), len(test))
+        self.assertEqual(len(probs), len(test))
+
     @raises(AssertionError)
     def test_ml_matcher_invalid_df(self):
         dt = DTMatcher(name='DecisionTree')
@@ -5,6 +5,7 @@ import unittest
 from .utils import raises
 
 import py_entitymatching as em
+import py_entitymatching.blocker.overlap_index as overlap_index
 
 p = em.get_install_path()
 path_a = os.sep.join([p, 'tests', 'test_datasets', 'A.csv'])
@@ -391,6 +392,114 @@ class OverlapBlockerTestCases(unittest.TestCase):
         validate_metadata(C)
         validate_data(C, expected_ids_1)
 
+    def test_ob_block_tables_wi_overlap_index(self):
+        A_index = self.ob.build_index(self.A, l_overlap_attr_2,
+                                      rem_stop_words=True)
+        B_index = self.ob.build_index(self.B, r_overlap_attr_2,
+                                      rem_stop_words=True)
+        self.assertTrue(isinstance(A_index, em.OverlapIndex))
+        C = self.ob.block_tables(self.A, self.B, l_overlap_attr_2,
+                                 r_overlap_attr_2, rem_stop_words=True,
+                                 overlap_size=4, l_output_attrs=l_output_attrs,
+                                 r_output_attrs=r_output_attrs,
+                                 l_overlap_index=A_index,
+                                 r_overlap_index=B_index)
+        validate_metadata(C, l_output_attrs, r_output_attrs)
+        validate_data(C, expected_ids_2)
+        # a different overlap size, with an index on one table only
+        C = self.ob.block_tables(self.A, self.B, l_overlap_attr_2,
+                                 r_overlap_attr_2, rem_stop_words=True,
+                                 overlap_size=1, l_overlap_index=A_index)
+        D = self.ob.block_tables(self.A, self.B, l_overlap_attr_2,
+                                 r_overlap_attr_2, rem_stop_words=True,
+                                 overlap_size=1)
+        validate_data(C, sorted(D[['ltable_ID', 'rtable_ID']].set_index(
+            ['ltable_ID', 'rtable_ID']).index.values.tolist()))
+
+    def test_ob_block_tables_wi_overlap_index_missing_values(self):
+        path_a = os.sep.join([p, 'tests', 'test_datasets', 'blocker',
+                              'table_A_wi_missing_vals.csv'])
+        path_b = os.sep.join([p, 'tests', 'test_datasets', 'blocker',
+                              'table_B_wi_missing_vals.csv'])
+        A = em.read_csv_metadata(path_a)
+        em.set_key(A, 'ID')
+        B = em.read_csv_metadata(path_b)
+        em.set_key(B, 'ID')
+        A_index = self.ob.build_index(A, l_overlap_attr_1)
+        B_index = self.ob.build_index(B, r_overlap_attr_1)
+        C = self.ob.block_tables(A, B, l_overlap_attr_1, r_overlap_attr_1,
+                                 allow_missing=True, l_overlap_index=A_index,
+                                 r_overlap_index=B_index)
+        validate_metadata(C)
+        validate_data(C, expected_ids_4)
+        C = self.ob.block_tables(A, B, l_overlap_attr_1, r_overlap_attr_1,
+                                 l_overlap_index=A_index,
+                                 r_overlap_index=B_index)
+        validate_data(C, expected_ids_1)
+
+    def test_ob_block_candset_wi_overlap_index(self):
+        C = self.ob.block_tables(self.A, self.B, l_overlap_attr_1,
+                                 r_overlap_attr_1)
+        A_index = self.ob.build_index(self.A, l_overlap_attr_2,
+                                      rem_stop_words=True)
+        D = self.ob.block_candset(C, l_overlap_attr_2, r_overlap_attr_2,
+                                  rem_stop_words=True, overlap_size=4,
+                                  l_overlap_index=A_index)
+        validate_metadata_two_candsets(C, D)
+        validate_data(D, expected_ids_2)
+
+    def test_ob_overlap_index_save_load(self):
+        A_index = self.ob.build_index(self.A, l_overlap_attr_1)
+        file_path = os.sep.join([p, 'tests', 'test_datasets', 'sandbox',
+                                 'A_overlap_index.pkl'])
+        em.save_object(A_index, file_path)
+        A_index = em.load_object(file_path)
+        os.remove(file_path)
+        self.assertTrue(A_index.matches(self.A))
+        C = self.ob.block_tables(self.A, self.B, l_overlap_attr_1,
+                                 r_overlap_attr_1, l_overlap_index=A_index)
+        validate_data(C, expected_ids_1)
+
+    @raises(AssertionError)
+    def test_ob_block_tables_overlap_index_other_settings(self):
+        A_index = self.ob.build_index(self.A, l_overlap_attr_1)
+        self.ob.block_tables(self.A, self.B, l_overlap_attr_1,
+                             r_overlap_attr_1, rem_stop_words=True,
+                             l_overlap_index=A_index)
+
+    @raises(AssertionError)
+    def test_ob_block_tables_overlap_index_modified_table(self):
+        A_index = self.ob.build_index(self.A, l_overlap_attr_1)
+        self.A.loc[0, l_overlap_attr_1] = 'Someone Else'
+        self.ob.block_tables(self.A, self.B, l_overlap_attr_1,
+                             r_overlap_attr_1, l_overlap_index=A_index)
+
+    def test_ob_overlap_index_swapped_values(self):
+        A_index = self.ob.build_index(self.A, l_overlap_attr_1)
+        A = self.A.copy()
+        A[l_overlap_attr_1] = A[l_overlap_attr_1].values[[1, 0, 2, 3, 4]]
+        self.assertFalse(A_index.matches(A))
+        # the order of the tuples does not matter
+        self.assertTrue(A_index.matches(self.A.iloc[::-1]))
+
+    def test_ob_overlap_index_batched_probes(self):
+        A_index = self.ob.build_index(self.A, l_overlap_attr_2, q_val=3,
+                                      word_level=False)
+        B_index = self.ob.build_index(self.B, r_overlap_attr_2, q_val=3,
+                                      word_level=False)
+        l_pos, r_pos = A_index.get_overlapping_pairs(B_index, 10)
+        batch_size = overlap_index._PROBE_BATCH_SIZE
+        overlap_index._PROBE_BATCH_SIZE = 20
+        try:
+            l_pos_2, r_pos_2 = A_index.get_overlapping_pairs(B_index, 10)
+        finally:
+            overlap_index._PROBE_BATCH_SIZE = batch_size
+        self.assertTrue(len(l_pos) > 0)
+        self.assertEqual(list(l_pos), list(l_pos_2))
+        self.assertEqual(list(r_pos), list(r_pos_2))
+        self.assertEqual(list(overlap_index._get_batch_bounds([5, 30, 5, 5], 20)),
+                         [0, 1, 2, 4])
+
     @raises(AssertionError)
     def test_ob_block_candset_invalid_candset_1(self):
         self.ob.block_candset(None, l_overlap_attr_1, r_overlap_attr_1)
@@ -642,6 +751,27 @@ class OverlapBlockerTestCases(unittest.TestCase):
         self.assertEqual(self.ob.block_tuples(A.loc[3], B.loc[3], l_overlap_attr_1,
                                           r_overlap_attr_1), True)
 
+    def test_ob_cleanup_table(self):
+        table = pd.DataFrame({'ID': [1, 2, 3, 4, 5, 6],
+                              'title': ['The Art, of the Deal!', None,
+                                        'art of the deal', '', 'the, a',
+                                        'The Art, of the Deal!']})
+        self.ob.cleanup_table(table, 'title', False)
+        self.assertEqual(table['title'][0], 'the art of deal')
+        self.assertEqual(table['title'].tolist()[2:],
+                         ['art of the deal', '', 'the a', 'the art of deal'])
+        self.assertTrue(pd.isnull(table['title'][1]))
+
+    def test_ob_cleanup_table_rem_stop_words(self):
+        table = pd.DataFrame({'ID': [1, 2, 3],
+                              'title': ['The Art, of the Deal!', 'the, a',
+                                        b'Art and Bytes']})
+        self.ob.cleanup_table(table, 'title', True)
+        self.assertEqual(table['title'].tolist(),
+                         ['art of deal', '', 'art bytes'])
+        self.assertEqual(self.ob.process_string('The Art, of the Deal!', True),
+                         'art of deal')
+
 
 
 class OverlapBlockerMulticoreTestCases(unittest.TestCase):
@@ -1,5 +1,6 @@
 import os
 # from nose.tools import *
+import numpy as np
 import pandas as pd
 import unittest
 from .utils import raises
@@ -67,6 +68,16 @@ rule_8 = ['name_name_jac_dlm_dc0_dlm_dc0(ltuple,rtuple) >= 0']
 # rule with supported sim_fn but unsupported op (returns empty set)
 rule_9 = ['zipcode_zipcode_lev_dist(ltuple,rtuple) <= 2']
 
+# rule comparing two features (not evaluated column-wise)
+rule_10 = ['name_name_jac_qgm_3_qgm_3(ltuple,rtuple) < '
+           'name_name_cos_dlm_dc0_dlm_dc0(ltuple, rtuple)']
+
+# filterable rule keeping the pairs with equal zipcodes (using an equi-join)
+rule_11 = ['zipcode_zipcode_exm(ltuple, rtuple) < 1']
+
+# rule keeping the pairs with different zipcodes (not filterable)
+rule_12 = ['zipcode_zipcode_exm(ltuple, rtuple) == 1']
+
 class RuleBasedBlockerTestCases(unittest.TestCase):
 
     def setUp(self):
@@ -274,6 +285,69 @@ class RuleBasedBlockerTestCases(unittest.TestCase):
                                l_output_prefix, r_output_prefix)
         validate_data(C, expected_ids_6_and_7)
     
+    def test_rb_block_tables_exact_match_rule(self):
+        self.A.loc[0, 'zipcode'] = None
+        self.rb.add_rule(rule_11, self.feature_table)
+        self.assertEqual(self.rb.is_rule_filterable('_rule_0'), True)
+        C = self.rb.block_tables(self.A, self.B, l_output_attrs,
+                                 r_output_attrs, l_output_prefix,
+                                 r_output_prefix)
+        validate_metadata(C, l_output_attrs, r_output_attrs,
+                          l_output_prefix, r_output_prefix)
+        expected_ids = [(l_id, r_id)
+                        for l_id, ltuple in self.A.set_index('ID').iterrows()
+                        for r_id, rtuple in self.B.set_index('ID').iterrows()
+                        if not self.rb.block_tuples(ltuple, rtuple)]
+        self.assertEqual(len(expected_ids), 18)
+        validate_data(C, expected_ids)
+        self.assertEqual(C['l_zipcode'].fillna(0).tolist(),
+                         self.A.set_index('ID').loc[C['l_ID'],
+                                                    'zipcode'].fillna(0).tolist())
+
+    def test_rb_block_tables_non_filterable_exact_match_rule(self):
+        self.rb.add_rule(rule_12, self.feature_table)
+        self.assertEqual(self.rb.is_rule_filterable('_rule_0'), False)
+
+    def test_rb_block_tables_most_selective_filterable_rule(self):
+        rule_names = [self.rb.add_rule(rule, self.feature_table)
+                      for rule in [rule_11, rule_1]]
+        l_df = self.A.set_index('ID', drop=False)
+        r_df = self.B.set_index('ID', drop=False)
+        self.assertEqual(self.rb.get_rule_to_filter(rule_names, l_df, r_df),
+                         rule_names[1])
+        C = self.rb.block_tables(self.A, self.B)
+        validate_data(C, [('a2', 'b3'), ('a3', 'b2'), ('a5', 'b5')])
+
+    def test_rb_block_tables_selective_second_filterable_rule(self):
+        # both rules keep too few pairs to be seen in a sample of the pairs
+        # of the tables, and the second rule keeps fewer pairs
+        rng = np.random.RandomState(0)
+        n = 1000
+        letters = list('abcdefghijklmnopqrstuvwxyz')
+        names = [''.join(rng.choice(letters, 10)) for _ in range(2 * n)]
+        A = pd.DataFrame({'ID': ['a' + str(i) for i in range(n)],
+                          'name': names[:n],
+                          'zipcode': np.arange(n) + 10000})
+        B = pd.DataFrame({'ID': ['b' + str(i) for i in range(n)],
+                          'name': names[:2] + names[n + 2:],
+                          'zipcode': np.where(np.arange(n) < 10,
+                                              np.arange(n) + 10000,
+                                              np.arange(n) + 20000)})
+        em.set_key(A, 'ID')
+        em.set_key(B, 'ID')
+        feature_table = em.get_features_for_blocking(
+            A, B, validate_inferred_attr_types=False)
+        rule_names = [self.rb.add_rule(rule, feature_table)
+                      for rule in [rule_11, rule_1]]
+        l_df = A.set_index('ID', drop=False)
+        r_df = B.set_index('ID', drop=False)
+        self.assertEqual(self.rb.estimate_join_size(
+            rule_11[0], rule_names[0], l_df, r_df, np.random.RandomState(0)), 10)
+        self.assertEqual(self.rb.get_rule_to_filter(rule_names, l_df, r_df),
+                         rule_names[1])
+        C = self.rb.block_tables(A, B, show_progress=False)
+        validate_data(C, [('a0', 'b0'), ('a1', 'b1')])
+
     def test_rb_block_tables_wi_no_output_tuples(self):
         self.rb.add_rule(rule_5, self.feature_table)
         C = self.rb.block_tables(self.A, self.B, show_progress=False)
@@ -408,6 +482,76 @@ class RuleBasedBlockerTestCases(unittest.TestCase):
         validate_metadata(C)
         validate_data(C)
 
+    def test_rb_block_tables_rule_wi_other_tokenizers(self):
+        for name, feature_string in [
+            ('qgm_2', "jaccard(qgm_2(ltuple['name']), qgm_2(rtuple['name']))"),
+            ('wspace', "cosine(wspace(ltuple['address']), "
+                       "wspace(rtuple['address']))"),
+            ('alphanumeric', "dice(alphanumeric(ltuple['address']), "
+                             "alphanumeric(rtuple['address']))")]:
+            f_dict = get_feature_fn(feature_string,
+                                    get_tokenizers_for_blocking(),
+                                    get_sim_funs_for_blocking())
+            f_dict['is_auto_generated'] = True
+            add_feature(self.feature_table, name, f_dict)
+            rb = em.RuleBasedBlocker()
+            rule_name = rb.add_rule([name + '(ltuple, rtuple) < 0.3'],
+                                    self.feature_table)
+            self.assertEqual(rb.is_rule_filterable(rule_name), True)
+            C = rb.block_tables(self.A, self.B, show_progress=False)
+            validate_metadata(C)
+            expected_ids = [(l_id, r_id)
+                            for l_id, ltuple in self.A.set_index('ID').iterrows()
+                            for r_id, rtuple in self.B.set_index('ID').iterrows()
+                            if not rb.block_tuples(ltuple, rtuple)]
+            validate_data(C, expected_ids)
+
+    def test_rb_block_tables_rule_wi_unsupported_tokenizer(self):
+        feature_string = "jaccard(tok_vowels(ltuple['name']), " \
+                         "tok_vowels(rtuple['name']))"
+        tokenizers = get_tokenizers_for_blocking()
+        tokenizers['tok_vowels'] = lambda s: [c for c in s if c in 'aeiou']
+        f_dict = get_feature_fn(feature_string, tokenizers,
+                                get_sim_funs_for_blocking())
+        f_dict['is_auto_generated'] = True
+        add_feature(self.feature_table, 'test', f_dict)
+        self.rb.add_rule(['test(ltuple, rtuple) < 0.9'], self.feature_table)
+        self.assertEqual(self.rb.is_rule_filterable('_rule_0'), False)
+        C = self.rb.block_tables(self.A, self.B, show_progress=False)
+        validate_metadata(C)
+        expected_ids = [(l_id, r_id)
+                        for l_id, ltuple in self.A.set_index('ID').iterrows()
+                        for r_id, rtuple in self.B.set_index('ID').iterrows()
+                        if not self.rb.block_tuples(ltuple, rtuple)]
+        validate_data(C, expected_ids)
+
+    def test_rb_explain_rules(self):
+        self.rb.add_rule(rule_1, self.feature_table, rule_name='rule_1')
+        self.rb.add_rule(rule_11, self.feature_table, rule_name='rule_11')
+        self.rb.add_rule(rule_6, self.feature_table, rule_name='rule_6')
+        E = self.rb.explain_rules(self.A, self.B)
+        self.assertEqual(list(E['rule_name']), ['rule_1', 'rule_11', 'rule_6'])
+        self.assertEqual(list(E['is_filterable']), [True, True, False])
+        self.assertEqual(E.loc[0, 'join'], 'jaccard_join on name, name with '
+                                           'qgm_3 tokens (jaccard >= 0.3)')
+        self.assertEqual(E.loc[1, 'join'], 'equi-join on zipcode, zipcode')
+        self.assertEqual(E.loc[2, 'join'],
+                         'unsupported sim function monge_elkan')
+        self.assertEqual(list(E['block_tables']),
+                         ['join', 'column-wise over the join output',
+                          'column-wise over the join output'])
+        self.assertEqual(list(E['block_candset']), ['column-wise'] * 3)
+
+    def test_rb_explain_rules_no_filterable_rule(self):
+        self.rb.add_rule(rule_6, self.feature_table)
+        E = self.rb.explain_rules(self.A, self.B)
+        self.assertEqual(list(E['block_tables']),
+                         ['per pair over all the tuple pairs'])
+
+    @raises(AssertionError)
+    def test_rb_explain_rules_no_rules(self):
+        self.rb.explain_rules(self.A, self.B)
+
     @raises(AssertionError)
     def test_rb_block_candset_invalid_candset_1(self):
         self.rb.block_candset(None)
@@ -476,6 +620,32 @@ class RuleBasedBlockerTestCases(unittest.TestCase):
         validate_metadata_two_candsets(C, D)
         validate_data(D, expected_ids_1_and_2)
     
+    def test_rb_block_candset_columnwise_and_per_pair_rules(self):
+        ab = em.AttrEquivalenceBlocker()
+        C = ab.block_tables(self.A, self.B, 'zipcode', 'zipcode')
+        self.A.loc[1, 'name'] = None
+        for rule in [rule_3, rule_6, rule_10]:
+            self.rb.add_rule(rule, self.feature_table)
+        D = self.rb.block_candset(C)
+        validate_metadata_two_candsets(C, D)
+        expected = [self.rb.block_tuples(
+            self.A.set_index('ID').loc[l_id], self.B.set_index('ID').loc[r_id])
+            for l_id, r_id in zip(C['ltable_ID'], C['rtable_ID'])]
+        self.assertEqual(D['_id'].tolist(),
+                         C['_id'][[not e for e in expected]].tolist())
+
+    def test_rb_get_columnwise_rules(self):
+        rule_names = [self.rb.add_rule(rule, self.feature_table)
+                      for rule in [rule_3, rule_10]]
+        col_rules, feature_specs = self.rb.get_columnwise_rules(rule_names)
+        self.assertEqual(col_rules, [
+            (rule_names[0],
+             [('name_name_jac_qgm_3_qgm_3', '<', 0.3),
+              ('birth_year_birth_year_lev_dist', '>', 0.0)])])
+        self.assertEqual(sorted(feature_specs.keys()),
+                         ['birth_year_birth_year_lev_dist',
+                          'name_name_jac_qgm_3_qgm_3'])
+
     def test_rb_block_candset_empty_input(self):
         rb = em.RuleBasedBlocker()
         rb.add_rule(rule_5, self.feature_table)
@@ -638,6 +808,29 @@ class RuleBasedBlockerMulticoreTestCases(unittest.TestCase):
         validate_metadata_two_candsets(C, D)
         validate_data(D, expected_ids_1_and_2)
     
+    def test_rb_block_candset_group_by_ltable(self):
+        rb = em.RuleBasedBlocker()
+        rb.add_rule(rule_1, self.feature_table)
+        C = rb.block_tables(self.A, self.B, l_output_attrs,
+                            r_output_attrs, l_output_prefix, r_output_prefix)
+        # the pairs of an ltable tuple are not consecutive
+        C_sorted = C.sort_values(r_output_prefix + 'ID')
+        em.copy_properties(C, C_sorted)
+        C = C_sorted
+        self.rb.add_rule(rule_2, self.feature_table)
+        D = self.rb.block_candset(C)
+        for n_jobs in [1, 2]:
+            E = self.rb.block_candset(C, n_jobs=n_jobs, group_by_ltable=True)
+            validate_metadata_two_candsets(C, E)
+            validate_data(E, expected_ids_1_and_2)
+            pd.testing.assert_frame_equal(D, E)
+
+    @raises(AssertionError)
+    def test_rb_block_candset_invalid_group_by_ltable(self):
+        C = self.rb.block_tables(self.A, self.B)
+        self.rb.add_rule(rule_1, self.feature_table)
+        self.rb.block_candset(C, group_by_ltable=None)
+
     def test_rb_block_candset_empty_input_njobs_2(self):
         rb = em.RuleBasedBlocker()
         rb.add_rule(rule_5, self.feature_table)
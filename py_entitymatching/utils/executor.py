@@ -0,0 +1,274 @@
+# coding=utf-8
+"""
+This module contains a pool of worker processes that is created once and
+reused by all the parallel commands, along with the helper functions the
+commands use to run their jobs on it.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+from collections import OrderedDict
+
+import cloudpickle
+from joblib import Parallel, effective_n_jobs
+
+logger = logging.getLogger(__name__)
+
+# The maximum number of objects each worker keeps deserialized
+_DEFAULT_CACHE_SIZE = 16
+
+# The executor used by the parallel commands (set using set_executor)
+_executor = None
+
+# The objects deserialized by this (worker) process, by content hash
+_worker_cache = OrderedDict()
+
+
+class Executor(object):
+    """
+    A pool of worker processes that is created once and reused by the
+    parallel commands (such as
+    :meth:`~py_entitymatching.extract_feature_vecs` and the blockers).
+
+    The tables and functions a command ships to the workers (such as the
+    feature table, the black box function or the input tables) are written
+    once to a file named by the hash of their contents, and only that name
+    is sent with each job. Each worker keeps the objects it has already
+    deserialized in a cache keyed by the content hash, so running several
+    commands with the same tables does not ship or deserialize them again.
+
+    The executor is used once it is registered using
+    :meth:`~py_entitymatching.set_executor`, by the commands that run with
+    `n_jobs` other than 1. Each command uses at most `n_jobs` of the workers
+    (all of them if `n_jobs` is larger than the number of workers). The
+    workers keep running until the executor is shut down.
+
+    Args:
+        n_jobs (int): The number of worker processes (defaults to -1, in
+            which case all CPUs are used). For n_jobs below -1,
+            (n_cpus + 1 + n_jobs) are used.
+        cache_size (int): The maximum number of objects that each worker
+            keeps deserialized (defaults to 16).
+
+    Examples:
+        >>> executor = em.Executor(n_jobs=4)
+        >>> em.set_executor(executor)
+        >>> C = ob.block_candset(C1, 'name', 'name', n_jobs=-1)
+        >>> H = em.extract_feature_vecs(C, feature_table=match_f, n_jobs=-1)
+        >>> em.set_executor(None)
+        >>> executor.shutdown()
+    """
+
+    def __init__(self, n_jobs=-1, cache_size=_DEFAULT_CACHE_SIZE):
+        if not isinstance(n_jobs, int) or n_jobs == 0:
+            logger.error('Parameter n_jobs should be a non-zero integer')
+            raise AssertionError('Parameter n_jobs should be a non-zero '
+                                 'integer')
+        if not isinstance(cache_size, int) or cache_size < 1:
+            logger.error('Parameter cache_size should be a positive integer')
+            raise AssertionError('Parameter cache_size should be a positive '
+                                 'integer')
+        self.n_jobs = n_jobs
+        self.cache_size = cache_size
+        self.dir_path = tempfile.mkdtemp(prefix='py_em_executor_')
+        # The files written for the shipped objects, by content hash
+        self._stored = OrderedDict()
+        # Entering the Parallel object keeps its workers alive across calls.
+        self._parallel = Parallel(n_jobs=n_jobs)
+        self._parallel.__enter__()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def get_num_workers(self):
+        """
+        Get the number of worker processes.
+        """
+        return effective_n_jobs(self.n_jobs)
+
+    def run(self, jobs, n_jobs=None):
+        """
+        Run the jobs (created using joblib's delayed) on the workers and
+        return their results in order, using at most n_jobs workers
+        (defaults to None, in which case all the workers are used).
+        """
+        if self._parallel is None:
+            logger.error('The executor is shut down')
+            raise AssertionError('The executor is shut down')
+        n_workers = self.get_num_workers()
+        if n_jobs is not None:
+            n_workers = min(effective_n_jobs(n_jobs), n_workers)
+        jobs = list(jobs)
+        if n_workers < self.get_num_workers() and len(jobs) > n_workers:
+            # Run the jobs in rounds of n_workers jobs, so that the other
+            # workers stay idle.
+            results = []
+            for start in range(0, len(jobs), n_workers):
+                results.extend(self._parallel(jobs[start:start + n_workers]))
+        else:
+            results = self._parallel(jobs)
+
+        # Remove the files of the objects that have not been shipped
+        # recently (only once the jobs that use them are done).
+        while len(self._stored) > self.cache_size:
+            _, file_path = self._stored.popitem(last=False)
+            os.remove(file_path)
+        return results
+
+    def share(self, obj):
+        """
+        Get a handle to an object, that is cheap to ship to the workers.
+        """
+        return self.share_pickled(cloudpickle.dumps(obj))
+
+    def share_pickled(self, pickled_obj):
+        """
+        Get a handle to an already pickled object, that is cheap to ship to
+        the workers.
+        """
+        content_hash = hashlib.md5(pickled_obj).hexdigest()
+        file_path = self._stored.pop(content_hash, None)
+        if file_path is None:
+            file_path = os.path.join(self.dir_path, content_hash + '.pkl')
+            with open(file_path, 'wb') as f:
+                f.write(pickled_obj)
+        self._stored[content_hash] = file_path
+        return CachedObject(content_hash, file_path, self.cache_size)
+
+    def shutdown(self):
+        """
+        Stop the workers and remove the files of the shipped objects.
+        """
+        if self._parallel is not None:
+            self._parallel.__exit__(None, None, None)
+            self._parallel = None
+        self._stored.clear()
+        shutil.rmtree(self.dir_path, ignore_errors=True)
+
+
+class CachedObject(object):
+    """
+    A handle to an object shipped to the workers using an executor.
+
+    Pickling the handle only pickles the content hash and the name of the
+    file the object is stored in. A worker deserializes the object the first
+    time it gets the handle and serves it from its cache afterwards.
+    """
+
+    def __init__(self, content_hash, file_path, cache_size):
+        self.content_hash = content_hash
+        self.file_path = file_path
+        self.cache_size = cache_size
+
+    def get(self):
+        """
+        Get the object, from the cache of this process if present.
+        """
+        obj = _worker_cache.pop(self.content_hash, None)
+        if obj is None:
+            with open(self.file_path, 'rb') as f:
+                obj = pickle.load(f)
+        _worker_cache[self.content_hash] = obj
+        while len(_worker_cache) > self.cache_size:
+            _worker_cache.popitem(last=False)
+        return obj
+
+
+def set_executor(executor):
+    """
+    Sets the executor used by the parallel commands.
+
+    Args:
+        executor (Executor): The executor to use, or None to go back to
+            starting new worker processes in each command.
+
+    Raises:
+        AssertionError: If `executor` is not of type Executor or None.
+
+    Examples:
+        >>> em.set_executor(em.Executor(n_jobs=4))
+
+    See Also:
+        :meth:`~py_entitymatching.get_executor`
+    """
+    global _executor
+    if executor is not None and not isinstance(executor, Executor):
+        logger.error('Input executor is not of type Executor')
+        raise AssertionError('Input executor is not of type Executor')
+    _executor = executor
+
+
+def get_executor():
+    """
+    Gets the executor used by the parallel commands.
+
+    Returns:
+        The Executor set using :meth:`~py_entitymatching.set_executor`, or
+        None if there is none.
+    """
+    return _executor
+
+
+def run_parallel(jobs, n_jobs):
+    """
+    Run the jobs on at most n_jobs workers of the executor if one is set
+    (and n_jobs is not 1), else on n_jobs new worker processes.
+    """
+    if _executor is not None and n_jobs != 1:
+        return _executor.run(jobs, n_jobs)
+    return Parallel(n_jobs=n_jobs)(jobs)
+
+
+def get_num_jobs(n_jobs):
+    """
+    Get the number of jobs to pass to a library that runs its own workers,
+    so that it reuses the workers of the executor if one is set (unless
+    fewer jobs are asked for).
+    """
+    if _executor is not None and n_jobs != 1 and \
+            effective_n_jobs(n_jobs) >= _executor.get_num_workers():
+        return _executor.n_jobs
+    return n_jobs
+
+
+def share_object(obj):
+    """
+    Get a handle to ship the object to the workers of the executor, or the
+    object itself if no executor is set.
+    """
+    if _executor is not None and not isinstance(obj, CachedObject):
+        return _executor.share(obj)
+    return obj
+
+
+def share_pickled_object(pickled_obj):
+    """
+    Same as share_object, for an already pickled object.
+    """
+    if _executor is not None:
+        return _executor.share_pickled(pickled_obj)
+    return pickled_obj
+
+
+def get_shared_object(obj):
+    """
+    Get the object shipped using share_object.
+    """
+    if isinstance(obj, CachedObject):
+        return obj.get()
+    return obj
+
+
+def loads_shared_object(pickled_obj):
+    """
+    Get the object shipped using share_pickled_object.
+    """
+    if isinstance(pickled_obj, CachedObject):
+        return pickled_obj.get()
+    return pickle.loads(pickled_obj)
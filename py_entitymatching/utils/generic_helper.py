@@ -1,6 +1,7 @@
 # coding=utf-8
 import logging
 import os
+from collections import OrderedDict
 
 import pandas as pd
 import numpy as np
@@ -12,6 +13,9 @@ from py_entitymatching.utils.catalog_helper import check_fk_constraint
 
 logger = logging.getLogger(__name__)
 
+# The maximum number of tuples kept by a TupleLookup
+_MAX_LOOKUP_SIZE = 10000
+
 
 def get_install_path():
     path_list = install_path.split(os.sep)
@@ -234,3 +238,75 @@ def parse_conjunct(conjunct, feature_table):
             ft_df.loc[feature_name]['right_attr_tokenizer'],
             operator, threshold)
 
+
+
+def split_candset_by_ltable(candset, fk_ltable, n_splits):
+    """
+    Sort the candset by fk_ltable and split it into at most n_splits parts,
+    such that all the pairs of a left tuple are consecutive and in the same
+    part. The pairs of a left tuple keep their order, and the left tuples
+    are in the order they first appear in.
+
+    Returns the parts and the positions (in the candset) of the rows of the
+    sorted candset, which can be used to put the results back in the order
+    of the candset.
+    """
+    codes = pd.factorize(candset[fk_ltable])[0]
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+
+    # Move each boundary of an even split to the start of the next group.
+    n = len(candset)
+    bounds = [0]
+    for i in range(1, n_splits):
+        bound = int(round(i * n / float(n_splits)))
+        if 0 < bound < n:
+            bound = np.searchsorted(sorted_codes, sorted_codes[bound - 1],
+                                    side='right')
+        if bounds[-1] < bound < n:
+            bounds.append(bound)
+    bounds.append(n)
+
+    splits = [candset.iloc[order[start:end]]
+              for start, end in zip(bounds[:-1], bounds[1:])]
+    return splits, order
+
+
+def project_to_keys(table, keys):
+    """
+    Project a table (indexed by its key) on the tuples with the given keys.
+    """
+    return table[table.index.isin(pd.unique(keys))]
+
+
+def get_value_codes(l_values, r_values):
+    """
+    Encode the values of two columns with common integer codes, so that
+    equal values get equal codes and the missing values get -1.
+    """
+    if l_values.dtype != r_values.dtype:
+        l_values = l_values.astype(object)
+        r_values = r_values.astype(object)
+    codes, _ = pd.factorize(np.concatenate([l_values, r_values]))
+    return codes[:len(l_values)], codes[len(l_values):]
+
+
+class TupleLookup(object):
+    """
+    Looks up the tuples of a table by key, keeping the most recently used
+    tuples (at most max_size of them) instead of every tuple looked up.
+    """
+
+    def __init__(self, get_fn, max_size=_MAX_LOOKUP_SIZE):
+        self.get_fn = get_fn
+        self.max_size = max_size
+        self._tuples = OrderedDict()
+
+    def __getitem__(self, key):
+        tup = self._tuples.pop(key, None)
+        if tup is None:
+            tup = self.get_fn(key)
+            if len(self._tuples) >= self.max_size:
+                self._tuples.popitem(last=False)
+        self._tuples[key] = tup
+        return tup
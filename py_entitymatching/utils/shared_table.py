@@ -0,0 +1,195 @@
+# coding=utf-8
+"""
+This module contains a read-only, column-oriented table that is stored once
+in memory mapped files and shared by all the worker processes.
+"""
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import six
+
+logger = logging.getLogger(__name__)
+
+
+class SharedTable(object):
+    """
+    A read-only copy of a DataFrame whose columns are stored in memory mapped
+    files.
+
+    Pickling a SharedTable only pickles the name of the directory the columns
+    are stored in, so sending it to a worker process is cheap. The workers
+    attach to the files by that name and the operating system shares the
+    pages among all of them, instead of every worker holding a copy of the
+    table.
+
+    Numeric and boolean columns are stored as plain NumPy arrays. String
+    columns are stored as a single UTF-8 byte buffer with offsets, and only
+    the values that are requested are decoded (their missing values, such as
+    None or NaN, are kept as they are in the table). Any other column is
+    pickled and loaded as a whole by each worker that needs it.
+
+    Args:
+        table (DataFrame): The table to share. The index of the table is used
+            to look up the tuples (typically it is the key of the table).
+        dir_path (string): The directory in which the column files must be
+            written (defaults to None, in which case a temporary directory
+            is created).
+    """
+
+    def __init__(self, table, dir_path=None):
+        if dir_path is None:
+            dir_path = tempfile.mkdtemp(prefix='py_em_shared_')
+        self.dir_path = dir_path
+        self.columns = list(table.columns)
+        self.index_name = table.index.name
+        self._column_kinds = {}
+        self._arrays = {}
+        self._index = None
+
+        self._write_column('__index__', table.index.values)
+        for i, col in enumerate(self.columns):
+            self._write_column(i, table[col].values)
+
+    def __getstate__(self):
+        # Only the location of the files is shipped, not the data.
+        state = self.__dict__.copy()
+        state['_arrays'] = {}
+        state['_index'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def __len__(self):
+        return len(self._get_array('__index__', 'nulls'))
+
+    @property
+    def index(self):
+        """
+        The index of the shared table (built lazily in each process).
+        """
+        if self._index is None:
+            n = len(self)
+            self._index = pd.Index(self._take_column('__index__',
+                                                     np.arange(n)),
+                                   name=self.index_name)
+        return self._index
+
+    def take(self, column, positions):
+        """
+        Get the values of a column at the given (integer) positions.
+        """
+        return self._take_column(self.columns.index(column),
+                                 np.asarray(positions))
+
+    def get_row(self, key):
+        """
+        Get the tuple with the given index value as a pandas Series.
+        """
+        pos = np.array([self.index.get_loc(key)])
+        vals = [self._take_column(i, pos)[0]
+                for i in range(len(self.columns))]
+        return pd.Series(vals, index=self.columns, name=key, dtype=object)
+
+    def cleanup(self):
+        """
+        Remove the files backing the shared table.
+        """
+        self._arrays = {}
+        shutil.rmtree(self.dir_path, ignore_errors=True)
+
+    def _file_path(self, col_id, part):
+        return os.path.join(self.dir_path, '%s.%s' % (col_id, part))
+
+    def _write_column(self, col_id, values):
+        if values.dtype.kind in 'biuf':
+            np.save(self._file_path(col_id, 'values.npy'), values)
+            np.save(self._file_path(col_id, 'nulls.npy'), pd.isnull(values))
+            self._column_kinds[col_id] = 'numpy'
+        elif values.dtype == object and _is_str_column(values):
+            nulls = pd.isnull(values)
+            encoded = [b'' if is_null else v.encode('utf-8')
+                       for v, is_null in zip(values, nulls)]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(e) for e in encoded])
+            data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+            np.save(self._file_path(col_id, 'data.npy'), data)
+            np.save(self._file_path(col_id, 'offsets.npy'), offsets)
+            np.save(self._file_path(col_id, 'nulls.npy'), nulls)
+            with open(self._file_path(col_id, 'pkl'), 'wb') as f:
+                pickle.dump(values[nulls], f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            self._column_kinds[col_id] = 'str'
+        else:
+            with open(self._file_path(col_id, 'pkl'), 'wb') as f:
+                pickle.dump(values, f, protocol=pickle.HIGHEST_PROTOCOL)
+            np.save(self._file_path(col_id, 'nulls.npy'), pd.isnull(values))
+            self._column_kinds[col_id] = 'pickle'
+
+    def _get_array(self, col_id, part):
+        array_key = (col_id, part)
+        if array_key not in self._arrays:
+            if part == 'pkl':
+                with open(self._file_path(col_id, part), 'rb') as f:
+                    self._arrays[array_key] = pickle.load(f)
+            elif part == 'null_ranks':
+                # The position of each missing value among the missing
+                # values of the column
+                self._arrays[array_key] = np.cumsum(
+                    self._get_array(col_id, 'nulls')) - 1
+            else:
+                self._arrays[array_key] = np.load(
+                    self._file_path(col_id, part + '.npy'), mmap_mode='r')
+        return self._arrays[array_key]
+
+    def _take_column(self, col_id, positions):
+        kind = self._column_kinds[col_id]
+        if kind == 'numpy':
+            return np.asarray(self._get_array(col_id, 'values').take(positions))
+        if kind == 'pickle':
+            return self._get_array(col_id, 'pkl').take(positions)
+        data = self._get_array(col_id, 'data')
+        offsets = self._get_array(col_id, 'offsets')
+        nulls = self._get_array(col_id, 'nulls')
+        vals = np.empty(len(positions), dtype=object)
+        for i, pos in enumerate(positions):
+            if nulls[pos]:
+                vals[i] = self._get_array(col_id, 'pkl')[
+                    self._get_array(col_id, 'null_ranks')[pos]]
+            else:
+                vals[i] = data[offsets[pos]:offsets[pos + 1]].tobytes() \
+                    .decode('utf-8')
+        return vals
+
+
+def _is_str_column(values):
+    """
+    Check whether all the non-missing values of a column are strings.
+    """
+    return all(isinstance(v, six.string_types) for v in values
+               if not pd.isnull(v))
+
+
+def take_values(table, column, positions):
+    """
+    Get the values of a column at the given positions, for both pandas
+    DataFrames and shared tables.
+    """
+    if isinstance(table, SharedTable):
+        return table.take(column, positions)
+    return table[column].values.take(positions)
+
+
+def get_row(table, key):
+    """
+    Get the tuple with the given index value, for both pandas DataFrames and
+    shared tables.
+    """
+    if isinstance(table, SharedTable):
+        return table.get_row(key)
+    return table.loc[key]
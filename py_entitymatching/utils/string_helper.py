@@ -0,0 +1,65 @@
+# coding=utf-8
+"""
+This module contains the functions used by the overlap blockers to clean up
+attribute values (lower-casing them, removing the punctuations, the duplicate
+tokens and optionally the stop words) before tokenizing them.
+"""
+import logging
+import string
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Translation table that removes the punctuations (the same characters the
+# blockers used to remove with a regular expression)
+_PUNCTUATION_TABLE = dict.fromkeys(map(ord, string.punctuation))
+
+
+def remove_punctuations(s):
+    """
+    Remove the punctuations from a string.
+    """
+    return s.translate(_PUNCTUATION_TABLE)
+
+
+def clean_string(s, rem_stop_words=False, stop_words=None):
+    """
+    Clean up a string: lower-case it, remove the punctuations and keep the
+    first occurrence of each token, in order (and, optionally, only the
+    tokens that are not stop words). Empty and missing values are returned
+    as is.
+    """
+    if not isinstance(s, (bytes, str)) and pd.isnull(s):
+        return s
+    if not s:
+        return s
+    if isinstance(s, bytes):
+        s = s.decode('utf-8', 'ignore')
+    tokens = dict.fromkeys(remove_punctuations(s.lower()).split())
+    if rem_stop_words and stop_words:
+        if not isinstance(stop_words, frozenset):
+            stop_words = frozenset(stop_words)
+        return ' '.join(t for t in tokens if t not in stop_words)
+    return ' '.join(tokens)
+
+
+def clean_column(values, rem_stop_words=False, stop_words=None):
+    """
+    Clean up the values of a column the same way as clean_string, returning
+    a NumPy object array of the cleaned values (missing values are kept).
+
+    Each distinct value of the column is cleaned only once.
+    """
+    values = np.asarray(values, dtype=object)
+    codes, uniques = pd.factorize(values)
+    if rem_stop_words and stop_words:
+        stop_words = frozenset(stop_words)
+    cleaned = np.empty(len(uniques), dtype=object)
+    cleaned[:] = [clean_string(val, rem_stop_words, stop_words)
+                  for val in uniques]
+    result = values.copy()
+    has_value = codes >= 0
+    result[has_value] = cleaned[codes[has_value]]
+    return result